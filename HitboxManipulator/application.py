@@ -4,8 +4,11 @@ import arcade
 
 from tool_gui import GUIManager
 from hitbox_manager import HitboxManager
+import profiling
 import style
 
+TRACE_PATH = "hitbox_trace.json"
+
 
 class App(arcade.Window):
 
@@ -18,9 +21,16 @@ class App(arcade.Window):
         self._ui_manager.enable()
 
         self._hitbox_manager = HitboxManager(self._ui_manager._base_slots._primary_tab._hitbox_line._hitbox_frame)
+        self._ui_manager._base_slots._primary_tab._sprite_picker_line.show_sprites(
+            self._hitbox_manager.sprites, self._hitbox_manager.loader, self._hitbox_manager.set_texture)
+        self._ui_manager._base_slots._primary_tab._hitbox_info_line.show_hitboxes(
+            self._hitbox_manager.hitboxes, self._hitbox_manager.set_active_hitbox)
 
         self._current_pixel = None
 
+        # F3 toggles profiling and its overlay, F4 saves what was recorded as a Chrome trace.
+        self._profile_overlay = profiling.ProfileOverlay()
+
         # Vector Test
         self.p_1 = (300, 120)
         self.p_2 = (540, 145)
@@ -32,6 +42,7 @@ class App(arcade.Window):
         self.v_2 = (0, 0)
 
     def on_draw(self):
+        profiling.frame()
         self.clear()
         # self._ui_manager.draw()
         # self._hitbox_manager.draw()
@@ -48,11 +59,23 @@ class App(arcade.Window):
                          self.p_1[0]+v_4[0]+v_3[0], self.p_1[1]+v_4[1]+v_3[1],
                          arcade.color.PEAR, 2)
 
+        self._profile_overlay.draw()
+
+    def on_update(self, delta_time: float):
+        self._hitbox_manager.on_update(delta_time)
+
     def on_key_press(self, symbol: int, modifiers: int):
         if symbol == arcade.key.ESCAPE:
             self.close()
+        elif symbol == arcade.key.F3:
+            print(f"Profiling {'on' if profiling.toggle() else 'off'}")
+        elif symbol == arcade.key.F4:
+            if profiling.export_trace(TRACE_PATH):
+                print(f"Saved profile trace to {TRACE_PATH}")
+            else:
+                print("WARNING: Profiling is off, press F3 to start recording")
         else:
-            self._hitbox_manager.on_key_press(symbol)
+            self._hitbox_manager.on_key_press(symbol, modifiers)
 
     def on_mouse_scroll(self, x: int, y: int, scroll_x: int, scroll_y: int):
         self._hitbox_manager.on_mouse_scroll(x, y, scroll_x, scroll_y)
@@ -63,6 +86,9 @@ class App(arcade.Window):
     def on_mouse_press(self, x: int, y: int, button: int, modifiers: int):
         self._hitbox_manager.on_mouse_press(x, y, button, modifiers)
 
+    def on_mouse_release(self, x: int, y: int, button: int, modifiers: int):
+        self._hitbox_manager.on_mouse_release(x, y, button, modifiers)
+
     def on_mouse_motion(self, x: int, y: int, dx: int, dy: int):
         self.p_3 = (x, y)
         self.v_2 = x - self.p_1[0], y - self.p_1[1]
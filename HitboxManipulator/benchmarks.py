@@ -0,0 +1,260 @@
+"""
+Micro-benchmarks of the editor's data and layout hot paths, run headless so they can be repeated on any machine.
+
+Each benchmark is timed at every size asked for:
+    # add_point_end: appending a point to a hitbox of that many points.
+    # add_point_mid: adding a point half way along the hitbox after change_insert_point, which moves every point
+      after it.
+    # points: reading back HitboxData.points.
+    # stack_layout: a full UIStackLayout.do_layout pass over that many children.
+    # stack_size_hints: UIStackLayout._update_size_hints over that many children.
+    # read_style: loading the style file, which only runs once so is not sized.
+The stack benchmarks are skipped, with a warning, on arcade releases UIStackLayout can't lay out on.
+A result is the best time per operation over several runs, as the best run is the one least disturbed by the rest of
+the machine.
+
+Results can be saved as JSON and later runs compared against them. Any benchmark slower than the baseline by more
+than the tolerance is reported as a regression and the script exits with an error, so it can gate performance work:
+    python benchmarks.py --json baseline.json
+    python benchmarks.py --baseline baseline.json --tolerance 0.2
+"""
+
+import pyglet
+
+# None of the benchmarks draw anything, so stop pyglet making its hidden window when arcade is imported.
+pyglet.options["shadow_window"] = False
+
+import argparse
+import json
+import platform
+import sys
+from fnmatch import fnmatch
+from pathlib import Path
+from time import perf_counter
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from numpy import float32
+from numpy.random import default_rng
+
+from arcade.gui import UIWidget
+
+import style
+from hitbox_data import HitboxCollection, HitboxData, SpriteInfo
+from widgets import STACK_LAYOUT_SUPPORTED, UIStackLayout
+
+STYLE_PATH = Path(__file__).parent / "resources" / "style.json"
+
+
+class Result(NamedTuple):
+    name: str
+    size: int
+    us: float  # the best time of a single operation in microseconds
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}[{self.size}]" if self.size else self.name
+
+
+class Regression(NamedTuple):
+    key: str
+    baseline_us: float
+    us: float
+
+    @property
+    def change(self) -> float:
+        return self.us / self.baseline_us - 1.0
+
+    def describe(self) -> str:
+        return f"{self.key}: {self.baseline_us:.3f} us -> {self.us:.3f} us ({self.change:+.0%})"
+
+
+def _best(run: Callable[[], float], repeat: int) -> float:
+    # Each run sets itself up and returns the seconds taken by the part being measured.
+    return min(run() for _ in range(repeat))
+
+
+def _hitbox(size: int) -> HitboxData:
+    # Each benchmark gets a collection of its own so earlier benchmarks don't leave it fragmented.
+    points = default_rng(size).uniform(0.0, 64.0, (size, 2)).astype(float32)
+    return HitboxData(SpriteInfo((64, 64), points), collection=HitboxCollection())
+
+
+def add_point_end(size: int, number: int = 1000, repeat: int = 5) -> float:
+    def _run():
+        hitbox = _hitbox(size)
+        start = perf_counter()
+        for index in range(number):
+            hitbox.add_point((index, index))
+        return perf_counter() - start
+    return _best(_run, repeat) / number
+
+
+def add_point_mid(size: int, number: int = 1000, repeat: int = 5) -> float:
+    def _run():
+        hitbox = _hitbox(size)
+        hitbox.change_insert_point(size // 2)
+        start = perf_counter()
+        for index in range(number):
+            hitbox.add_point((index, index))
+        return perf_counter() - start
+    return _best(_run, repeat) / number
+
+
+def points(size: int, number: int = 10000, repeat: int = 5) -> float:
+    hitbox = _hitbox(size)
+
+    def _run():
+        start = perf_counter()
+        for _ in range(number):
+            hitbox.points
+        return perf_counter() - start
+    return _best(_run, repeat) / number
+
+
+def _layout(size: int) -> UIStackLayout:
+    if not STACK_LAYOUT_SUPPORTED:
+        raise RuntimeError("The installed arcade's UIWidget has no padding properties, so UIStackLayout can't lay out")
+    layout = UIStackLayout(width=300, height=600, vertical=True, space_between=2)
+    for _ in range(size):
+        layout.add(UIWidget(width=280, height=20))
+    return layout
+
+
+def stack_layout(size: int, number: int = 10, repeat: int = 5) -> float:
+    layout = _layout(size)
+
+    def _run():
+        start = perf_counter()
+        for _ in range(number):
+            layout.invalidate()
+            layout.do_layout()
+        return perf_counter() - start
+    return _best(_run, repeat) / number
+
+
+def stack_size_hints(size: int, number: int = 10, repeat: int = 5) -> float:
+    layout = _layout(size)
+
+    def _run():
+        start = perf_counter()
+        for _ in range(number):
+            layout._update_size_hints()
+        return perf_counter() - start
+    return _best(_run, repeat) / number
+
+
+def read_style(number: int = 100, repeat: int = 5) -> float:
+    def _run():
+        start = perf_counter()
+        for _ in range(number):
+            style.read_style(STYLE_PATH)
+        return perf_counter() - start
+    return _best(_run, repeat) / number
+
+
+SIZED: Dict[str, Callable[..., float]] = {
+    "add_point_end": add_point_end,
+    "add_point_mid": add_point_mid,
+    "points": points,
+    "stack_layout": stack_layout,
+    "stack_size_hints": stack_size_hints,
+}
+UNSIZED: Dict[str, Callable[..., float]] = {
+    "read_style": read_style,
+}
+# The benchmarks which need UIStackLayout to lay out.
+STACK: Tuple[str, ...] = ("stack_layout", "stack_size_hints")
+
+
+def run(sizes: Sequence[int] = (100, 1000, 10000), repeat: int = 5, pattern: str = "*",
+        progress: Optional[Callable[[Result], None]] = None) -> List[Result]:
+    """
+    Run every benchmark whose name matches the pattern. The stack benchmarks are left out if arcade can't run them.
+
+    :param progress: Called with each result as it is finished.
+    """
+    jobs: List[Tuple[str, int, Callable[[], float]]] = []
+    for name, benchmark in SIZED.items():
+        jobs.extend((name, size, lambda _benchmark=benchmark, _size=size: _benchmark(_size, repeat=repeat))
+                    for size in sizes)
+    for name, benchmark in UNSIZED.items():
+        jobs.append((name, 0, lambda _benchmark=benchmark: _benchmark(repeat=repeat)))
+
+    results = []
+    for name, size, job in jobs:
+        if not fnmatch(name, pattern) or (name in STACK and not STACK_LAYOUT_SUPPORTED):
+            continue
+        result = Result(name, size, job() * 1e6)
+        results.append(result)
+        if progress is not None:
+            progress(result)
+    return results
+
+
+def to_json(results: Sequence[Result]) -> Dict:
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": {result.key: result.us for result in results},
+    }
+
+
+def compare(results: Sequence[Result], baseline: Dict, tolerance: float = 0.2) -> List[Regression]:
+    """
+    The results slower than the baseline by more than the tolerance, a fraction of the baseline time. Results the
+    baseline doesn't have are skipped.
+    """
+    _baseline: Dict[str, float] = baseline.get("results", {})
+    return [Regression(result.key, _baseline[result.key], result.us) for result in results
+            if result.key in _baseline and result.us > _baseline[result.key] * (1.0 + tolerance)]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Time the editor's data and layout hot paths.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000],
+                        help="Points or children to time each sized benchmark at.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs of each benchmark, the best is kept.")
+    parser.add_argument("--only", default="*", help="Only run benchmarks whose name matches this pattern.")
+    parser.add_argument("--json", dest="json_path", default=None, help="Save the results as JSON.")
+    parser.add_argument("--baseline", default=None, help="Results saved by an earlier run to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="How much slower than the baseline a result may be, as a fraction.")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline:
+        try:
+            with open(args.baseline) as file:
+                baseline = json.load(file)
+        except (OSError, ValueError) as error:
+            print(f"ERROR: Could not read baseline {args.baseline}: {error}")
+            return 2
+
+    def _print(result: Result):
+        line = f"{result.key:<28} {result.us:>12.3f} us"
+        if baseline is not None and result.key in baseline.get("results", {}):
+            line += f"  ({result.us / baseline['results'][result.key] - 1.0:+.0%})"
+        print(line, flush=True)
+
+    if not STACK_LAYOUT_SUPPORTED:
+        for name in STACK:
+            if fnmatch(name, args.only):
+                print(f"WARNING: Skipping {name}, the installed arcade's UIWidget has no padding properties so "
+                      f"UIStackLayout can't lay out")
+
+    results = run(args.sizes, args.repeat, args.only, _print)
+
+    if args.json_path:
+        with open(args.json_path, "w") as file:
+            json.dump(to_json(results), file, indent=2)
+
+    if baseline is None:
+        return 0
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION: {regression.describe()}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""
+Measures what the hitboxes of a project cost in arcade's collision functions, so artists can see which outlines are
+too detailed.
+
+For each hitbox two costs are timed:
+    # check: one check_for_collision against a simple box, averaged over a ring of positions which both hit and
+      only just miss, so the polygon test always runs.
+    # adjust: rebuilding the sprite's world space hitbox after it moves, which arcade does once per moved sprite.
+The per-frame estimate is entities * (adjust + checks_per_entity * check).
+
+Run as a script on a saved project:
+    python collision_benchmark.py project.json --entities 200 --budget 1.0
+"""
+
+import pyglet
+
+# Checking collisions needs no window, so stop pyglet making its hidden window when arcade is imported.
+pyglet.options["shadow_window"] = False
+
+import argparse
+import json
+import sys
+from math import cos, sin, pi
+from time import perf_counter
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+from PIL import Image
+from numpy import polyfit
+
+from arcade import Sprite, Texture, check_for_collision
+
+from hitbox_data import HitboxData
+from hitbox_io import read_project
+
+
+class CollisionCost(NamedTuple):
+    name: str
+    vertices: int
+    check_us: float
+    adjust_us: float
+    frame_ms: float
+    over_budget: bool
+
+
+class CollisionReport(NamedTuple):
+    costs: List[CollisionCost]  # most expensive first
+    entities: int
+    checks_per_entity: int
+    budget_ms: float
+    us_per_vertex: float  # the slope of check cost against vertex count
+    base_us: float  # the check cost with no vertices, the intercept of the same fit
+
+    def to_json(self) -> Dict:
+        return {
+            "entities": self.entities,
+            "checks_per_entity": self.checks_per_entity,
+            "budget_ms": self.budget_ms,
+            "us_per_vertex": self.us_per_vertex,
+            "base_us": self.base_us,
+            "sprites": [cost._asdict() for cost in self.costs],
+        }
+
+    def format(self, limit: Optional[int] = None) -> str:
+        lines = [f"{self.entities} entities, {self.checks_per_entity} checks each, budget {self.budget_ms:.3f} ms",
+                 f"check cost ~ {self.base_us:.2f} us + {self.us_per_vertex:.3f} us per vertex",
+                 f"{'sprite':<40} {'verts':>6} {'check us':>9} {'adjust us':>10} {'frame ms':>9}"]
+        for cost in self.costs[:limit]:
+            flag = "  OVER" if cost.over_budget else ""
+            lines.append(f"{cost.name[-40:]:<40} {cost.vertices:>6} {cost.check_us:>9.2f} {cost.adjust_us:>10.2f} "
+                         f"{cost.frame_ms:>9.3f}{flag}")
+        return "\n".join(lines)
+
+
+def measure_hitbox(hitbox: HitboxData, number: int = 200, repeat: int = 3) -> Tuple[float, float]:
+    """
+    Time a single hitbox. Returns the (check, adjust) costs in microseconds, the best of `repeat` runs.
+    """
+    width, height = (max(1, int(side)) for side in hitbox.sprite_size)
+    texture = _texture(width, height)
+
+    sprite = Sprite(texture=texture)
+    sprite.set_hit_box([tuple(point) for point in hitbox.points.tolist()])
+
+    half_width, half_height = width / 2, height / 2
+    other = Sprite(texture=texture)
+    other.set_hit_box(((-half_width, -half_height), (half_width, -half_height),
+                       (half_width, half_height), (-half_width, half_height)))
+
+    # A ring of positions, half overlapping and half at the edge of the bounding radius.
+    radius = max(width, height)
+    positions = [(scale * radius * cos(angle), scale * radius * sin(angle))
+                 for scale in (0.5, 1.0) for angle in (step * pi / 4 for step in range(8))]
+
+    check = float("inf")
+    for _ in range(repeat):
+        elapsed = 0.0
+        for position in positions:
+            other.position = position
+            other.get_adjusted_hit_box()
+            start = perf_counter()
+            for _ in range(number):
+                check_for_collision(sprite, other)
+            elapsed += perf_counter() - start
+        check = min(check, elapsed / (number * len(positions)))
+
+    adjust = float("inf")
+    for _ in range(repeat):
+        start = perf_counter()
+        for index in range(number):
+            sprite.position = (index & 1, 0)
+            sprite.get_adjusted_hit_box()
+        adjust = min(adjust, (perf_counter() - start) / number)
+
+    return check * 1e6, adjust * 1e6
+
+
+def benchmark(hitboxes: Iterable[Tuple[str, HitboxData]], entities: int = 100, checks_per_entity: int = 1,
+              budget_ms: float = 1.0, number: int = 200, repeat: int = 3) -> CollisionReport:
+    """
+    Measure every hitbox and estimate its per-frame cost if `entities` sprites used it.
+
+    :param budget_ms: The per-frame collision cost above which a sprite is flagged.
+    """
+    costs = []
+    for name, hitbox in hitboxes:
+        if hitbox.size < 3:
+            continue
+        check_us, adjust_us = measure_hitbox(hitbox, number, repeat)
+        frame_ms = entities * (adjust_us + checks_per_entity * check_us) / 1000
+        costs.append(CollisionCost(name, hitbox.size, check_us, adjust_us, frame_ms, frame_ms > budget_ms))
+
+    costs.sort(key=lambda cost: cost.frame_ms, reverse=True)
+
+    us_per_vertex, base_us = 0.0, 0.0
+    if len({cost.vertices for cost in costs}) > 1:
+        us_per_vertex, base_us = (float(value) for value in polyfit([cost.vertices for cost in costs],
+                                                                    [cost.check_us for cost in costs], 1))
+    elif costs:
+        base_us = sum(cost.check_us for cost in costs) / len(costs)
+
+    return CollisionReport(costs, entities, checks_per_entity, budget_ms, us_per_vertex, base_us)
+
+
+def benchmark_project(hitboxes: Mapping[str, HitboxData], **kwargs) -> CollisionReport:
+    return benchmark(hitboxes.items(), **kwargs)
+
+
+_TEXTURES: Dict[Tuple[int, int], Texture] = {}
+
+
+def _texture(width: int, height: int) -> Texture:
+    # A blank texture only gives the sprites their size. The hitbox is always set by hand.
+    if (width, height) not in _TEXTURES:
+        _TEXTURES[width, height] = Texture(f"collision-benchmark-{width}x{height}",
+                                           Image.new("RGBA", (width, height)), hit_box_algorithm=None)
+    return _TEXTURES[width, height]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Estimate the collision cost of every hitbox in a project.")
+    parser.add_argument("project", help="A JSON hitbox project.")
+    parser.add_argument("--entities", type=int, default=100, help="Sprites using each hitbox at once.")
+    parser.add_argument("--checks", type=int, default=1, help="Collision checks per entity per frame.")
+    parser.add_argument("--budget", type=float, default=1.0, help="Per-frame cost in ms above which to flag.")
+    parser.add_argument("--number", type=int, default=200, help="Checks per timing run.")
+    parser.add_argument("--limit", type=int, default=None, help="Only print the most expensive sprites.")
+    parser.add_argument("--json", dest="json_path", default=None, help="Also save the report as JSON.")
+    parser.add_argument("--strict", action="store_true", help="Exit with an error if any sprite is over budget.")
+    args = parser.parse_args(argv)
+
+    report = benchmark(read_project(args.project), args.entities, args.checks, args.budget, args.number)
+    print(report.format(args.limit))
+
+    if args.json_path:
+        with open(args.json_path, "w") as file:
+            json.dump(report.to_json(), file, indent=2)
+
+    return 1 if args.strict and any(cost.over_budget for cost in report.costs) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
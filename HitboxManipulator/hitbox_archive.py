@@ -0,0 +1,216 @@
+"""
+A packed binary archive of hitboxes which games can mmap and read without parsing.
+
+Layout (little endian, every section aligned to 8 bytes):
+    # Header: magic, version, entry count and the offsets of the name and vertex sections.
+    # Entry table: one ENTRY_DTYPE record per sprite sorted by the 64-bit hash of its name.
+    # Names: the utf-8 sprite names, used to resolve hash collisions and to list the archive.
+    # Vertices: every hitbox's points as contiguous float32 pairs. The same '2f' layout HitboxData uploads.
+      Sprites with identical points, such as duplicate frames, share a single run of vertices.
+"""
+
+from hashlib import blake2b
+from mmap import mmap, ACCESS_READ
+from struct import Struct
+from typing import Dict, Iterable, Iterator, Mapping, Optional, Tuple, Union
+
+from numpy import dtype as np_dtype, uint64, zeros as np_zeros, frombuffer, argsort, searchsorted
+
+from hitbox_data import HitboxData, SpriteInfo
+
+MAGIC = b"HBXA"
+VERSION = 1
+
+_HEADER = Struct("<4sHHIIQQ")  # magic, version, reserved, entry count, reserved, names offset, vertices offset
+
+ENTRY_DTYPE = np_dtype([
+    ("hash", "<u8"),
+    ("vertex_start", "<u8"),  # index of the first point in the vertex section
+    ("vertex_count", "<u4"),
+    ("name_offset", "<u4"),  # byte offset into the name section
+    ("name_length", "<u4"),
+    ("width", "<u4"),
+    ("height", "<u4"),
+    ("_reserved", "<u4"),
+])
+
+
+def name_hash(name: str) -> int:
+    """
+    The 64-bit hash the archive is keyed by. Games can store this instead of the sprite name.
+    """
+    return int.from_bytes(blake2b(name.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def write_archive(path, hitboxes: Union[Mapping[str, HitboxData], Iterable[Tuple[str, HitboxData]]]):
+    """
+    Write the hitboxes to a binary archive. Each hitbox's points are written straight from its CPU array, once for
+    every distinct set of points. Only the points and sprite_size of each hitbox are read, so the LevelOutlines of
+    hitbox_lod.level_entries can be written alongside them.
+    """
+    if isinstance(hitboxes, Mapping):
+        hitboxes = hitboxes.items()
+    hitboxes = list(hitboxes)
+
+    entries = np_zeros(len(hitboxes), dtype=ENTRY_DTYPE)
+    encoded_names = [name.encode("utf-8") for name, _ in hitboxes]
+
+    # The points of each distinct hitbox, by their bytes, and where they start in the vertex section.
+    vertices: Dict[bytes, int] = {}
+
+    vertex_start, name_offset = 0, 0
+    for index, (name, hitbox) in enumerate(hitboxes):
+        count = len(hitbox.points)
+        points = hitbox.points.astype("<f4", copy=False).tobytes()
+        if points not in vertices:
+            vertices[points] = vertex_start
+            vertex_start += count
+
+        entry = entries[index]
+        entry["hash"] = name_hash(name)
+        entry["vertex_start"] = vertices[points]
+        entry["vertex_count"] = count
+        entry["name_offset"] = name_offset
+        entry["name_length"] = len(encoded_names[index])
+        entry["width"], entry["height"] = hitbox.sprite_size
+
+        name_offset += len(encoded_names[index])
+
+    # Sorting by hash lets readers find a sprite with a binary search.
+    order = argsort(entries["hash"], kind="stable")
+
+    names_offset = _align(_HEADER.size + entries.nbytes)
+    vertices_offset = _align(names_offset + name_offset)
+
+    with open(path, "wb") as file:
+        file.write(_HEADER.pack(MAGIC, VERSION, 0, len(hitboxes), 0, names_offset, vertices_offset))
+        file.write(entries[order].tobytes())
+        file.write(bytes(names_offset - file.tell()))
+        for name in encoded_names:
+            file.write(name)
+        file.write(bytes(vertices_offset - file.tell()))
+        # Dicts keep insertion order, which is the order the vertex starts were given out in.
+        for points in vertices:
+            file.write(points)
+
+
+class HitboxArchive:
+    """
+    A read only, memory mapped view of a hitbox archive. Reading a hitbox returns a zero-copy (n, 2) float32 view
+    into the file. The views can be kept after the archive is closed, the file stays mapped until the last is freed.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self._map = mmap(self._file.fileno(), 0, access=ACCESS_READ)
+
+        magic, version, _, count, _, names_offset, vertices_offset = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a hitbox archive")
+        if version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is version {version} of the hitbox archive, only {VERSION} is supported")
+
+        self._entries = frombuffer(self._map, dtype=ENTRY_DTYPE, count=count, offset=_HEADER.size)
+        self._hashes = self._entries["hash"]
+        self._names_offset = names_offset
+
+        vertex_count = (len(self._map) - vertices_offset) // 8
+        self._vertices = frombuffer(self._map, dtype="<f4", count=vertex_count * 2,
+                                    offset=vertices_offset).reshape(-1, 2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return len(self._entries) if self._map is not None else 0
+
+    def __contains__(self, name: str):
+        return self._find(name) is not None
+
+    def __getitem__(self, name: str):
+        index = self._find(name)
+        if index is None:
+            raise KeyError(name)
+        return self._points(index)
+
+    def __iter__(self) -> Iterator[str]:
+        return self.names()
+
+    def get(self, name: str, default=None):
+        index = self._find(name)
+        return default if index is None else self._points(index)
+
+    def get_by_hash(self, key: int):
+        """
+        Read a hitbox by its precomputed name_hash. If two names share the hash the first is returned.
+        """
+        self._check_open()
+        index = int(searchsorted(self._hashes, uint64(key)))
+        if index < len(self._hashes) and self._hashes[index] == key:
+            return self._points(index)
+        return None
+
+    def names(self) -> Iterator[str]:
+        self._check_open()
+        for index in range(len(self._entries)):
+            yield self._name(index)
+
+    def sprite_size(self, name: str) -> Tuple[int, int]:
+        index = self._find(name)
+        if index is None:
+            raise KeyError(name)
+        entry = self._entries[index]
+        return int(entry["width"]), int(entry["height"])
+
+    def hitbox_data(self, name: str, color: Tuple[float, float, float] = (1.0, 1.0, 1.0)) -> HitboxData:
+        """
+        Copy a hitbox out of the archive into a HitboxData so it can be edited.
+        """
+        return HitboxData(SpriteInfo(self.sprite_size(name), self[name]), color)
+
+    def close(self):
+        if self._map is None:
+            return
+        _map, self._map = self._map, None
+        # The archive's own views have to be released before the map can close.
+        self._entries = self._hashes = self._vertices = None
+        try:
+            _map.close()
+        except BufferError:
+            # The caller still holds views from __getitem__. They keep the map alive, and it is unmapped when the
+            # last of them is freed.
+            pass
+        self._file.close()
+
+    def _check_open(self):
+        if self._map is None:
+            raise ValueError("Reading from a closed hitbox archive")
+
+    def _find(self, name: str) -> Optional[int]:
+        self._check_open()
+        key = uint64(name_hash(name))
+        index = int(searchsorted(self._hashes, key))
+        while index < len(self._hashes) and self._hashes[index] == key:
+            if self._name(index) == name:
+                return index
+            index += 1
+        return None
+
+    def _name(self, index: int) -> str:
+        entry = self._entries[index]
+        start = self._names_offset + int(entry["name_offset"])
+        return self._map[start:start + int(entry["name_length"])].decode("utf-8")
+
+    def _points(self, index: int):
+        entry = self._entries[index]
+        start = int(entry["vertex_start"])
+        return self._vertices[start:start + int(entry["vertex_count"])]
+
+
+def _align(offset: int, alignment: int = 8) -> int:
+    return (offset + alignment - 1) // alignment * alignment
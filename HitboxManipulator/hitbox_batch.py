@@ -0,0 +1,243 @@
+"""
+Processing the hitboxes of a whole game without the editor, so the asset build can regenerate them on a CI machine.
+
+No window or GL context is ever made. A batch is made of up to four steps, each run across a process pool:
+    # generate: trace a hitbox from the alpha of every image in a directory or frame of a sprite sheet. Frames with
+      the same alpha are generated once and share a hitbox.
+    # simplify: remove the vertices of every hitbox which matter least, down to a vertex count or error limit.
+    # validate: check every hitbox is a simple polygon. Any which are not fail the batch.
+    # export: save the hitboxes as a JSON project and/or binary archive, optionally with their levels of detail.
+A saved JSON project can be given instead of images, to simplify, validate or export hitboxes touched up by hand.
+
+Run as a script:
+    python hitbox_batch.py sprites/ --json hitboxes.json --archive hitboxes.hbxa
+    python hitbox_batch.py player.png --frame 32 32 --max-distance 1.5 --target 12 --archive player.hbxa
+    python hitbox_batch.py hitboxes.json --no-export
+Exits with 1 if any hitbox is invalid.
+"""
+
+import pyglet
+
+# The batch never draws anything, so stop pyglet making its hidden window when arcade is imported. This lets it run on
+# machines with no display, such as CI.
+pyglet.options["shadow_window"] = False
+
+import argparse
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, TextIO, Tuple
+
+from hitbox_data import HitboxData
+from hitbox_decomposition import decompose_project, pieces_to_fields
+from hitbox_duplicates import dedupe_jobs, share_hitboxes
+from hitbox_generation import GenerationJob, directory_jobs, sheet_jobs, generate_hitboxes, to_hitbox_data
+from hitbox_io import read_project, write_project
+from hitbox_lod import generate_project_levels, level_entries, levels_to_fields
+from hitbox_archive import write_archive
+from hitbox_simplify import SimplifyReport, simplify_project, summarise
+from hitbox_validation import ValidationReport, validate_project
+from process_pool import unique_hitboxes
+
+
+class BatchResult(NamedTuple):
+    hitboxes: Dict[str, HitboxData]
+    aliases: Dict[str, str]  # duplicate name -> the name it shares a hitbox with
+    reports: Dict[str, ValidationReport]  # empty if the batch was not validated
+
+    @property
+    def invalid(self) -> List[str]:
+        return [name for name, report in self.reports.items() if not report.valid]
+
+
+class Progress:
+    """
+    Shows how far through a step the batch is. On a terminal the line is redrawn in place, otherwise a line is printed
+    every tenth of the way, which keeps build logs short.
+    """
+
+    def __init__(self, label: str, total: int, stream: Optional[TextIO] = sys.stderr):
+        self._label = label
+        self._total = total
+        self._done = 0
+        self._stream = stream
+        self._interactive = stream is not None and stream.isatty()
+        self._shown = -1
+
+    def advance(self, count: int = 1):
+        self._done += count
+        if self._stream is None:
+            return
+
+        if self._interactive:
+            step = self._done * 100 // max(1, self._total)
+            end = ""
+        else:
+            step = self._done * 10 // max(1, self._total)
+            end = "\n"
+        if step != self._shown:
+            self._shown = step
+            start = "\r" if self._interactive else ""
+            self._stream.write(f"{start}{self._label}: {self._done}/{self._total}{end}")
+            self._stream.flush()
+
+    def finish(self):
+        if self._stream is not None and self._interactive:
+            self._stream.write("\n")
+            self._stream.flush()
+
+
+def source_jobs(source, pattern: str = "*.png", frame: Optional[Tuple[int, int]] = None, margin: int = 0,
+                spacing: int = 0) -> List[GenerationJob]:
+    """
+    The generation jobs of a directory of images, a sprite sheet if the frame size is given, or a single image.
+    """
+    path = Path(source)
+    if path.is_dir():
+        return directory_jobs(path, pattern)
+    if frame is not None:
+        return sheet_jobs(path, frame, margin=margin, spacing=spacing)
+    return [GenerationJob(path.name, str(path))]
+
+
+def generate(jobs: Iterable[GenerationJob], threshold: int = 0, epsilon: float = 1.0, dedupe: bool = True,
+             near: bool = False, max_distance: int = 4, workers: Optional[int] = None,
+             stream: Optional[TextIO] = sys.stderr) -> Tuple[Dict[str, HitboxData], Dict[str, str]]:
+    """
+    Generate the hitboxes of every job. Returns the hitboxes in the same order as the jobs, with every duplicate
+    sharing the HitboxData of its original, and the aliases found.
+    """
+    jobs = list(jobs)
+    aliases: Dict[str, str] = {}
+    unique = jobs
+    if dedupe:
+        unique, aliases = dedupe_jobs(jobs, threshold, near, max_distance, workers=workers)
+
+    progress = Progress("generate", len(unique), stream)
+    generated = {}
+    for result in generate_hitboxes(unique, threshold, epsilon, workers):
+        generated.update(to_hitbox_data((result,)))
+        progress.advance()
+    progress.finish()
+
+    shared = share_hitboxes(generated, aliases)
+    return {job.name: shared[job.name] for job in jobs}, aliases
+
+
+def simplify(hitboxes: Dict[str, HitboxData], target: Optional[int] = None, max_area: Optional[float] = None,
+             max_distance: Optional[float] = None, workers: Optional[int] = None,
+             stream: Optional[TextIO] = sys.stderr) -> Dict[str, SimplifyReport]:
+    """
+    Simplify every hitbox in place, giving each sprite the report of the hitbox it uses. Hitboxes shared between
+    sprites are only simplified once.
+    """
+    progress = Progress("simplify", len(unique_hitboxes(hitboxes)), stream)
+    reports = simplify_project(hitboxes, target, max_area, max_distance, workers, progress=progress.advance)
+    progress.finish()
+    return reports
+
+
+def validate_hitboxes(hitboxes: Dict[str, HitboxData], workers: Optional[int] = None,
+                      stream: Optional[TextIO] = sys.stderr) -> Dict[str, ValidationReport]:
+    """
+    Validate every hitbox, giving each sprite the report of the hitbox it uses.
+    """
+    progress = Progress("validate", len(unique_hitboxes(hitboxes)), stream)
+    reports = validate_project(hitboxes, workers, progress=progress.advance)
+    progress.finish()
+    return reports
+
+
+def export(hitboxes: Dict[str, HitboxData], json_path=None, archive_path=None, convex: bool = False,
+           levels: bool = False, coarse_vertices: int = 8, coarse_distance: Optional[float] = 2.0,
+           workers: Optional[int] = None):
+    """
+    Save the hitboxes as a JSON project and/or a binary archive.
+
+    :param convex: Store the convex pieces of every hitbox in the JSON project too.
+    :param levels: Store the levels of detail of every hitbox too, in both the project and the archive.
+    :param coarse_distance: How far the coarse level should move an outline it simplifies, unless coarse_vertices
+                            cannot be reached within it.
+    """
+    _levels = generate_project_levels(hitboxes, coarse_vertices, max_distance=coarse_distance) if levels else None
+
+    if json_path is not None:
+        fields: Dict[str, Dict] = {name: {} for name in hitboxes}
+        if convex:
+            for name, field in pieces_to_fields(decompose_project(hitboxes, workers)).items():
+                fields[name].update(field)
+        if _levels is not None:
+            for name, field in levels_to_fields(_levels).items():
+                fields[name].update(field)
+        write_project(json_path, hitboxes, fields)
+    if archive_path is not None:
+        write_archive(archive_path, level_entries(hitboxes, _levels) if _levels is not None else hitboxes)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Generate, simplify, validate and export hitboxes without a window.")
+    parser.add_argument("source", help="A directory of images, a sprite sheet or image, or a JSON hitbox project.")
+    parser.add_argument("--pattern", default="*.png", help="The images to use from a directory.")
+    parser.add_argument("--frame", type=int, nargs=2, metavar=("WIDTH", "HEIGHT"), default=None,
+                        help="Split the source image into frames of this size.")
+    parser.add_argument("--margin", type=int, default=0, help="Pixels around the edge of the sprite sheet.")
+    parser.add_argument("--spacing", type=int, default=0, help="Pixels between the frames of the sprite sheet.")
+    parser.add_argument("--threshold", type=int, default=0, help="The alpha a pixel needs to be above to count.")
+    parser.add_argument("--epsilon", type=float, default=1.0, help="The simplification used while generating.")
+    parser.add_argument("--no-dedupe", action="store_true", help="Generate duplicate frames separately.")
+    parser.add_argument("--near", action="store_true", help="Also share hitboxes between nearly identical frames.")
+    parser.add_argument("--target", type=int, default=None, help="Simplify every hitbox to this many vertices.")
+    parser.add_argument("--max-area", type=float, default=None,
+                        help="Simplify away vertices whose triangle with their neighbours is smaller than this.")
+    parser.add_argument("--max-distance", type=float, default=None,
+                        help="Simplify as far as possible without moving the outline further than this.")
+    parser.add_argument("--no-validate", action="store_true", help="Skip validation.")
+    parser.add_argument("--allow-empty", action="store_true", help="Do not fail on sprites with no hitbox.")
+    parser.add_argument("--json", dest="json_path", default=None, help="Save the hitboxes as a JSON project.")
+    parser.add_argument("--archive", dest="archive_path", default=None, help="Save the hitboxes as a binary archive.")
+    parser.add_argument("--convex", action="store_true", help="Store the convex pieces in the JSON project.")
+    parser.add_argument("--levels", action="store_true", help="Export the levels of detail of every hitbox too.")
+    parser.add_argument("--coarse-vertices", type=int, default=8, help="The vertex budget of the coarse level.")
+    parser.add_argument("--coarse-distance", type=float, default=2.0,
+                        help="How far the coarse level should move an outline it simplifies. Exceeded if "
+                             "--coarse-vertices cannot be reached within it.")
+    parser.add_argument("--no-export", action="store_true", help="Only check the hitboxes, do not save them.")
+    parser.add_argument("--workers", type=int, default=None, help="Processes to use. 0 runs in this process.")
+    parser.add_argument("--quiet", action="store_true", help="Do not show progress.")
+    args = parser.parse_args(argv)
+
+    stream = None if args.quiet else sys.stderr
+
+    if args.source.endswith(".json"):
+        hitboxes, aliases = dict(read_project(args.source)), {}
+    else:
+        jobs = source_jobs(args.source, args.pattern, args.frame, args.margin, args.spacing)
+        if not jobs:
+            print(f"ERROR: No images found in {args.source}")
+            return 1
+        hitboxes, aliases = generate(jobs, args.threshold, args.epsilon, not args.no_dedupe, args.near,
+                                     workers=args.workers, stream=stream)
+
+    if args.target is not None or args.max_area is not None or args.max_distance is not None:
+        print(summarise(simplify(hitboxes, args.target, args.max_area, args.max_distance, args.workers, stream)))
+
+    result = BatchResult(hitboxes, aliases, {} if args.no_validate else
+                         validate_hitboxes(hitboxes, args.workers, stream))
+
+    invalid = [name for name in result.invalid if not (args.allow_empty and result.hitboxes[name].size == 0)]
+    for name in invalid:
+        if name in result.aliases:
+            continue
+        print(f"INVALID: {name}: {'; '.join(result.reports[name].describe())}")
+
+    if not args.no_export and (args.json_path or args.archive_path):
+        export(hitboxes, args.json_path, args.archive_path, args.convex, args.levels, args.coarse_vertices,
+               args.coarse_distance, args.workers)
+
+    unique = unique_hitboxes(hitboxes)
+    print(f"{len(hitboxes)} sprites, {len(unique)} unique hitboxes, {sum(hitbox.size for hitbox in unique)} points, "
+          f"{len(invalid)} invalid")
+    return 1 if invalid else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,12 +1,12 @@
-from typing import Tuple
-from array import array
+from bisect import bisect_left
+from typing import Tuple, List, NamedTuple, Any, Callable
 
-import numpy as np
-from numpy import float32, frombuffer, insert as np_insert, array as np_array, zeros as np_zeros
+from numpy import float32, int64, uint8, array as np_array, zeros as np_zeros
 
 from arcade.gui import UIWidget, bind, Property
 from arcade import get_window, Texture
-from arcade.gl import BufferDescription
+
+from profiling import profiled
 
 
 class FrameData:
@@ -75,42 +75,381 @@ class FrameData:
         return self.frame_pos[1]
 
 
+class SpriteInfo(NamedTuple):
+    """
+    The parts of an arcade Texture which a HitboxData uses. Lets hitboxes be made without loading the texture.
+    """
+    size: Tuple[int, int]
+    hit_box_points: Any = None
+
+
+class HitboxCollection:
+    """
+    The points of many hitboxes stored struct-of-arrays style, so thousands of hitboxes cost one CPU array and one GPU
+    buffer rather than one of each per hitbox.
+
+    Every hitbox owns a region of the shared point array, found through a table of offsets, lengths and capacities
+    indexed by the hitbox's slot. A hitbox which outgrows its region is moved to a bigger one at the end of the array,
+    and the regions left behind by moved or released hitboxes are reclaimed by `compact` once they make up half the
+    array.
+
+    The CPU array is the source of truth. Edited bytes are recorded as dirty ranges and uploaded to the GPU once a
+    frame by `sync`, so editing never reads back from the GPU and the data can be used without a GL context.
+    """
+
+    _default: "HitboxCollection" = None
+
+    def __init__(self, capacity: int = 1024, slots: int = 64):
+        # 2 32-bit floats for 8 bytes per point
+        self._points_CPU = np_zeros([capacity, 2], dtype=float32)
+        self._end = 0  # Every point from here on is free.
+        self._garbage = 0  # Points in regions which are no longer used.
+
+        # The table, one entry per slot.
+        self._offsets = np_zeros(slots, dtype=int64)
+        self._lengths = np_zeros(slots, dtype=int64)
+        self._capacities = np_zeros(slots, dtype=int64)
+        self._slot_count = 0
+        self._free_slots: List[int] = []
+
+        # Slots released but not yet freed. Hitboxes are released when garbage collected, which can happen in the
+        # middle of another edit, so freeing is left until it is safe. See _collect.
+        self._released: List[int] = []
+
+        # The GPU buffer is only created once it is needed for rendering.
+        self._points_GPU = None
+
+        # Counts every time regions move, so anything holding on to offsets knows to fetch them again.
+        self._layout = 0
+
+        # Byte ranges of the CPU array which have changed since the last sync. Kept sorted and non-overlapping.
+        self._dirty_ranges: List[Tuple[int, int]] = []
+
+    @classmethod
+    def default(cls) -> "HitboxCollection":
+        """
+        The collection hitboxes are stored in when they are not given one.
+        """
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    @property
+    def capacity(self):
+        return len(self._points_CPU)
+
+    @property
+    def used(self):
+        """
+        The number of points in the array which belong to a hitbox region, including their spare capacity.
+        """
+        return self._end - self._garbage
+
+    @property
+    def hitbox_count(self):
+        return self._slot_count - len(self._free_slots) - len(self._released)
+
+    @property
+    def dirty(self):
+        return bool(self._dirty_ranges)
+
+    @property
+    def dirty_ranges(self):
+        return tuple(self._dirty_ranges)
+
+    @property
+    def layout(self):
+        """
+        Changes whenever a region moves, by growing or compaction.
+        """
+        return self._layout
+
+    # -- The table --
+
+    def allocate(self, capacity: int) -> int:
+        """
+        Reserve a region of at least `capacity` points for a new hitbox. Returns its slot.
+        """
+        self._collect()
+        if self._free_slots:
+            slot = self._free_slots.pop()
+        else:
+            slot = self._slot_count
+            self._slot_count += 1
+            if slot == len(self._offsets):
+                self._offsets = _grown(self._offsets, max(8, slot * 2))
+                self._lengths = _grown(self._lengths, max(8, slot * 2))
+                self._capacities = _grown(self._capacities, max(8, slot * 2))
+
+        self._offsets[slot] = self._claim(capacity)
+        self._lengths[slot] = 0
+        self._capacities[slot] = capacity
+        return slot
+
+    def release(self, slot: int):
+        """
+        Give back the region of a hitbox which is no longer used. The region is freed the next time the collection
+        allocates, grows a region or syncs.
+        """
+        self._released.append(slot)
+
+    def offset(self, slot: int) -> int:
+        return int(self._offsets[slot])
+
+    def length(self, slot: int) -> int:
+        return int(self._lengths[slot])
+
+    def region_capacity(self, slot: int) -> int:
+        return int(self._capacities[slot])
+
+    def set_length(self, slot: int, length: int):
+        self._lengths[slot] = length
+
+    def region(self, slot: int):
+        """
+        The whole region of a slot, including the spare capacity after its points.
+        """
+        offset = int(self._offsets[slot])
+        return self._points_CPU[offset:offset + int(self._capacities[slot])]
+
+    def reserve(self, slot: int, capacity: int):
+        """
+        Make sure a slot's region can hold `capacity` points, moving it to a bigger region if it can't. Any region
+        may move, so fetch regions again after calling this.
+        """
+        self._collect()
+        if capacity <= self._capacities[slot]:
+            return
+
+        offset, length = int(self._offsets[slot]), int(self._lengths[slot])
+        if offset + int(self._capacities[slot]) == self._end:
+            # The region is the last in the array so it can just grow in place.
+            if offset + capacity > len(self._points_CPU):
+                self._resize(max(len(self._points_CPU) * 2, offset + capacity))
+            self._end = offset + capacity
+        else:
+            self._free_region(slot)
+            new_offset = self._claim(capacity)
+            self._points_CPU[new_offset:new_offset + length] = self._points_CPU[offset:offset + length]
+            self._offsets[slot] = new_offset
+            self.mark_dirty(new_offset, new_offset + length)
+            self._layout += 1
+        self._capacities[slot] = capacity
+
+    def shrink(self, slot: int, capacity: int):
+        """
+        Cut a slot's region down to `capacity` points. The room given back is reclaimed by the next compaction, or
+        straight away if the region is the last in the array.
+        """
+        capacity = max(capacity, int(self._lengths[slot]))
+        _old = int(self._capacities[slot])
+        if capacity >= _old:
+            return
+
+        offset = int(self._offsets[slot])
+        if offset + _old == self._end:
+            self._end = offset + capacity
+        else:
+            self._garbage += _old - capacity
+        self._capacities[slot] = capacity
+
+    def shrink_to_fit(self):
+        """
+        Cut every region down to its points, compact them, and shrink the CPU array and GPU buffer to match.
+        """
+        self._collect()
+        for slot in range(self._slot_count):
+            if self._capacities[slot]:
+                self.shrink(slot, int(self._lengths[slot]))
+        self.compact()
+        self._resize(max(self._end, 1))
+
+    def compact(self):
+        """
+        Move every region to the start of the array, one after the other, reclaiming the space of released and moved
+        hitboxes. The offsets of the hitboxes change, so everything is uploaded again on the next sync.
+        """
+        live = [slot for slot in range(self._slot_count) if self._capacities[slot]]
+        live.sort(key=lambda _slot: self._offsets[_slot])
+
+        end = 0
+        for slot in live:
+            offset, capacity = int(self._offsets[slot]), int(self._capacities[slot])
+            if offset != end:
+                self._points_CPU[end:end + capacity] = self._points_CPU[offset:offset + capacity]
+                self._offsets[slot] = end
+            end += capacity
+
+        self._end = end
+        self._garbage = 0
+        self._layout += 1
+        self._dirty_ranges.clear()
+        self.mark_dirty(0, end)
+
+    def _claim(self, capacity: int) -> int:
+        offset = self._end
+        if offset + capacity > len(self._points_CPU):
+            self._resize(max(len(self._points_CPU) * 2, offset + capacity))
+        self._end += capacity
+        return offset
+
+    def _resize(self, capacity: int):
+        _points = np_zeros([capacity, 2], dtype=float32)
+        _points[:self._end] = self._points_CPU[:self._end]
+        self._points_CPU = _points
+        if self._points_GPU is not None:
+            # Orphaning keeps the same GL buffer, so the geometry using it stays valid.
+            self._points_GPU.orphan(capacity * 8)
+            self.mark_dirty(0, self._end)
+
+    def _free_region(self, slot: int):
+        offset, capacity = int(self._offsets[slot]), int(self._capacities[slot])
+        if offset + capacity == self._end:
+            self._end = offset
+        else:
+            self._garbage += capacity
+
+    def _collect(self):
+        while self._released:
+            slot = self._released.pop()
+            self._free_region(slot)
+            self._lengths[slot] = 0
+            self._capacities[slot] = 0
+            self._free_slots.append(slot)
+
+        if self._garbage > 256 and self._garbage * 2 > self._end:
+            self.compact()
+
+    # -- Uploading to the GPU --
+
+    def mark_dirty(self, start, end):
+        """
+        Record that the points from start to end (exclusive) of the array have changed. The range is stored in bytes
+        and merged with any ranges it overlaps or touches. Nothing is recorded until there is a GPU buffer, as the
+        whole array is uploaded when it is made.
+        """
+        if start >= end or self._points_GPU is None:
+            return
+        start, end = start * 8, end * 8
+
+        # Binary search for the first range which could touch this one, then merge every range up to its end.
+        _ranges = self._dirty_ranges
+        low = bisect_left(_ranges, (start,))
+        if low and _ranges[low - 1][1] >= start:
+            low -= 1
+        high = low
+        while high < len(_ranges) and _ranges[high][0] <= end:
+            high += 1
+        if low < high:
+            start, end = min(start, _ranges[low][0]), max(end, _ranges[high - 1][1])
+        _ranges[low:high] = [(start, end)]
+
+    def sync(self):
+        """
+        Upload every dirty range to the GPU. Should be called at most once a frame before rendering.
+        """
+        self._collect()
+        if self._points_GPU is None:
+            self._dirty_ranges.clear()
+            return
+        if not self._dirty_ranges:
+            return
+
+        _data = self._points_CPU.view(uint8).reshape(-1)
+        _limit = self._end * 8
+        for start, end in self._dirty_ranges:
+            # Anything past the last region is never rendered so there is no need to upload it.
+            end = min(end, _limit)
+            if start < end:
+                self._points_GPU.write(_data[start:end], start)
+        self._dirty_ranges.clear()
+
+    @property
+    def buffer(self):
+        """
+        The GPU buffer of the whole array as '2f' points, with every change uploaded. A hitbox's points start at its
+        offset. Growing the array orphans the buffer rather than replacing it, so geometries using it stay valid.
+        """
+        if self._points_GPU is None:
+            self._points_GPU = get_window().ctx.buffer(reserve=len(self._points_CPU) * 4 * 2, usage='dynamic')
+
+            # The new buffer is empty so everything has to be uploaded.
+            self.mark_dirty(0, self._end)
+        self.sync()
+        return self._points_GPU
+
+
 class HitboxData:
+    """
+    A lightweight view of one hitbox in a HitboxCollection. The points live in the collection, the view only holds
+    the details of the hitbox itself.
+
+    A hitbox can hold any number of points. Its region grows geometrically as points are added, so appending is
+    amortised O(1), and `shrink_to_fit` gives back the spare room once editing is done.
 
-    def __init__(self, sprite_data: Texture, color: Tuple[float, float, float] = (1.0, 1.0, 1.0), _count: int = 256):
-        _ctx = get_window().ctx
+    :param reserve: The number of points to make room for up front, if more are expected than the sprite has.
+    :param collection: The collection to store the points in. Defaults to HitboxCollection.default().
+    """
 
-        # per point there are 28 bytes. This is to have the position and indies to draw
-        self._points_GPU = _ctx.buffer(reserve=_count * 4 * 2, usage='dynamic')  # 2 32-bit floats for 8 bytes per point
-        self._points_CPU = np_zeros([_count, 2], dtype=float32)
-        self._point_indices = _ctx.buffer(reserve=_count * 4, usage='dynamic')  # 1 32-bit int for 4 bytes per point
+    __slots__ = ('_collection', '_slot', '_insert_point', '_listeners', '_color', '_sprite_size',
+                 '__weakref__')
+
+    def __init__(self, sprite_data: Texture, color: Tuple[float, float, float] = (1.0, 1.0, 1.0), reserve: int = 0,
+                 collection: HitboxCollection = None):
+        self._collection = collection or HitboxCollection.default()
+
+        _points = sprite_data.hit_box_points
+        _length = 0 if _points is None else len(_points)
+        # Leave a little room so the first few added points don't move the hitbox.
+        self._slot = self._collection.allocate(max(reserve, 8, _length + _length // 4))
 
-        self._point_count = 0
         self._insert_point = -1
-        self._max_count = _count
 
-        _point_descriptions = [BufferDescription(self._points_GPU, "2f", ['pos'])]
-        self._point_geometry = _ctx.geometry(_point_descriptions,
-                                             self._point_indices, 4)
+        # Called as listener(index, removed, inserted) after every edit. See add_listener.
+        self._listeners: List[Callable[[int, int, int], None]] = []
 
         self._color = color
         self._sprite_size = sprite_data.size
 
-        if sprite_data.hit_box_points is not None and len(sprite_data.hit_box_points) <= _count:
-            for point in sprite_data.hit_box_points:
-                self.add_point((point[0], point[1]))
+        if _points is not None:
+            self.set_points(_points)
+
+    def __del__(self):
+        self.release()
+
+    def release(self):
+        """
+        Give the hitbox's points back to its collection. The hitbox can't be used after.
+        """
+        if getattr(self, '_slot', None) is not None:
+            self._collection.release(self._slot)
+            self._slot = None
+
+    @property
+    def collection(self):
+        return self._collection
+
+    @property
+    def offset(self):
+        """
+        Where the hitbox's points start in its collection. Changes whenever the hitbox moves to a bigger region or
+        the collection is compacted.
+        """
+        return self._collection.offset(self._slot)
 
     @property
     def size(self):
-        return self._point_count
+        return self._collection.length(self._slot)
 
     @property
     def points(self):
         """
-        WARNING EXPENSIVE OPERATION
+        A read only view of the points currently in the hitbox. Copy it before editing the hitbox if it needs to be
+        kept.
         """
-        print("WARNING EXPENSIVE OPERATION")
-        return frombuffer(self._points_GPU.read(4 * 2 * self._point_count), dtype=float32)
+        _view = self._collection.region(self._slot)[:self.size]
+        _view.flags.writeable = False
+        return _view
 
     @property
     def sprite_size(self):
@@ -132,8 +471,22 @@ class HitboxData:
     def blue(self):
         return self._color[2]
 
+    @property
+    def dirty(self):
+        """
+        Whether the collection has changes which are not uploaded yet.
+        """
+        return self._collection.dirty
+
+    @property
+    def insert_index(self):
+        """
+        The index add_point will insert at.
+        """
+        return self.size if self._insert_point == -1 else self._insert_point
+
     def change_insert_point(self, new_index):
-        if new_index <= self._point_count:
+        if new_index <= self.size:
             self._insert_point = new_index
         else:
             print("Attempting to insert to an index outside the hitbox")
@@ -141,25 +494,129 @@ class HitboxData:
     def reset_insert_point(self):
         self._insert_point = -1
 
+    @profiled()
     def add_point(self, point):
-        if self._point_count < self._max_count:
-            # If the insert point is at the end there is no reason to read from the buffer.
-            if self._insert_point == -1 or self._point_count - self._insert_point == 0:
-                self._points_GPU.write(np_array(point, dtype=float32), self._point_count * 8)
-            else:
-                # we read all values after the insert point and then and the insert point to the start of the array.
-                # This new array is then rewritten to the gpu.
-                shift_data = np_insert(frombuffer(self._points_GPU.read((self._point_count - self._insert_point) * 8,
-                                                                        self._insert_point * 8), dtype=float32),
-                                       0, np_array(point, dtype=float32))
-
-                self._points_GPU.write(shift_data, self._insert_point * 8)
-
-            self._point_indices.write(array('i', (self._point_count,)), self._point_count * 4)
-            self._point_count += 1
-        else:
-            print("ERROR: Max Size Reached")
+        # If there is no insert point then the point is just appended.
+        self.insert_points(self.insert_index, (point,))
+
+    def insert_points(self, index, points):
+        points = np_array(points, dtype=float32).reshape(-1, 2)
+        _count = self.size
+        if not 0 <= index <= _count:
+            print("Attempting to insert to an index outside the hitbox")
+            return
+        self._reserve(_count + len(points))
+        _region = self._collection.region(self._slot)
+
+        # shift every point after the index along, then copy in the new points.
+        _end = _count + len(points)
+        _region[index + len(points):_end] = _region[index:_count]
+        _region[index:index + len(points)] = points
+        self._collection.set_length(self._slot, _end)
+
+        self._mark_dirty(index, _end)
+        self._notify(index, 0, len(points))
+
+    def remove_points(self, index, count=1):
+        _count = self.size
+        if not (0 <= index and index + count <= _count):
+            print("Attempting to remove points outside the hitbox")
+            return
+
+        # shift every point after the removed points back. Only the points up to the new count need uploading.
+        _region = self._collection.region(self._slot)
+        _region[index:_count - count] = _region[index + count:_count]
+        self._collection.set_length(self._slot, _count - count)
+
+        self._mark_dirty(index, _count - count)
+        self._notify(index, count, 0)
+
+    def move_point(self, index, point):
+        self.move_points(index, (point,))
+
+    def move_points(self, index, points):
+        points = np_array(points, dtype=float32).reshape(-1, 2)
+        if not (0 <= index and index + len(points) <= self.size):
+            print("Attempting to move points outside the hitbox")
+            return
+
+        self._collection.region(self._slot)[index:index + len(points)] = points
+        self._mark_dirty(index, index + len(points))
+        self._notify(index, len(points), len(points))
+
+    def transform_points(self, matrix, start=0, stop=None):
+        """
+        Apply a 2D affine transform, given as a 2x3 or 3x3 matrix, to the points from start to stop (exclusive).
+        """
+        stop = self.size if stop is None else stop
+        if not (0 <= start <= stop <= self.size):
+            print("Attempting to transform points outside the hitbox")
+            return
+
+        matrix = np_array(matrix, dtype=float32)
+        _points = self._collection.region(self._slot)[start:stop]
+        _points[:] = _points @ matrix[:2, :2].T + matrix[:2, 2]
+        self._mark_dirty(start, stop)
+        self._notify(start, stop - start, stop - start)
+
+    def set_points(self, points):
+        points = np_array(points, dtype=float32).reshape(-1, 2)
+        _removed = self.size
+        self._reserve(len(points))
+        self._collection.region(self._slot)[:len(points)] = points
+        self._collection.set_length(self._slot, len(points))
+        self._insert_point = -1
+
+        self._mark_dirty(0, len(points))
+        self._notify(0, _removed, len(points))
+
+    def add_listener(self, listener: Callable[[int, int, int], None]):
+        """
+        Listen for edits to the points. After every edit the listener is called with (index, removed, inserted),
+        meaning the `removed` points starting at `index` were replaced by `inserted` points. A move is reported with
+        removed equal to inserted.
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[int, int, int], None]):
+        self._listeners.remove(listener)
+
+    def _notify(self, index, removed, inserted):
+        for listener in self._listeners:
+            listener(index, removed, inserted)
+
+    def _reserve(self, count):
+        # Double the region when it is full, so adding points one at a time rarely moves the hitbox.
+        _capacity = self._collection.region_capacity(self._slot)
+        if count > _capacity:
+            self._collection.reserve(self._slot, max(count, _capacity * 2))
 
     @property
-    def geometry(self):
-        return self._point_geometry
+    def capacity(self):
+        """
+        The number of points the hitbox can hold before its region has to grow.
+        """
+        return self._collection.region_capacity(self._slot)
+
+    def reserve(self, count):
+        """
+        Make room for at least `count` points, so adding up to that many never moves the hitbox.
+        """
+        if count > self.capacity:
+            self._collection.reserve(self._slot, count)
+
+    def shrink_to_fit(self):
+        """
+        Give back any spare room after the hitbox's points to the collection.
+        """
+        self._collection.shrink(self._slot, self.size)
+
+    def _mark_dirty(self, start, end):
+        _offset = self.offset
+        self._collection.mark_dirty(_offset + start, _offset + end)
+
+
+def _grown(table, size: int):
+    _table = np_zeros(size, dtype=table.dtype)
+    _table[:len(table)] = table
+    return _table
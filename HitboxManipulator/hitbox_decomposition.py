@@ -0,0 +1,190 @@
+"""
+Splitting concave hitboxes into convex pieces.
+
+The outline is triangulated by ear clipping, then Hertel-Mehlhorn removes every diagonal which leaves both of its
+end points convex. The result never has more than four times the minimum number of convex pieces, and in practice is
+usually close to it. Convex hitboxes are returned as a single piece without any work.
+"""
+
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+from numpy import ndarray, float64, asarray, roll, ones as np_ones, nonzero
+
+from hitbox_data import HitboxData
+from process_pool import map_hitboxes
+
+
+def is_convex(points) -> bool:
+    points = _counter_clockwise(asarray(points, dtype=float64))
+    return len(points) < 4 or bool((_cross(points) >= 0).all())
+
+
+def decompose(points) -> List[ndarray]:
+    """
+    Split a simple polygon into convex pieces. Each piece is an (n, 2) array of points, counter-clockwise.
+    """
+    points = _counter_clockwise(_clean(asarray(points, dtype=float64)))
+    if len(points) < 3:
+        return []
+    if (_cross(points) >= 0).all():
+        return [points]
+
+    triangles = _triangulate(points)
+    return [points[piece] for piece in _merge(points, triangles)]
+
+
+def decompose_hitbox(hitbox: HitboxData) -> List[ndarray]:
+    return decompose(hitbox.points)
+
+
+def decompose_project(hitboxes: Mapping[str, HitboxData], workers: Optional[int] = None, chunksize: int = 16,
+                      progress: Optional[Callable[[], Any]] = None) -> Dict[str, List[ndarray]]:
+    """
+    Decompose every hitbox of a project across a process pool, with the workers, chunksize and progress of
+    map_hitboxes.
+    """
+    return map_hitboxes(decompose, hitboxes, workers=workers, chunksize=chunksize, progress=progress)
+
+
+def pieces_to_fields(pieces: Mapping[str, List[ndarray]]) -> Dict[str, Dict[str, list]]:
+    """
+    The convex pieces in the form hitbox_io.write_project stores next to each outline.
+    """
+    return {name: {"convex": [piece.tolist() for piece in _pieces]} for name, _pieces in pieces.items()}
+
+
+def _triangulate(points: ndarray) -> List[Tuple[int, int, int]]:
+    # Ear clipping. The remaining polygon is kept as a list of indices into points.
+    remaining = list(range(len(points)))
+    triangles = []
+
+    while len(remaining) > 3:
+        polygon = points[remaining]
+        cross = _cross(polygon)
+        convex = cross > 0
+        reflex = nonzero(~convex)[0]
+
+        ear = None
+        for index in nonzero(convex)[0]:
+            if not _contains_any(polygon, index, reflex):
+                ear = int(index)
+                break
+        if ear is None:
+            # Only happens on degenerate or self-intersecting outlines. Clip the flattest corner so we always finish.
+            ear = int(cross.argmax())
+
+        count = len(remaining)
+        triangles.append((remaining[ear - 1], remaining[ear], remaining[(ear + 1) % count]))
+        del remaining[ear]
+
+    triangles.append(tuple(remaining))
+    return triangles
+
+
+def _contains_any(polygon: ndarray, index: int, candidates: ndarray) -> bool:
+    """
+    Whether any candidate point lies inside or on the triangle made by the vertex at index and its neighbours.
+    """
+    count = len(polygon)
+    previous, following = (index - 1) % count, (index + 1) % count
+    candidates = candidates[(candidates != previous) & (candidates != index) & (candidates != following)]
+    if not len(candidates):
+        return False
+
+    a, b, c = polygon[previous], polygon[index], polygon[following]
+    p = polygon[candidates]
+    d1 = (b[0] - a[0]) * (p[:, 1] - a[1]) - (b[1] - a[1]) * (p[:, 0] - a[0])
+    d2 = (c[0] - b[0]) * (p[:, 1] - b[1]) - (c[1] - b[1]) * (p[:, 0] - b[0])
+    d3 = (a[0] - c[0]) * (p[:, 1] - c[1]) - (a[1] - c[1]) * (p[:, 0] - c[0])
+    return bool(((d1 >= 0) & (d2 >= 0) & (d3 >= 0)).any())
+
+
+def _merge(points: ndarray, triangles: List[Tuple[int, int, int]]) -> List[List[int]]:
+    # Hertel-Mehlhorn. Every edge shared by two pieces is a diagonal, remove it if the merged piece stays convex.
+    pieces: Dict[int, List[int]] = {index: list(triangle) for index, triangle in enumerate(triangles)}
+    owners: Dict[Tuple[int, int], List[int]] = {}
+    for index, triangle in enumerate(triangles):
+        for offset in range(3):
+            start, end = triangle[offset], triangle[(offset + 1) % 3]
+            owners.setdefault((min(start, end), max(start, end)), []).append(index)
+
+    piece_of = list(range(len(triangles)))
+
+    def _find(index):
+        while piece_of[index] != index:
+            piece_of[index] = piece_of[piece_of[index]]
+            index = piece_of[index]
+        return index
+
+    for (i, j), _owners in owners.items():
+        if len(_owners) != 2:
+            continue
+        first, second = _find(_owners[0]), _find(_owners[1])
+        if first == second:
+            continue
+
+        merged = _join(points, pieces[first], pieces[second], i, j)
+        if merged is None:
+            continue
+
+        pieces[first] = merged
+        del pieces[second]
+        piece_of[second] = first
+
+    return list(pieces.values())
+
+
+def _join(points: ndarray, first: List[int], second: List[int], i: int, j: int) -> Optional[List[int]]:
+    # Rotate the first piece so it runs from one end of the diagonal to the other, and the second the opposite way.
+    if not _follows(first, i, j):
+        i, j = j, i
+    a = _rotate(first, j, i)
+    b = _rotate(second, i, j)
+    if a is None or b is None:
+        return None
+
+    merged = a + b[1:-1]
+    if not (_convex_at(points, a[-2], i, b[1]) and _convex_at(points, b[-2], j, a[1])):
+        return None
+    return merged
+
+
+def _follows(piece: List[int], start: int, end: int) -> bool:
+    index = piece.index(start)
+    return piece[(index + 1) % len(piece)] == end
+
+
+def _rotate(piece: List[int], start: int, end: int) -> Optional[List[int]]:
+    index = piece.index(start)
+    rotated = piece[index:] + piece[:index]
+    return rotated if rotated[-1] == end else None
+
+
+def _convex_at(points: ndarray, previous: int, vertex: int, following: int) -> bool:
+    (ax, ay), (bx, by), (cx, cy) = points[previous], points[vertex], points[following]
+    return (bx - ax) * (cy - by) - (by - ay) * (cx - bx) >= 0
+
+
+def _cross(points: ndarray) -> ndarray:
+    # The z of the cross product at each vertex. Positive where a counter-clockwise outline turns left (convex).
+    before = points - roll(points, 1, axis=0)
+    after = roll(points, -1, axis=0) - points
+    return before[:, 0] * after[:, 1] - before[:, 1] * after[:, 0]
+
+
+def _counter_clockwise(points: ndarray) -> ndarray:
+    x, y = points[:, 0], points[:, 1]
+    area = (x * roll(y, -1) - roll(x, -1) * y).sum()
+    return points[::-1].copy() if area < 0 else points
+
+
+def _clean(points: ndarray) -> ndarray:
+    # Repeated and collinear vertices only make zero area triangles.
+    if len(points) < 3:
+        return points
+    keep = np_ones(len(points), dtype=bool)
+    keep &= (points != roll(points, 1, axis=0)).any(axis=1)
+    points = points[keep]
+    if len(points) < 3:
+        return points
+    return points[_cross(points) != 0]
@@ -0,0 +1,151 @@
+"""
+Finding frames which would get the same hitbox, so they can share one.
+
+Only the alpha of a frame decides its hitbox, so idle loops which repeat frames and palette swaps all hash the same.
+Each frame gets a signature of:
+    # exact: a hash of its size and thresholded alpha mask. Frames with the same exact hash have identical hitboxes.
+    # near: its alpha mask shrunk to a small grid of bits. Frames of the same size whose grids differ by only a few
+      bits look the same at a glance, and can optionally share a hitbox too.
+
+Near duplicates are found without comparing every pair of frames. The grid is split into (max_distance + 1) bands, and
+two grids which differ by at most max_distance bits must match exactly in at least one band, so only frames which
+share a band are ever compared.
+
+The first frame of each group is kept as the original and the rest become aliases of it, which generation skips and
+the exporters write as references. The editor's texture cache keys traced hit boxes by the exact hash in the same way,
+so duplicate textures are only traced once.
+"""
+
+from hashlib import blake2b
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple, Union
+
+from PIL import Image
+from numpy import asarray, packbits, uint8
+
+from hitbox_data import HitboxData
+from hitbox_generation import GenerationJob, alpha_mask, job_image
+from process_pool import pool_map
+
+
+class FrameSignature(NamedTuple):
+    size: Tuple[int, int]
+    exact: bytes
+    near: int  # grid * grid bits, row major
+    grid: int
+
+
+def frame_signature(image: Image.Image, threshold: int = 0, grid: int = 16) -> FrameSignature:
+    """
+    :param threshold: The alpha a pixel needs to be above to count, the same as hitbox generation uses.
+    :param grid: The width and height of the near duplicate grid.
+    """
+    mask = alpha_mask(image, threshold)
+
+    # Area average the mask down to the grid, so the bits are where at least half of each block is solid.
+    small = Image.fromarray(mask.astype(uint8) * 255).resize((grid, grid), Image.BOX)
+    bits = packbits(asarray(small) >= 128).tobytes()
+    return FrameSignature(image.size, _exact(image.size, mask), int.from_bytes(bits, "big"), grid)
+
+
+def exact_signature(image: Image.Image, threshold: int = 0) -> bytes:
+    """
+    Only the exact hash of a frame's signature, for when near duplicates aren't wanted.
+    """
+    return _exact(image.size, alpha_mask(image, threshold))
+
+
+def job_signature(job: GenerationJob, threshold: int = 0, grid: int = 16) -> FrameSignature:
+    return frame_signature(job_image(job), threshold, grid)
+
+
+def job_signatures(jobs: Iterable[GenerationJob], threshold: int = 0, grid: int = 16, workers: Optional[int] = None,
+                   chunksize: int = 16) -> Dict[str, FrameSignature]:
+    """
+    The signature of every job, worked out across a process pool by pool_map.
+    """
+    jobs = list(jobs)
+    return dict(zip((job.name for job in jobs),
+                    pool_map(job_signature, jobs, threshold, grid, workers=workers, chunksize=chunksize)))
+
+
+def find_duplicates(signatures: Union[Mapping[str, FrameSignature], Iterable[Tuple[str, FrameSignature]]],
+                    near: bool = False, max_distance: int = 4) -> Dict[str, str]:
+    """
+    Group frames with the same hitbox relevant content. Returns a dict from each duplicate's name to the name of the
+    first frame of its group. Frames which are not duplicates are left out.
+
+    :param near: Also group frames whose near grids differ by at most max_distance bits.
+    """
+    if isinstance(signatures, Mapping):
+        signatures = signatures.items()
+
+    aliases: Dict[str, str] = {}
+    originals: Dict[bytes, str] = {}
+    near_originals: Dict[Tuple, List[Tuple[str, int]]] = {}
+    bands = max_distance + 1
+
+    for name, signature in signatures:
+        original = originals.get(signature.exact)
+        if original is not None:
+            aliases[name] = original
+            continue
+
+        if near:
+            keys = _band_keys(signature, bands)
+            original = _nearest(near_originals, keys, signature.near, max_distance)
+            if original is not None:
+                aliases[name] = original
+                continue
+            for key in keys:
+                near_originals.setdefault(key, []).append((name, signature.near))
+
+        originals[signature.exact] = name
+
+    return aliases
+
+
+def dedupe_jobs(jobs: Iterable[GenerationJob], threshold: int = 0, near: bool = False, max_distance: int = 4,
+                grid: int = 16, workers: Optional[int] = None) -> Tuple[List[GenerationJob], Dict[str, str]]:
+    """
+    Split jobs into the ones which need generating and the aliases of those. Pass the aliases to share_hitboxes once
+    the unique jobs have been generated.
+    """
+    jobs = list(jobs)
+    aliases = find_duplicates(job_signatures(jobs, threshold, grid, workers), near, max_distance)
+    return [job for job in jobs if job.name not in aliases], aliases
+
+
+def share_hitboxes(hitboxes: Mapping[str, HitboxData], aliases: Mapping[str, str]) -> Dict[str, HitboxData]:
+    """
+    Add every alias to the hitboxes, mapped to the very same HitboxData as its original, so an edit to one is an edit
+    to all of them. Aliases which already have a hitbox of their own are replaced.
+    """
+    shared = dict(hitboxes)
+    for alias, original in aliases.items():
+        if original in shared:
+            shared[alias] = shared[original]
+    return shared
+
+
+def _exact(size: Tuple[int, int], mask) -> bytes:
+    digest = blake2b(digest_size=16)
+    digest.update(f"{size[0]}x{size[1]}".encode())
+    digest.update(packbits(mask).tobytes())
+    return digest.digest()
+
+
+def _band_keys(signature: FrameSignature, bands: int) -> List[Tuple]:
+    # Split the bits into equal bands. The key includes the size so only frames of the same size are compared.
+    step = -(-signature.grid ** 2 // bands)
+    return [(signature.size, band, (signature.near >> (band * step)) & ((1 << step) - 1)) for band in range(bands)]
+
+
+def _nearest(buckets: Dict[Tuple, List[Tuple[str, int]]], keys: List[Tuple], bits: int,
+             max_distance: int) -> Optional[str]:
+    best, best_distance = None, max_distance + 1
+    for key in keys:
+        for name, other in buckets.get(key, ()):
+            distance = bin(bits ^ other).count("1")
+            if distance < best_distance:
+                best, best_distance = name, distance
+    return best
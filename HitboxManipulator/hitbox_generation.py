@@ -0,0 +1,253 @@
+"""
+Automatic hitbox generation from the alpha channel of sprites.
+
+Every frame goes through three steps:
+    # Threshold the alpha channel into a mask (vectorised numpy).
+    # Trace the outline of the mask along the pixel edges, keeping the loop which encloses the most area.
+    # Simplify the outline with Douglas-Peucker so only the vertices which matter are kept.
+
+Frames are described by a GenerationJob so they can be sent to a process pool without pickling image data.
+"""
+
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from PIL import Image
+from numpy import (ndarray, float32, float64, bool_, asarray, zeros as np_zeros, empty as np_empty, pad as np_pad,
+                   nonzero, roll, abs as np_abs, argmax)
+
+from hitbox_data import HitboxData, SpriteInfo
+from process_pool import pool_map
+
+
+class GenerationJob(NamedTuple):
+    name: str
+    path: str
+    box: Optional[Tuple[int, int, int, int]] = None  # (left, top, right, bottom) crop for sprite sheets.
+
+
+class GeneratedHitbox(NamedTuple):
+    name: str
+    size: Tuple[int, int]
+    points: ndarray  # (n, 2) float32 points centred on the sprite, y up. The same layout HitboxData uses.
+
+
+def directory_jobs(path, pattern: str = "*.png") -> List[GenerationJob]:
+    """
+    One job for every image in a directory (recursively). The names are the paths relative to the directory.
+    """
+    root = Path(path)
+    return [GenerationJob(file.relative_to(root).as_posix(), str(file)) for file in sorted(root.rglob(pattern))]
+
+
+def sheet_jobs(path, frame_size: Tuple[int, int], count: Optional[int] = None,
+               margin: int = 0, spacing: int = 0) -> List[GenerationJob]:
+    """
+    One job for every frame of a sprite sheet, read left to right and top to bottom.
+
+    :param path: The sprite sheet image.
+    :param frame_size: The width and height of a single frame in pixels.
+    :param count: The number of frames to use. Defaults to every frame that fits in the sheet.
+    :param margin: Pixels around the edge of the sheet.
+    :param spacing: Pixels between each frame.
+    """
+    with Image.open(path) as sheet:
+        sheet_width, sheet_height = sheet.size
+
+    width, height = frame_size
+    columns = max(0, (sheet_width - 2 * margin + spacing) // (width + spacing))
+    rows = max(0, (sheet_height - 2 * margin + spacing) // (height + spacing))
+    count = columns * rows if count is None else min(count, columns * rows)
+
+    stem = Path(path).stem
+    jobs = []
+    for index in range(count):
+        left = margin + (index % columns) * (width + spacing)
+        top = margin + (index // columns) * (height + spacing)
+        jobs.append(GenerationJob(f"{stem}_{index}", str(path), (left, top, left + width, top + height)))
+    return jobs
+
+
+def alpha_mask(image: Image.Image, threshold: int = 0) -> ndarray:
+    """
+    A boolean mask of every pixel with an alpha greater than the threshold. Row 0 is the top of the image.
+    """
+    return asarray(image.convert("RGBA"))[..., 3] > threshold
+
+
+def trace_outline(mask: ndarray) -> ndarray:
+    """
+    Trace the outline of the mask along the edges of its pixels. The loop enclosing the largest area is returned
+    as an (n, 2) array of pixel corner coordinates (x right, y down) with the collinear vertices removed.
+    Pixels which only touch diagonally are split into separate loops at the corner they share, so the outline never
+    visits a vertex twice or crosses itself.
+    """
+    height, width = mask.shape
+    if not mask.any():
+        return np_empty((0, 2), dtype=float64)
+
+    padded = np_pad(mask, 1).astype(bool_)
+    inside = padded[1:-1, 1:-1]
+
+    # Each boundary edge goes around its pixel clockwise on screen, so the outside of a shape is always to the left.
+    # Vertices are encoded as y * (width + 1) + x for fast lookups.
+    stride = width + 1
+    edges: Dict[int, List[int]] = {}
+
+    def _add(rows, columns, start, end):
+        for r, c in zip(rows.tolist(), columns.tolist()):
+            edges.setdefault((r + start[1]) * stride + c + start[0], []).append((r + end[1]) * stride + c + end[0])
+
+    _add(*nonzero(inside & ~padded[:-2, 1:-1]), (0, 0), (1, 0))  # top
+    _add(*nonzero(inside & ~padded[1:-1, 2:]), (1, 0), (1, 1))  # right
+    _add(*nonzero(inside & ~padded[2:, 1:-1]), (1, 1), (0, 1))  # bottom
+    _add(*nonzero(inside & ~padded[1:-1, :-2]), (0, 1), (0, 0))  # left
+
+    best_loop, best_area = None, 0.0
+    while edges:
+        start = next(iter(edges))
+        loop = [start]
+        previous, current = None, start
+        while True:
+            outgoing = edges[current]
+            if len(outgoing) > 1 and previous is not None:
+                # Two shapes touch diagonally here. Turning right stays on the pixel the loop came along, so each
+                # shape is traced as a loop of its own rather than pinched together at this corner.
+                _in = _direction(previous, current, stride)
+                following = max(outgoing, key=lambda _next: _turn(_in, _direction(current, _next, stride)))
+                outgoing.remove(following)
+            else:
+                following = outgoing.pop()
+            if not outgoing:
+                del edges[current]
+
+            previous, current = current, following
+            if current == start:
+                break
+            loop.append(current)
+
+        points = np_empty((len(loop), 2), dtype=float64)
+        points[:, 0] = [vertex % stride for vertex in loop]
+        points[:, 1] = [vertex // stride for vertex in loop]
+        area = _signed_area(points)
+        if area > best_area:
+            best_loop, best_area = points, area
+
+    if best_loop is None:
+        return np_empty((0, 2), dtype=float64)
+    return _remove_collinear(best_loop)
+
+
+def simplify_outline(points: ndarray, epsilon: float = 1.0) -> ndarray:
+    """
+    Douglas-Peucker simplification of a closed outline. No removed vertex is further than epsilon from the result.
+    """
+    count = len(points)
+    if count <= 3 or epsilon <= 0:
+        return points
+
+    # Split the loop at the vertex furthest from the first so each half is an open polyline.
+    split = int(argmax(((points - points[0]) ** 2).sum(axis=1)))
+    keep = np_zeros(count, dtype=bool_)
+    keep[0] = keep[split] = True
+
+    stack = [(0, split), (split, count)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        start, end = points[first], points[last % count]
+        between = points[first + 1:last]
+        direction = end - start
+        length = (direction ** 2).sum() ** 0.5
+        if length == 0.0:
+            distances = (((between - start) ** 2).sum(axis=1)) ** 0.5
+        else:
+            distances = np_abs(direction[0] * (between[:, 1] - start[1]) -
+                               direction[1] * (between[:, 0] - start[0])) / length
+        furthest = int(argmax(distances))
+        if distances[furthest] > epsilon:
+            index = first + 1 + furthest
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+
+    return points[keep]
+
+
+def generate_hitbox(image: Image.Image, threshold: int = 0, epsilon: float = 1.0) -> ndarray:
+    """
+    Generate the hitbox points for a single image. The points are centred on the image with y up, ready to be given
+    to a HitboxData. An image with no opaque pixels gives no points.
+    """
+    outline = trace_outline(alpha_mask(image, threshold))
+    outline = simplify_outline(outline, epsilon)
+    if len(outline) < 3:
+        return np_empty((0, 2), dtype=float32)
+
+    width, height = image.size
+    points = np_empty(outline.shape, dtype=float32)
+    points[:, 0] = outline[:, 0] - width / 2
+    points[:, 1] = height / 2 - outline[:, 1]
+    # Flipping y reverses the winding, so reverse the order to keep the outline counter-clockwise.
+    return points[::-1].copy()
+
+
+def generate_hitboxes(jobs: Iterable[GenerationJob], threshold: int = 0, epsilon: float = 1.0,
+                      workers: Optional[int] = None, chunksize: int = 16) -> Iterator[GeneratedHitbox]:
+    """
+    Generate the hitboxes for every job across a process pool, see pool_map for the workers and chunksize. The
+    results are yielded in the same order as the jobs as soon as they are ready.
+    """
+    return pool_map(_generate_job, jobs, threshold, epsilon, workers=workers, chunksize=chunksize)
+
+
+def to_hitbox_data(generated: Iterable[GeneratedHitbox],
+                   color: Tuple[float, float, float] = (1.0, 1.0, 1.0)) -> Dict[str, HitboxData]:
+    """
+    Load generated hitboxes into HitboxData so they can be touched up in the editor.
+    """
+    return {result.name: HitboxData(SpriteInfo(result.size, result.points), color) for result in generated}
+
+
+def job_image(job: GenerationJob) -> Image.Image:
+    """
+    The RGBA image of a job's frame.
+    """
+    image = _open_image(job.path)
+    return image if job.box is None else image.crop(job.box)
+
+
+def _generate_job(job: GenerationJob, threshold: int, epsilon: float) -> GeneratedHitbox:
+    image = job_image(job)
+    return GeneratedHitbox(job.name, image.size, generate_hitbox(image, threshold, epsilon))
+
+
+@lru_cache(maxsize=4)
+def _open_image(path: str) -> Image.Image:
+    # Sprite sheets are opened once per process rather than once per frame.
+    with Image.open(path) as image:
+        return image.convert("RGBA")
+
+
+def _direction(start: int, end: int, stride: int) -> Tuple[int, int]:
+    return end % stride - start % stride, end // stride - start // stride
+
+
+def _turn(incoming: Tuple[int, int], outgoing: Tuple[int, int]) -> int:
+    # Positive for a right turn on screen (y down).
+    return incoming[0] * outgoing[1] - incoming[1] * outgoing[0]
+
+
+def _signed_area(points: ndarray) -> float:
+    # Positive for loops which are clockwise on screen, which the outer edge of every shape is.
+    x, y = points[:, 0], points[:, 1]
+    return float((x * roll(y, -1) - roll(x, -1) * y).sum() / 2)
+
+
+def _remove_collinear(points: ndarray) -> ndarray:
+    before = points - roll(points, 1, axis=0)
+    after = roll(points, -1, axis=0) - points
+    cross = before[:, 0] * after[:, 1] - before[:, 1] * after[:, 0]
+    return points[cross != 0]
@@ -0,0 +1,324 @@
+"""
+Undo and redo for hitbox edits.
+
+Every edit made through a HitboxHistory is recorded as a delta which only holds the points it changed, so the memory
+used by a step, and the time to undo or redo it, is proportional to the number of changed points rather than the
+size of the hitbox. The history has a memory cap, once it is reached the oldest steps are forgotten first.
+"""
+
+from abc import ABC, abstractmethod
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, List, Optional
+
+from numpy import ndarray, float32, array as np_array
+
+from hitbox_data import HitboxData
+
+# A rough count of the bytes a delta uses on top of its point arrays.
+_DELTA_OVERHEAD = 96
+
+
+class _Delta(ABC):
+    __slots__ = ('hitbox',)
+
+    def __init__(self, hitbox: HitboxData):
+        self.hitbox = hitbox
+
+    @property
+    def nbytes(self) -> int:
+        return _DELTA_OVERHEAD
+
+    @abstractmethod
+    def undo(self):
+        ...
+
+    @abstractmethod
+    def redo(self):
+        ...
+
+
+class _Insert(_Delta):
+    __slots__ = ('index', 'points')
+
+    def __init__(self, hitbox: HitboxData, index: int, points: ndarray):
+        super().__init__(hitbox)
+        self.index = index
+        self.points = points
+
+    @property
+    def nbytes(self):
+        return _DELTA_OVERHEAD + self.points.nbytes
+
+    def undo(self):
+        self.hitbox.remove_points(self.index, len(self.points))
+
+    def redo(self):
+        self.hitbox.insert_points(self.index, self.points)
+
+
+class _Remove(_Insert):
+    __slots__ = ()
+
+    def undo(self):
+        super().redo()
+
+    def redo(self):
+        super().undo()
+
+
+class _Move(_Delta):
+    """
+    Holds the points before and after they were moved.
+    """
+    __slots__ = ('index', 'old', 'new')
+
+    def __init__(self, hitbox: HitboxData, index: int, old: ndarray, new: ndarray):
+        super().__init__(hitbox)
+        self.index = index
+        self.old = old
+        self.new = new
+
+    @property
+    def nbytes(self):
+        return _DELTA_OVERHEAD + self.old.nbytes + self.new.nbytes
+
+    def undo(self):
+        self.hitbox.move_points(self.index, self.old)
+
+    def redo(self):
+        self.hitbox.move_points(self.index, self.new)
+
+
+class _Transform(_Move):
+    """
+    A bulk transform of a run of points. Undone the same way as a move, but a drag is never folded into it.
+    """
+    __slots__ = ()
+
+
+class _Replace(_Delta):
+    __slots__ = ('old', 'new')
+
+    def __init__(self, hitbox: HitboxData, old: ndarray, new: ndarray):
+        super().__init__(hitbox)
+        self.old = old
+        self.new = new
+
+    @property
+    def nbytes(self):
+        return _DELTA_OVERHEAD + self.old.nbytes + self.new.nbytes
+
+    def undo(self):
+        self.hitbox.set_points(self.old)
+
+    def redo(self):
+        self.hitbox.set_points(self.new)
+
+
+class _Step:
+    """
+    The deltas undone and redone together as one user action.
+    """
+    __slots__ = ('deltas', 'nbytes')
+
+    def __init__(self):
+        self.deltas: List[_Delta] = []
+        self.nbytes = 0
+
+    def add(self, delta: _Delta):
+        self.deltas.append(delta)
+        self.nbytes += delta.nbytes
+
+    def undo(self):
+        for delta in reversed(self.deltas):
+            delta.undo()
+
+    def redo(self):
+        for delta in self.deltas:
+            delta.redo()
+
+
+class HitboxHistory:
+    """
+    Makes edits to HitboxData and records them so they can be undone and redone.
+
+    :param memory_cap: The most bytes the recorded steps may use. The oldest steps are evicted first.
+    :param max_steps: An optional limit on the number of undo steps kept.
+    """
+
+    def __init__(self, memory_cap: int = 16 * 1024 * 1024, max_steps: Optional[int] = None):
+        self._memory_cap = memory_cap
+        self._max_steps = max_steps
+
+        self._undo: Deque[_Step] = deque()
+        self._redo: List[_Step] = []
+        self._memory = 0
+
+        self._group: Optional[_Step] = None
+        self._group_depth = 0
+
+        # The move a following move may be merged into. Only the last move made by move_points, and only until any
+        # other command, so a drag can never fold into an earlier edit.
+        self._merge_target: Optional[_Move] = None
+
+    @property
+    def memory(self):
+        return self._memory
+
+    @property
+    def memory_cap(self):
+        return self._memory_cap
+
+    @memory_cap.setter
+    def memory_cap(self, value):
+        self._memory_cap = value
+        self._evict()
+
+    @property
+    def can_undo(self):
+        return bool(self._undo)
+
+    @property
+    def can_redo(self):
+        return bool(self._redo)
+
+    @property
+    def undo_steps(self):
+        return len(self._undo)
+
+    @property
+    def redo_steps(self):
+        return len(self._redo)
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
+        self._memory = 0
+        self._merge_target = None
+
+    @contextmanager
+    def group(self):
+        """
+        Every edit made inside the context is undone and redone as a single step.
+        """
+        if self._group_depth == 0:
+            self._group = _Step()
+            self._merge_target = None
+        self._group_depth += 1
+        try:
+            yield self
+        finally:
+            self._group_depth -= 1
+            if self._group_depth == 0:
+                self._merge_target = None
+                step, self._group = self._group, None
+                if step.deltas:
+                    self._push(step)
+
+    def undo(self) -> bool:
+        self._merge_target = None
+        if not self._undo:
+            return False
+        step = self._undo.pop()
+        step.undo()
+        self._redo.append(step)
+        return True
+
+    def redo(self) -> bool:
+        self._merge_target = None
+        if not self._redo:
+            return False
+        step = self._redo.pop()
+        step.redo()
+        self._undo.append(step)
+        return True
+
+    # -- Edits --
+
+    def add_point(self, hitbox: HitboxData, point):
+        self.insert_points(hitbox, hitbox.insert_index, (point,))
+
+    def insert_points(self, hitbox: HitboxData, index: int, points):
+        points = np_array(points, dtype=float32).reshape(-1, 2)
+        _size = hitbox.size
+        hitbox.insert_points(index, points)
+        if hitbox.size == _size + len(points):
+            self._record(_Insert(hitbox, index, points))
+
+    def remove_points(self, hitbox: HitboxData, index: int, count: int = 1):
+        if not (0 <= index and index + count <= hitbox.size):
+            hitbox.remove_points(index, count)
+            return
+        removed = hitbox.points[index:index + count].copy()
+        hitbox.remove_points(index, count)
+        self._record(_Remove(hitbox, index, removed))
+
+    def move_point(self, hitbox: HitboxData, index: int, point, merge: bool = False):
+        self.move_points(hitbox, index, (point,), merge)
+
+    def move_points(self, hitbox: HitboxData, index: int, points, merge: bool = False):
+        """
+        :param merge: Fold the move into the last command if it was a move of the same points, such as while dragging.
+        """
+        points = np_array(points, dtype=float32).reshape(-1, 2)
+        if not (0 <= index and index + len(points) <= hitbox.size):
+            hitbox.move_points(index, points)
+            return
+
+        target = self._merge_target
+        if (merge and target is not None and target.hitbox is hitbox and target.index == index
+                and len(target.new) == len(points)):
+            hitbox.move_points(index, points)
+            target.new = points
+            return
+
+        old = hitbox.points[index:index + len(points)].copy()
+        hitbox.move_points(index, points)
+        delta = _Move(hitbox, index, old, points)
+        self._record(delta)
+        self._merge_target = delta
+
+    def transform_points(self, hitbox: HitboxData, matrix, start: int = 0, stop: Optional[int] = None):
+        stop = hitbox.size if stop is None else stop
+        if not (0 <= start <= stop <= hitbox.size):
+            hitbox.transform_points(matrix, start, stop)
+            return
+
+        old = hitbox.points[start:stop].copy()
+        hitbox.transform_points(matrix, start, stop)
+        self._record(_Transform(hitbox, start, old, hitbox.points[start:stop].copy()))
+
+    def set_points(self, hitbox: HitboxData, points):
+        points = np_array(points, dtype=float32).reshape(-1, 2)
+        old = hitbox.points.copy()
+        hitbox.set_points(points)
+        if hitbox.size == len(points):
+            self._record(_Replace(hitbox, old, points))
+
+    # -- Internals --
+
+    def _record(self, delta: _Delta):
+        self._merge_target = None
+        if self._group is not None:
+            self._group.add(delta)
+            return
+
+        step = _Step()
+        step.add(delta)
+        self._push(step)
+
+    def _push(self, step: _Step):
+        # A new edit makes the redo steps unreachable.
+        for _step in self._redo:
+            self._memory -= _step.nbytes
+        self._redo.clear()
+
+        self._undo.append(step)
+        self._memory += step.nbytes
+        self._evict()
+
+    def _evict(self):
+        while self._undo and (self._memory > self._memory_cap or
+                              (self._max_steps is not None and len(self._undo) > self._max_steps)):
+            self._memory -= self._undo.popleft().nbytes
@@ -0,0 +1,217 @@
+"""
+Streaming JSON import and export of hitbox projects.
+
+The writer emits one sprite per line as soon as it is given, and the reader decodes one sprite at a time, so a
+project of any size is saved and loaded in constant memory. The file is still plain JSON for diffs and review:
+
+{
+  "version": 1,
+  "hitboxes": {
+    "sprite.png": {"size": [64, 80], "color": [1.0, 1.0, 0.0], "points": [[-4.0, 33.0], [-14.0, 32.0], ...]},
+    "sprite_copy.png": {"ref": "sprite.png"},
+    ...
+  }
+}
+
+Sprites which share a single HitboxData, such as duplicate frames, are written once and referenced by name after.
+"""
+
+import json
+from typing import Any, Dict, Iterable, Iterator, Mapping, Optional, TextIO, Tuple, Union
+
+from hitbox_data import HitboxData, SpriteInfo
+
+VERSION = 1
+
+
+class HitboxWriter:
+    """
+    Writes the hitboxes of a project one at a time. Use as a context manager, or call close, to finish the file.
+    """
+
+    def __init__(self, file: TextIO):
+        self._file = file
+        self._count = 0
+        self._closed = False
+
+        self._file.write(f'{{\n  "version": {VERSION},\n  "hitboxes": {{')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def count(self):
+        return self._count
+
+    def write(self, name: str, hitbox: HitboxData, **fields: Any):
+        """
+        Write a single hitbox. Any extra fields are stored next to the points.
+        """
+        points = ", ".join(f"[{x}, {y}]" for x, y in hitbox.points)
+        line = (f'{json.dumps(name)}: {{"size": {json.dumps(list(hitbox.sprite_size))}, '
+                f'"color": {json.dumps(list(hitbox.color))}, "points": [{points}]')
+        for key, value in fields.items():
+            line += f", {json.dumps(key)}: {json.dumps(value)}"
+
+        self._file.write(f'{"," if self._count else ""}\n    {line}}}')
+        self._count += 1
+
+    def write_ref(self, name: str, original: str):
+        """
+        Write a sprite which shares the hitbox of one already written.
+        """
+        self._file.write(f'{"," if self._count else ""}\n    {json.dumps(name)}: {{"ref": {json.dumps(original)}}}')
+        self._count += 1
+
+    def close(self):
+        if not self._closed:
+            self._file.write("\n  }\n}\n" if self._count else "}\n}\n")
+            self._closed = True
+
+
+def write_project(path, hitboxes: Union[Mapping[str, HitboxData], Iterable[Tuple[str, HitboxData]]],
+                  fields: Optional[Mapping[str, Mapping[str, Any]]] = None) -> int:
+    """
+    Save every hitbox to a JSON project file. Returns the number of hitboxes written. A HitboxData given under more
+    than one name is written under the first and referenced by the rest.
+
+    :param fields: Extra fields to store with each hitbox, by sprite name. Such as its convex pieces.
+    """
+    if isinstance(hitboxes, Mapping):
+        hitboxes = hitboxes.items()
+
+    written: Dict[int, str] = {}
+    with open(path, "w", encoding="utf-8") as file, HitboxWriter(file) as writer:
+        for name, hitbox in hitboxes:
+            if id(hitbox) in written:
+                writer.write_ref(name, written[id(hitbox)])
+                continue
+            writer.write(name, hitbox, **(fields or {}).get(name, {}))
+            written[id(hitbox)] = name
+        return writer.count
+
+
+def read_entries(file: TextIO, chunk_size: int = 1 << 16) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Decode the hitboxes of a project one at a time as (name, entry) pairs, where entry is the decoded JSON object.
+    Only a single entry is ever held in memory so the file can be far larger than the memory available.
+    """
+    decoder = _StreamDecoder(file, chunk_size)
+
+    decoder.expect("{")
+    if decoder.next_is("}"):
+        return
+
+    while True:
+        key = decoder.value()
+        decoder.expect(":")
+        if key == "hitboxes":
+            decoder.expect("{")
+            if not decoder.next_is("}"):
+                while True:
+                    name = decoder.value()
+                    decoder.expect(":")
+                    yield name, decoder.value()
+                    if decoder.next_is("}"):
+                        break
+                    decoder.expect(",")
+        else:
+            version = decoder.value()
+            if key == "version" and version > VERSION:
+                raise ValueError(f"Hitbox project version {version} is newer than the supported version {VERSION}")
+
+        if decoder.next_is("}"):
+            return
+        decoder.expect(",")
+
+
+def read_project(path, color: Optional[Tuple[float, float, float]] = None) -> Iterator[Tuple[str, HitboxData]]:
+    """
+    Load the hitboxes of a JSON project file one at a time into HitboxData. A referenced sprite is given the very
+    same HitboxData as the sprite it references, so each hitbox read is remembered until the file is finished.
+
+    :param color: Overrides the colour stored in the file.
+    """
+    loaded: Dict[str, HitboxData] = {}
+    with open(path, "r", encoding="utf-8") as file:
+        for name, entry in read_entries(file):
+            if "ref" in entry:
+                if entry["ref"] not in loaded:
+                    raise ValueError(f"Malformed hitbox project: {name!r} references unknown sprite {entry['ref']!r}")
+                hitbox = loaded[entry["ref"]]
+            else:
+                hitbox = entry_to_hitbox_data(entry, color)
+            loaded[name] = hitbox
+            yield name, hitbox
+
+
+def entry_to_hitbox_data(entry: Dict[str, Any], color: Optional[Tuple[float, float, float]] = None) -> HitboxData:
+    return HitboxData(SpriteInfo(tuple(entry["size"]), entry["points"] or None),
+                      color or tuple(entry.get("color", (1.0, 1.0, 1.0))))
+
+
+class _StreamDecoder:
+    """
+    Decodes JSON values one at a time from a file, only reading as much of the file as the next value needs.
+    """
+
+    def __init__(self, file: TextIO, chunk_size: int):
+        self._file = file
+        self._chunk_size = chunk_size
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        chunk = self._file.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        # Drop everything already decoded so the buffer never holds more than the current value.
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _skip_whitespace(self):
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in " \t\r\n":
+                self._pos += 1
+            if self._pos < len(self._buffer) or not self._fill():
+                return
+
+    def next_is(self, char: str) -> bool:
+        """
+        Consume the next character if it is the one given.
+        """
+        self._skip_whitespace()
+        if self._buffer[self._pos:self._pos + 1] == char:
+            self._pos += 1
+            return True
+        return False
+
+    def expect(self, char: str):
+        if not self.next_is(char):
+            found = self._buffer[self._pos:self._pos + 1] or "end of file"
+            raise ValueError(f"Malformed hitbox project: expected {char!r} but found {found!r}")
+
+    def value(self):
+        self._skip_whitespace()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                # The value continues past the end of the buffer.
+                if self._fill():
+                    continue
+                raise
+            # A number at the very end of the buffer may have been cut short.
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
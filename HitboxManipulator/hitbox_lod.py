@@ -0,0 +1,336 @@
+"""
+Levels of detail for hitboxes, so games can use cheap checks on distant or crowded entities and precise ones up close.
+
+Every sprite gets four levels, from coarsest to finest:
+    # bbox: the bounding box of the outline.
+    # hull: the convex hull of the outline.
+    # coarse: the outline with its smallest dents filled in, down to a vertex budget.
+    # full: the hand-edited outline itself.
+Every level must be guaranteed to contain the finer ones, so a miss against any level is a miss against every finer
+level and a game can stop at the first miss.
+
+The coarse level first removes reflex vertices. Removing a reflex vertex adds the triangle it made with its neighbours
+to the outline, and one is only removed if no other vertex is inside that triangle, so the outline only ever grows and
+stays a simple polygon. Filling dents alone never gets below the hull, so once none are left, or the ones left cannot be
+filled, and the outline is still over budget, its convex hull is simplified like any other outline and each edge is
+pushed out by the distance the simplification moved it. That first tries to stay within a max distance of the
+outline, except at the tips of corners sharper than 60 degrees, but the vertex budget always wins. The pushed out
+coarse level can stick out past the convex hull of the outline, so the hull and bbox levels are built around the
+coarse level, not the outline, to keep each level inside the next.
+
+Levels are exported next to the outline. In JSON projects they are stored as a "levels" field of each hitbox, and in
+archives as extra entries named "<sprite>@<level>", so games look them up by name hash like any other hitbox.
+"""
+
+from heapq import heapify, heappush, heappop
+from math import floor
+from typing import Dict, Iterator, List, Mapping, NamedTuple, Optional, Set, Tuple, Union
+
+from numpy import (ndarray, float32, float64, bool_, asarray, array as np_array, roll, sqrt, empty as np_empty,
+                   ones as np_ones)
+
+from hitbox_data import HitboxData
+from hitbox_simplify import simplify
+
+LEVELS = ('bbox', 'hull', 'coarse', 'full')
+
+
+class HitboxLevels(NamedTuple):
+    bbox: ndarray
+    hull: ndarray
+    coarse: ndarray
+    full: ndarray
+
+    def level(self, name: str) -> ndarray:
+        return getattr(self, name)
+
+
+class LevelOutline(NamedTuple):
+    """
+    The points of a level with the size of its sprite, which is all hitbox_archive.write_archive needs of a hitbox.
+    """
+    points: ndarray
+    sprite_size: Tuple[int, int]
+
+
+def bounding_box(points) -> ndarray:
+    """
+    The bounding box of an outline as four counter-clockwise points.
+    """
+    points = asarray(points, dtype=float32).reshape(-1, 2)
+    if not len(points):
+        return np_empty((0, 2), dtype=float32)
+    (left, bottom), (right, top) = points.min(axis=0), points.max(axis=0)
+    return np_array(((left, bottom), (right, bottom), (right, top), (left, top)), dtype=float32)
+
+
+def convex_hull(points) -> ndarray:
+    """
+    The convex hull of an outline, counter-clockwise, using Andrew's monotone chain.
+    """
+    points = asarray(points, dtype=float64).reshape(-1, 2)
+    unique = sorted(set(map(tuple, points.tolist())))
+    if len(unique) < 3:
+        return asarray(unique, dtype=float32).reshape(-1, 2)
+
+    def _half(ordered: List[Tuple[float, float]]) -> List[Tuple[float, float]]:
+        chain = []
+        for point in ordered:
+            while len(chain) >= 2 and _cross(chain[-2], chain[-1], point) <= 0:
+                chain.pop()
+            chain.append(point)
+        return chain[:-1]
+
+    return asarray(_half(unique) + _half(unique[::-1]), dtype=float32)
+
+
+def fill_outline(points, target: int = 8, max_added_area: Optional[float] = None,
+                 max_distance: Optional[float] = 2.0) -> ndarray:
+    """
+    Fill in the dents of an outline, smallest first, until it has no more than target points or no more can be filled.
+    If it is still over target, its convex hull is simplified the rest of the way and pushed out to cover what was cut
+    off. The result always contains the original outline and never has more than target points, or 3 if target is
+    lower.
+
+    :param max_added_area: The largest area filling a single dent may add, in square pixels, before what is left is
+                           done on the hull.
+    :param max_distance: How far the result should stick out from the outline once it is simplified, in pixels, except
+                         at the tips of sharp corners. It is exceeded if target cannot be reached within it, and None
+                         only limits the number of points.
+    """
+    points = asarray(points, dtype=float64).reshape(-1, 2)
+    count = len(points)
+    if count <= max(3, target):
+        return points.astype(float32)
+
+    xs, ys = points[:, 0].tolist(), points[:, 1].tolist()
+    # Reflex vertices turn against the winding of the outline.
+    x, y = points[:, 0], points[:, 1]
+    orientation = 1.0 if (x * roll(y, -1) - roll(x, -1) * y).sum() >= 0 else -1.0
+
+    previous = [index - 1 for index in range(count)]
+    previous[0] = count - 1
+    following = [index + 1 for index in range(count)]
+    following[-1] = 0
+    kept = np_ones(count, dtype=bool_)
+    versions = [0] * count
+    grid = _PointGrid(points)
+
+    def _dent(vertex: int) -> Optional[float]:
+        # The area filling in the vertex adds, or None if it is not a reflex vertex.
+        before, after = previous[vertex], following[vertex]
+        turn = orientation * ((xs[vertex] - xs[before]) * (ys[after] - ys[vertex]) -
+                              (ys[vertex] - ys[before]) * (xs[after] - xs[vertex]))
+        return -turn / 2 if turn < 0 else None
+
+    heap = [(area, 0, vertex) for vertex, area in ((vertex, _dent(vertex)) for vertex in range(count))
+            if area is not None]
+    heapify(heap)
+
+    remaining = count
+    while heap and remaining > max(3, target):
+        area, version, vertex = heappop(heap)
+        if not kept[vertex] or version != versions[vertex]:
+            continue
+        if max_added_area is not None and area > max_added_area:
+            break
+
+        before, after = previous[vertex], following[vertex]
+        if grid.any_inside((before, vertex, after)):
+            # Filling this dent would swallow another part of the outline. It is tried again if a neighbour changes.
+            continue
+
+        kept[vertex] = False
+        grid.remove(vertex)
+        remaining -= 1
+        following[before], previous[after] = after, before
+        for neighbour in (before, after):
+            versions[neighbour] += 1
+            dent = _dent(neighbour)
+            if dent is not None:
+                heappush(heap, (dent, versions[neighbour], neighbour))
+
+    if remaining <= max(3, target):
+        return points[kept].astype(float32)
+    # Dents which could not be filled stop the outline from being convex, and pushing the edges out only covers what
+    # was cut off a convex outline, so the rest is done on the hull.
+    hull = convex_hull(points[kept]).astype(float64)
+    if len(hull) <= max(3, target):
+        return hull.astype(float32)
+    if max_distance is not None:
+        # Simplifying cuts the outline in by up to half the distance, and pushing the edges back out adds the same
+        # again.
+        reduced = _reduce_convex(hull, target, max_distance / 2)
+        if len(reduced) <= max(3, target):
+            return reduced
+    return _reduce_convex(hull, target)
+
+
+def generate_levels(points, coarse_vertices: int = 8, max_added_area: Optional[float] = None,
+                    max_distance: Optional[float] = 2.0) -> HitboxLevels:
+    """
+    Every level of detail of an outline. See fill_outline for the coarse level's limits.
+    """
+    full = asarray(points, dtype=float32).reshape(-1, 2).copy()
+    if len(full) < 3:
+        return HitboxLevels(bounding_box(full), full.copy(), full.copy(), full)
+    coarse = fill_outline(full, coarse_vertices, max_added_area, max_distance)
+    # The hull of the coarse level is the hull of the outline unless the coarse level was pushed out past it.
+    hull = convex_hull(coarse)
+    return HitboxLevels(bounding_box(hull), hull, coarse, full)
+
+
+def generate_project_levels(hitboxes: Mapping[str, HitboxData], coarse_vertices: int = 8,
+                            max_added_area: Optional[float] = None,
+                            max_distance: Optional[float] = 2.0) -> Dict[str, HitboxLevels]:
+    """
+    The levels of every hitbox in a project. Hitboxes shared between sprites are only done once.
+    """
+    done: Dict[int, HitboxLevels] = {}
+    levels = {}
+    for name, hitbox in hitboxes.items():
+        if id(hitbox) not in done:
+            done[id(hitbox)] = generate_levels(hitbox.points, coarse_vertices, max_added_area, max_distance)
+        levels[name] = done[id(hitbox)]
+    return levels
+
+
+def levels_to_fields(levels: Mapping[str, HitboxLevels]) -> Dict[str, Dict[str, Dict[str, list]]]:
+    """
+    The levels in the form hitbox_io.write_project stores next to each outline. The full level is the outline itself
+    so it is not stored twice.
+    """
+    return {name: {"levels": {level: _levels.level(level).tolist() for level in LEVELS[:-1]}}
+            for name, _levels in levels.items()}
+
+
+def level_entries(hitboxes: Mapping[str, HitboxData],
+                  levels: Mapping[str, HitboxLevels]) -> Iterator[Tuple[str, Union[HitboxData, LevelOutline]]]:
+    """
+    The hitboxes followed by an extra "<sprite>@<level>" entry for every coarser level, ready for
+    hitbox_archive.write_archive. The levels are plain LevelOutlines, so none of them take space in a collection.
+    """
+    yield from hitboxes.items()
+
+    for name, hitbox in hitboxes.items():
+        for level in LEVELS[:-1]:
+            yield f"{name}@{level}", LevelOutline(levels[name].level(level), hitbox.sprite_size)
+
+
+class LevelCache:
+    """
+    Keeps the levels of a hitbox next to it in the editor. The levels are only generated again when they are asked for
+    after the hitbox was edited.
+    """
+
+    def __init__(self, hitbox: HitboxData, coarse_vertices: int = 8, max_added_area: Optional[float] = None,
+                 max_distance: Optional[float] = 2.0):
+        self._hitbox = hitbox
+        self._coarse_vertices = coarse_vertices
+        self._max_added_area = max_added_area
+        self._max_distance = max_distance
+        self._levels: Optional[HitboxLevels] = None
+        hitbox.add_listener(self._on_edit)
+
+    @property
+    def hitbox(self):
+        return self._hitbox
+
+    @property
+    def levels(self) -> HitboxLevels:
+        if self._levels is None:
+            self._levels = generate_levels(self._hitbox.points, self._coarse_vertices, self._max_added_area,
+                                           self._max_distance)
+        return self._levels
+
+    def release(self):
+        self._hitbox.remove_listener(self._on_edit)
+
+    def _on_edit(self, index: int, removed: int, inserted: int):
+        self._levels = None
+
+
+def _cross(a, b, c) -> float:
+    return (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+
+
+def _reduce_convex(points: ndarray, target: int, max_distance: Optional[float] = None) -> ndarray:
+    # Simplify a convex outline, then push every kept edge out by the furthest any cut off vertex is from the edges. A
+    # cut off vertex is outside only the edge which replaced it, so every pushed out edge still has the whole outline
+    # behind it and the corners are where neighbouring edges meet.
+    simplified, report = simplify(points, target, max_distance=max_distance)
+    if not report.removed:
+        return simplified
+
+    corners = simplified.astype(float64)
+    count = len(corners)
+    orientation = 1.0 if _signed_area(corners) >= 0 else -1.0
+    edges = roll(corners, -1, axis=0) - corners
+    normals = orientation * np_array((edges[:, 1], -edges[:, 0])).T
+    lengths = sqrt((normals ** 2).sum(axis=1))
+    lengths[lengths == 0.0] = 1.0
+    normals /= lengths[:, None]
+    starts = corners + normals * report.max_distance
+
+    pushed = np_empty((count, 2), dtype=float64)
+    for index in range(count):
+        before = index - 1
+        pushed[index] = _line_intersection(starts[before], edges[before], starts[index], edges[index])
+    return pushed.astype(float32)
+
+
+def _signed_area(points: ndarray) -> float:
+    x, y = points[:, 0], points[:, 1]
+    return float((x * roll(y, -1) - roll(x, -1) * y).sum() / 2)
+
+
+def _line_intersection(start_a: ndarray, direction_a: ndarray, start_b: ndarray, direction_b: ndarray) -> ndarray:
+    denominator = direction_a[0] * direction_b[1] - direction_a[1] * direction_b[0]
+    if abs(denominator) < 1e-12:
+        # Parallel edges, only left by a straight run of vertices, meet at the start of the second.
+        return start_b
+    offset = start_b - start_a
+    t = (offset[0] * direction_b[1] - offset[1] * direction_b[0]) / denominator
+    return start_a + t * direction_a
+
+
+class _PointGrid:
+    """
+    The kept vertices of an outline bucketed into a uniform grid about two edges wide, so finding the vertices inside
+    a dent only looks at the cells the dent covers rather than every vertex.
+    """
+
+    def __init__(self, points: ndarray):
+        self._xs, self._ys = points[:, 0].tolist(), points[:, 1].tolist()
+        lengths = sqrt(((roll(points, -1, axis=0) - points) ** 2).sum(axis=1))
+        self._cell_size = max(2.0 * float(lengths.mean()), 1e-6)
+        self._cells: Dict[Tuple[int, int], Set[int]] = {}
+        self._cell_of: List[Tuple[int, int]] = []
+        for index, (x, y) in enumerate(zip(self._xs, self._ys)):
+            cell = self._cell(x, y)
+            self._cell_of.append(cell)
+            self._cells.setdefault(cell, set()).add(index)
+
+    def remove(self, index: int):
+        self._cells[self._cell_of[index]].discard(index)
+
+    def any_inside(self, triangle: Tuple[int, int, int]) -> bool:
+        # Whether any remaining vertex other than the triangle's own lies inside or on the triangle.
+        xs, ys = self._xs, self._ys
+        a, b, c = ((xs[index], ys[index]) for index in triangle)
+        sign = 1.0 if _cross(a, b, c) >= 0 else -1.0
+        left, bottom = self._cell(min(a[0], b[0], c[0]), min(a[1], b[1], c[1]))
+        right, top = self._cell(max(a[0], b[0], c[0]), max(a[1], b[1], c[1]))
+        for cx in range(left, right + 1):
+            for cy in range(bottom, top + 1):
+                for index in self._cells.get((cx, cy), ()):
+                    if index in triangle:
+                        continue
+                    point = xs[index], ys[index]
+                    if (sign * _cross(a, b, point) >= 0 and sign * _cross(b, c, point) >= 0 and
+                            sign * _cross(c, a, point) >= 0):
+                        return True
+        return False
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return floor(x / self._cell_size), floor(y / self._cell_size)
@@ -1,103 +1,285 @@
-from typing import List
+from concurrent.futures import Future
+from typing import Dict, Iterable, List
 
-from arcade import Texture, load_texture, draw_point, draw_line, get_window
+from arcade import Texture, draw_point, draw_line
+from arcade.gui import bind
 import arcade.color as colors
 import arcade.key as key
 
 from hitbox_data import FrameData, HitboxData
-from hitbox_renderers import Frame, Sprite, Hitbox
+from hitbox_renderers import FrameBlock, Frame, Sprite, Hitbox
+from hitbox_history import HitboxHistory
+from hitbox_lod import HitboxLevels, LevelCache
+from hitbox_picking import HitboxPicker
+from hitbox_simplify import simplify_hitbox
+from hitbox_validation import IncrementalValidator
+from profiling import profiled
+from texture_cache import TextureCache
+from texture_loader import TextureLoader
+from view_transform import ViewTransform
+
+# How close in screen pixels the cursor has to be to grab a point or edge.
+PICK_RADIUS = 6
+
+# How far in sprite pixels simplifying the active hitbox may move its outline.
+SIMPLIFY_DISTANCE = 1.0
 
 
 class HitboxManager:
     """
     The Hitbox manager holds each object required to edit and create a hitbox.
     :Frame data: holds all data relating to the frame which the hitbox is rendered to.
+    :View: converts between screen and hitbox coordinates for the frame, for the mouse and the shaders alike.
+    :Frame block: the uniform buffer which shares the frame data with every renderer's shaders.
 
-    :Sprites: lists the arcade.Textures.
+    :Sprites: caches the arcade.Textures, loading them when used and evicting them to stay within a memory budget.
+    :Loader: decodes the textures of a project in the background and uploads a few each frame.
     :Hitboxes: lists the hitbox data. This includes the references to the GPU buffers for the hitbox.
+    :Levels: keeps the levels of detail of each hitbox, generated again only when asked for after an edit.
     :Frame Renderer: Renders the frame which includes a fbo that the other renders draw to.
     :Sprite Renderer: Renders the currently active texture
     :Hitbox Renderer: Renders the currently active hitbox
+    :History: records every edit to the hitboxes so they can be undone and redone.
+    :Picker: finds the point or edge of the active hitbox under the cursor.
+    :Validator: keeps track of where the active hitbox crosses itself.
+
+    The frame is only re-rendered when something drawn into it changes. Otherwise the last render is composited as it
+    is, with the cursor drawn over the top.
     """
 
     def __init__(self, frame_parent):
         self._frame_data: FrameData = FrameData(frame_parent, 1/3, (0.0, 0.0))
-        self._sprites: List[Texture] = [load_texture(":source:/DiceBaggie.png")]
-        self._hitboxes: List[HitboxData] = [HitboxData(self._sprites[0], (1.0, 1.0, 0.0))]
+        self._sprites: TextureCache = TextureCache()
+        self._sprites.add(":source:/DiceBaggie.png")
+        self._loader = TextureLoader(self._sprites)
+        self._hitboxes: List[HitboxData] = [HitboxData(self._sprites.texture(":source:/DiceBaggie.png"),
+                                                       (1.0, 1.0, 0.0))]
 
+        self._view = ViewTransform(self._frame_data)
+        self._frame_block = FrameBlock(self._frame_data, self._view)
         self._frame_renderer = Frame(self._frame_data)
         self._sprite_renderer = Sprite(self._frame_data)
         self._hitbox_renderer = Hitbox(self._frame_data)
 
-        self._sprite_renderer.texture = self._sprites[0]
+        self.set_texture(":source:/DiceBaggie.png")
         self._hitbox_renderer.add_hitbox(self._hitboxes[0])
 
         self._active_hitbox = self._hitboxes[0]
 
+        # Made the first time a hitbox's levels are asked for, so hitboxes added to the list later have them too.
+        self._levels: Dict[HitboxData, LevelCache] = {}
+
+        self._history = HitboxHistory()
+
+        self._picker = HitboxPicker(self._active_hitbox)
+        self._validator = IncrementalValidator(self._active_hitbox)
+        self._crossing_count = 0
+        self._active_hitbox.add_listener(self._on_hitbox_edit)
+        self._selected_point = None
+        self._dragging = False
+        self._drag_moved = False
+
         self._mouse_pos = (0, 0)
 
-        self._window = get_window()
+        # Whether the frame fbo needs rendering again. The hitboxes are checked through their renderer.
+        self._frame_dirty = True
+        bind(self._frame_data, "frame_size", self.redraw)
+        bind(self._frame_data, "frame_shift", self.redraw)
+        bind(self._frame_data, "frame_zoom", self.redraw)
+
+    @property
+    def view(self) -> ViewTransform:
+        return self._view
+
+    @property
+    def sprites(self) -> TextureCache:
+        return self._sprites
+
+    @property
+    def loader(self) -> TextureLoader:
+        return self._loader
+
+    @property
+    def hitboxes(self) -> List[HitboxData]:
+        return self._hitboxes
+
+    def levels(self, index: int) -> HitboxLevels:
+        """
+        The levels of detail of a hitbox, from its bounding box down to its full outline.
+        """
+        hitbox = self._hitboxes[index]
+        cache = self._levels.get(hitbox)
+        if cache is None:
+            cache = self._levels[hitbox] = LevelCache(hitbox)
+        return cache.levels
+
+    def on_update(self, delta_time):
+        self._loader.update()
+
+    def load_sprites(self, paths: Iterable[str]) -> List[Future]:
+        """
+        Load sprites in the background without blocking the window. Each future gives the sprite's Texture once it
+        has been uploaded.
+        """
+        return self._loader.load_many((path, path) for path in paths)
 
     def on_mouse_scroll(self, x, y, scroll_x, scroll_y):
         self._mouse_pos = (x, y)
         f_d = self._frame_data
-        rel_x = (x - f_d.x)
-        rel_y = (y - f_d.y)
-        if 0 <= rel_x <= f_d.size[0] and 0 <= rel_y <= f_d.size[1]:
-            rel_x -= f_d.size[0]/2
-            rel_y -= f_d.size[1]/2
-            old_zoom = f_d.zoom
+        if self._view.contains(x, y):
+            # Zoom about the cursor, by shifting the view so the point under it stays under it.
+            before = self._view.to_hitbox(x, y)
             f_d.zoom = ((int(f_d.size[0]*f_d.zoom) - int(scroll_y)*3) / f_d.size[0]) % 2 or 2
-            zoom_change = (old_zoom - f_d.zoom)
+            after = self._view.to_hitbox(x, y)
             s = f_d.shift
-            f_d.shift = s[0] + rel_x * zoom_change, s[1] + rel_y * zoom_change
+            f_d.shift = s[0] + before[0] - after[0], s[1] + before[1] - after[1]
 
     def on_mouse_drag(self, x, y, dx, dy, buttons, modifiers):
         self._mouse_pos = (x, y)
-        if buttons & 4:
-            rel_x = (x - self._frame_data.x)
-            rel_y = (y - self._frame_data.y)
-            if 0 <= rel_x <= self._frame_data.size[0] and 0 <= rel_y <= self._frame_data.size[1]:
-                shift = list(self._frame_data.shift)
-                zoom = self._frame_data.zoom
-                shift[0] -= dx * zoom
-                shift[1] -= dy * zoom
-                self._frame_data.shift = shift
+        if buttons & 1 and self._dragging:
+            point = self._to_hitbox(x, y)
+            if point is not None and self._selected_point < self._active_hitbox.size:
+                # Every move after the first in a single drag is folded into one undo step.
+                self._history.move_point(self._active_hitbox, self._selected_point,
+                                         (int(point[0]), int(point[1])), merge=self._drag_moved)
+                self._drag_moved = True
+
+        if buttons & 4 and self._view.contains(x, y):
+            shift = self._frame_data.shift
+            move = self._view.vector_to_hitbox(dx, dy)
+            self._frame_data.shift = shift[0] - move[0], shift[1] - move[1]
 
     def on_mouse_press(self, x, y, button, modifiers):
         self._mouse_pos = (x, y)
         if button == 1:
-            rel_x = (x - self._frame_data.x)
-            rel_y = (y - self._frame_data.y)
-            if 0 <= rel_x <= self._frame_data.size[0] and 0 <= rel_y <= self._frame_data.size[1]:
-                rel_x = self._frame_data.zoom * (rel_x - self._frame_data.size[0] // 2)  # -width to width
-                rel_y = self._frame_data.zoom * (rel_y - self._frame_data.size[1] // 2)  # -height to height
+            point = self._to_hitbox(x, y)
+            if point is None:
+                return
 
-                rel_x = int(rel_x + self._frame_data.shift[0])  # / self._active_hitbox.sprite_size[0]
-                rel_y = int(rel_y + self._frame_data.shift[1])  # / self._active_hitbox.sprite_size[1]
+            # Grab the point under the cursor, otherwise split the edge under the cursor, otherwise add a new point.
+            radius = PICK_RADIUS * self._view.scale
+            _point = self._picker.pick_point(*point, radius)
+            _edge = self._picker.pick_edge(*point, radius) if _point is None else None
+            if _point is not None:
+                self._selected_point = _point.index
+            elif _edge is not None:
+                self._selected_point = _edge.index + 1
+                self._history.insert_points(self._active_hitbox, self._selected_point,
+                                            ((int(_edge.point[0]), int(_edge.point[1])),))
+            else:
+                self._selected_point = self._active_hitbox.insert_index
+                self._history.add_point(self._active_hitbox, (int(point[0]), int(point[1])))
 
-                self._active_hitbox.add_point((rel_x, rel_y))
+            self._dragging = True
+            self._drag_moved = False
+
+    def on_mouse_release(self, x, y, button, modifiers):
+        self._mouse_pos = (x, y)
+        if button == 1:
+            self._dragging = False
+
+    def _on_hitbox_edit(self, index, removed, inserted):
+        # Registered after the validator so its crossings are already up to date.
+        count = self._validator.crossing_count
+        if count > self._crossing_count:
+            for crossing in self._validator.report.crossings:
+                print(f"WARNING: Hitbox edges {crossing.first} and {crossing.second} cross at "
+                      f"({crossing.point[0]:g}, {crossing.point[1]:g})")
+        self._crossing_count = count
+
+    def _to_hitbox(self, x, y):
+        """
+        Convert a screen position to hitbox coordinates. None if the position is outside the frame.
+        """
+        if not self._view.contains(x, y):
+            return None
+        return self._view.to_hitbox(x, y)
 
     def mouse_move(self, x, y):
         self._mouse_pos = (x, y)
 
-    def mouse_frame_pos(self):
-        rel_x = int((self._window.mouse['x'] - self._frame_data.frame_pos[0]) * (self._window.width/self._frame_data.size[0]))
-        rel_y = int((self._window.mouse['y'] - self._frame_data.frame_pos[1]) * (self._window.height/self._frame_data.size[1]))
-        return rel_x, rel_y
+    def redraw(self):
+        """
+        Render the frame again on the next draw.
+        """
+        self._frame_dirty = True
+
+    def set_active_hitbox(self, index: int):
+        """
+        Edit another of the hitboxes. The picker and validator are moved over to it.
+        """
+        hitbox = self._hitboxes[index]
+        if hitbox is self._active_hitbox:
+            return
+
+        self._active_hitbox.remove_listener(self._on_hitbox_edit)
+        self._picker.release()
+        self._validator.release()
 
+        self._active_hitbox = hitbox
+        self._picker = HitboxPicker(hitbox)
+        self._validator = IncrementalValidator(hitbox)
+        self._crossing_count = self._validator.crossing_count
+        hitbox.add_listener(self._on_hitbox_edit)
+
+        self._hitbox_renderer.add_hitbox(hitbox)
+        self._selected_point = None
+        self._dragging = False
+        self.redraw()
+
+    def simplify_active(self, max_distance: float = SIMPLIFY_DISTANCE):
+        """
+        Remove the vertices of the active hitbox which barely change its outline, as a single undoable step.
+        """
+        report = simplify_hitbox(self._active_hitbox, self._history, max_distance=max_distance)
+        self._selected_point = None
+        print(f"Simplified hitbox: {report.describe()}")
+
+    def set_texture(self, name: str):
+        """
+        Show the sprite with the given name. Its texture is kept loaded until another sprite is shown.
+        """
+        current: Texture = self._sprite_renderer.texture
+        self._sprites.pin(name)
+        if current is not None and current.name != name:
+            self._sprites.unpin(current.name)
+        self._sprite_renderer.texture = self._sprites.texture(name)
+        self.redraw()
+
+    @profiled()
     def draw(self):
-        with self._frame_renderer.activate_fbo() as fbo:
-            fbo.clear((0.0, 0.0, 0.0, 0.0))
-            self._sprite_renderer.draw()
-            self._hitbox_renderer.draw()
-            draw_point(*self.mouse_frame_pos(), colors.ORANGE_RED, 4)
+        # Upload the frame transform once for every renderer, however many times it changed since the last frame.
+        self._frame_block.use()
+
+        if self._frame_dirty or self._hitbox_renderer.dirty:
+            with self._frame_renderer.activate_fbo() as fbo:
+                fbo.clear((0.0, 0.0, 0.0, 0.0))
+                self._sprite_renderer.draw()
+                self._hitbox_renderer.draw()
+            self._frame_dirty = False
 
         self._frame_renderer.draw()
 
-    def on_key_press(self, button):
+        # The cursor moves far more often than the frame changes, so it is drawn straight to the screen.
+        if self._view.contains(*self._mouse_pos):
+            draw_point(*self._mouse_pos, colors.ORANGE_RED, 4)
+
+    def on_key_press(self, button, modifiers=0):
         _shift = self._frame_data.shift
-        if button == key.W:
+        if modifiers & key.MOD_CTRL and button == key.Z:
+            if modifiers & key.MOD_SHIFT:
+                self._history.redo()
+            else:
+                self._history.undo()
+        elif modifiers & key.MOD_CTRL and button == key.Y:
+            self._history.redo()
+        elif modifiers & key.MOD_CTRL and button == key.L:
+            self.simplify_active()
+        elif button in (key.DELETE, key.BACKSPACE):
+            if self._selected_point is not None and self._selected_point < self._active_hitbox.size:
+                self._history.remove_points(self._active_hitbox, self._selected_point)
+            self._selected_point = None
+        elif button == key.W:
             self._frame_data.shift = _shift[0]+16, _shift[1]+16
         elif button == key.S:
             self._frame_data.shift = _shift[0]-16, _shift[1]-16
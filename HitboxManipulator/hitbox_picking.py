@@ -0,0 +1,291 @@
+"""
+Picking the vertex or edge of a hitbox under the cursor.
+
+The points and edges of a hitbox are bucketed into a uniform grid which is kept up to date from the hitbox's edit
+notifications. Each point is given a stable id when it is added, so an insert or delete in the middle of the polygon
+only touches the points and edges it changed rather than renumbering everything after it. The ids are kept in polygon
+order in blocks, so turning a picked id back into its index, and splicing ids in or out, take O(sqrt n) rather than
+O(n). A pick only looks at the few cells around the cursor so it stays fast however many points the hitbox has.
+"""
+
+from bisect import bisect_right
+from itertools import count as _counter
+from math import floor, hypot
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from hitbox_data import HitboxData
+
+Cell = Tuple[int, int]
+
+
+class PointPick(NamedTuple):
+    index: int
+    distance: float
+
+
+class EdgePick(NamedTuple):
+    index: int  # The edge runs from point index to point index + 1 (wrapping to 0).
+    distance: float
+    point: Tuple[float, float]  # The closest point on the edge, where the edge would be split.
+
+
+class HitboxPicker:
+    """
+    A grid index over the points and edges of a single hitbox.
+
+    :param hitbox: The hitbox to index. The picker listens to it until `release` is called.
+    :param cell_size: The width of a grid cell in hitbox units. Around the usual pick radius works best.
+    """
+
+    def __init__(self, hitbox: HitboxData, cell_size: float = 8.0):
+        self._hitbox = hitbox
+        self._cell_size = float(cell_size)
+        self._next_id = _counter()
+
+        self._ids = _Order()  # point ids in polygon order
+        self._coords: Dict[int, Tuple[float, float]] = {}
+        self._point_cells: Dict[int, Cell] = {}
+        self._point_grid: Dict[Cell, Set[int]] = {}
+
+        # Edges are keyed by the id of the point they start from.
+        self._edge_ends: Dict[int, int] = {}
+        self._edge_cells: Dict[int, List[Cell]] = {}
+        self._edge_grid: Dict[Cell, Set[int]] = {}
+
+        self.rebuild()
+        hitbox.add_listener(self._on_edit)
+
+    @property
+    def hitbox(self):
+        return self._hitbox
+
+    def release(self):
+        self._hitbox.remove_listener(self._on_edit)
+
+    def rebuild(self):
+        self._ids.clear()
+        self._coords.clear()
+        self._point_cells.clear()
+        self._point_grid.clear()
+        self._edge_ends.clear()
+        self._edge_cells.clear()
+        self._edge_grid.clear()
+        self._on_edit(0, 0, self._hitbox.size)
+
+    def pick_point(self, x: float, y: float, radius: float) -> Optional[PointPick]:
+        """
+        The nearest point within the radius of (x, y), if there is one.
+        """
+        best_id, best_distance = None, radius
+        for cell in self._cells_around(x, y, radius):
+            for _id in self._point_grid.get(cell, ()):
+                px, py = self._coords[_id]
+                distance = hypot(px - x, py - y)
+                if distance <= best_distance:
+                    best_id, best_distance = _id, distance
+
+        if best_id is None:
+            return None
+        return PointPick(self._ids.index(best_id), best_distance)
+
+    def pick_edge(self, x: float, y: float, radius: float) -> Optional[EdgePick]:
+        """
+        The nearest edge within the radius of (x, y), if there is one.
+        """
+        best_id, best_distance, best_point = None, radius, None
+        checked = set()
+        for cell in self._cells_around(x, y, radius):
+            for _id in self._edge_grid.get(cell, ()):
+                if _id in checked:
+                    continue
+                checked.add(_id)
+
+                distance, point = _segment_distance(x, y, self._coords[_id], self._coords[self._edge_ends[_id]])
+                if distance <= best_distance:
+                    best_id, best_distance, best_point = _id, distance, point
+
+        if best_id is None:
+            return None
+        return EdgePick(self._ids.index(best_id), best_distance, best_point)
+
+    # -- Keeping the grid up to date --
+
+    def _on_edit(self, index: int, removed: int, inserted: int):
+        points = self._hitbox.points
+        ids = self._ids
+
+        if removed == inserted:
+            # The points moved, so the ids stay and only their cells change.
+            for offset, _id in enumerate(ids.slice(index, index + removed)):
+                self._remove_point(_id)
+                self._add_point(_id, points[index + offset])
+        else:
+            for _id in ids.slice(index, index + removed):
+                self._remove_point(_id)
+                self._remove_edge(_id)
+            new_ids = [next(self._next_id) for _ in range(inserted)]
+            ids.splice(index, removed, new_ids)
+            for offset, _id in enumerate(new_ids):
+                self._add_point(_id, points[index + offset])
+
+        count = len(ids)
+        if not count:
+            return
+
+        # The edge leading into the changed points changes as well as the edges leaving them.
+        for position in {p % count for p in range(index - 1, index + inserted)}:
+            _id = ids[position]
+            self._remove_edge(_id)
+            if count > 1:
+                self._add_edge(_id, ids[(position + 1) % count])
+
+    def _add_point(self, _id: int, point):
+        x, y = float(point[0]), float(point[1])
+        cell = self._cell(x, y)
+        self._coords[_id] = (x, y)
+        self._point_cells[_id] = cell
+        self._point_grid.setdefault(cell, set()).add(_id)
+
+    def _remove_point(self, _id: int):
+        cell = self._point_cells.pop(_id)
+        bucket = self._point_grid[cell]
+        bucket.discard(_id)
+        if not bucket:
+            del self._point_grid[cell]
+        del self._coords[_id]
+
+    def _add_edge(self, start: int, end: int):
+        (x1, y1), (x2, y2) = self._coords[start], self._coords[end]
+        # Sample the edge every half cell. A cell the edge only clips the corner of can be missed, but it always
+        # neighbours a cell which was hit, and picking searches one cell further than the radius to cover it.
+        steps = max(1, int(hypot(x2 - x1, y2 - y1) * 2 / self._cell_size) + 1)
+        cells = {self._cell(x1 + (x2 - x1) * step / steps, y1 + (y2 - y1) * step / steps)
+                 for step in range(steps + 1)}
+
+        self._edge_ends[start] = end
+        self._edge_cells[start] = list(cells)
+        for cell in cells:
+            self._edge_grid.setdefault(cell, set()).add(start)
+
+    def _remove_edge(self, start: int):
+        if start not in self._edge_ends:
+            return
+        del self._edge_ends[start]
+        for cell in self._edge_cells.pop(start):
+            bucket = self._edge_grid[cell]
+            bucket.discard(start)
+            if not bucket:
+                del self._edge_grid[cell]
+
+    def _cell(self, x: float, y: float) -> Cell:
+        return floor(x / self._cell_size), floor(y / self._cell_size)
+
+    def _cells_around(self, x: float, y: float, radius: float):
+        left, bottom = self._cell(x - radius, y - radius)
+        right, top = self._cell(x + radius, y + radius)
+        for cx in range(left - 1, right + 2):
+            for cy in range(bottom - 1, top + 2):
+                yield cx, cy
+
+
+class _Block:
+    __slots__ = ('ids', 'start')
+
+    def __init__(self, ids: List[int]):
+        self.ids = ids
+        self.start = 0  # The position of the block's first id in the whole order.
+
+
+class _Order:
+    """
+    A list of ids split into blocks of around `block_size`, each knowing where it starts, with a table from every id
+    to its block. Finding an id's position only searches its block, and a splice only rewrites the blocks it touches
+    then renumbers the block starts.
+    """
+
+    def __init__(self, block_size: int = 128):
+        self._block_size = block_size
+        self._blocks: List[_Block] = []
+        self._starts: List[int] = []
+        self._block_of: Dict[int, _Block] = {}
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, position: int) -> int:
+        block = self._blocks[bisect_right(self._starts, position) - 1]
+        return block.ids[position - block.start]
+
+    def clear(self):
+        self._blocks.clear()
+        self._starts.clear()
+        self._block_of.clear()
+        self._length = 0
+
+    def index(self, _id: int) -> int:
+        block = self._block_of[_id]
+        return block.start + block.ids.index(_id)
+
+    def slice(self, start: int, stop: int) -> List[int]:
+        ids = []
+        if start >= stop:
+            return ids
+        position = bisect_right(self._starts, start) - 1
+        while start < stop:
+            block = self._blocks[position]
+            part = block.ids[start - block.start:stop - block.start]
+            ids.extend(part)
+            start += len(part)
+            position += 1
+        return ids
+
+    def splice(self, index: int, removed: int, ids: List[int]):
+        """
+        Replace the `removed` ids from index on with the ids given.
+        """
+        blocks = self._blocks
+        first = max(0, bisect_right(self._starts, index) - 1)
+        last = first
+
+        # Gather the blocks the removed ids are in, or the block to insert into.
+        run: List[int] = []
+        run_start = blocks[first].start if blocks else 0
+        while last < len(blocks) and (last == first or blocks[last].start < index + removed):
+            run.extend(blocks[last].ids)
+            last += 1
+
+        offset = index - run_start
+        for _id in run[offset:offset + removed]:
+            del self._block_of[_id]
+        run[offset:offset + removed] = ids
+
+        # Fold a block left small by removals into the next so the blocks don't dwindle.
+        if len(run) < self._block_size // 2 and last < len(blocks):
+            run.extend(blocks[last].ids)
+            last += 1
+
+        size = self._block_size
+        chunks = [run] if len(run) <= 2 * size else [run[start:start + size] for start in range(0, len(run), size)]
+        new_blocks = [_Block(chunk) for chunk in chunks if chunk]
+        for block in new_blocks:
+            for _id in block.ids:
+                self._block_of[_id] = block
+        blocks[first:last] = new_blocks
+        self._length += len(ids) - removed
+
+        start = 0
+        self._starts = []
+        for block in blocks:
+            block.start = start
+            self._starts.append(start)
+            start += len(block.ids)
+
+
+def _segment_distance(x: float, y: float, start: Tuple[float, float], end: Tuple[float, float]):
+    (x1, y1), (x2, y2) = start, end
+    dx, dy = x2 - x1, y2 - y1
+    length_sqr = dx * dx + dy * dy
+    t = 0.0 if length_sqr == 0.0 else max(0.0, min(1.0, ((x - x1) * dx + (y - y1) * dy) / length_sqr))
+    px, py = x1 + t * dx, y1 + t * dy
+    return hypot(px - x, py - y), (px, py)
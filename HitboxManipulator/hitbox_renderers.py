@@ -6,10 +6,71 @@ import arcade.gl as gl
 from arcade import get_window, TextureAtlas, Texture
 from arcade.gui import bind
 from arcade.resources import resolve_resource_path
+from numpy import float32, uint32, arange as np_arange, concatenate as np_concatenate, roll as np_roll, \
+    stack as np_stack, zeros as np_zeros
 
-from hitbox_data import FrameData, HitboxData
+from hitbox_data import FrameData, HitboxCollection, HitboxData
+from profiling import profiled
+from view_transform import ViewTransform
 
-from typing import Set
+from typing import Callable, Dict, Optional
+
+# The uniform block binding of the FrameBlock. The WindowBlock arcade uses for the projection is bound to 0.
+FRAME_BLOCK_BINDING = 1
+
+
+class FrameBlock:
+    """
+    The frame transform shared by the Frame, Sprite and Hitbox shaders as a single uniform buffer:
+
+    layout(std140) uniform FrameBlock {
+        vec2 shift;
+        vec2 frameSize;
+        vec2 pos;
+        float zoom;
+        mat3 hitboxToClip;
+    } frame;
+
+    hitboxToClip is the view transform's clip matrix, so the shaders place sprites and hitboxes with the same maths
+    as the editor uses for the mouse.
+
+    Changes to the frame data only mark the block as changed. It is uploaded by `use`, once a frame, however many
+    properties changed since the last frame.
+    """
+
+    def __init__(self, frame_data: FrameData, view: ViewTransform):
+        self._ctx = get_window().ctx
+        self._frame_data = frame_data
+        self._view = view
+
+        # std140 packs the three vec2s and the float into 28 bytes, then aligns the mat3 to 32. Each of its three
+        # columns is padded to a vec4, for 80 bytes in all.
+        self._buffer = self._ctx.buffer(reserve=80, usage='dynamic')
+        self._dirty = True
+
+        bind(frame_data, "frame_zoom", self._changed)
+        bind(frame_data, "frame_shift", self._changed)
+        bind(frame_data, "frame_pos", self._changed)
+        bind(frame_data, "frame_size", self._changed)
+
+    def _changed(self):
+        self._dirty = True
+
+    @property
+    def dirty(self):
+        return self._dirty
+
+    def use(self):
+        """
+        Upload the frame data if it has changed and bind the block. Call once a frame before rendering.
+        """
+        if self._dirty:
+            _data = self._frame_data
+            _clip = self._view.clip
+            self._buffer.write(array('f', (*_data.shift, *_data.size, *_data.pos, _data.zoom, 0.0,
+                                           *(value for column in _clip.T for value in (*column, 0.0)))))
+            self._dirty = False
+        self._buffer.bind_to_uniform_block(FRAME_BLOCK_BINDING)
 
 
 class Frame:
@@ -17,10 +78,7 @@ class Frame:
         self._ctx = get_window().ctx
         self._data: FrameData = data
 
-        # Bind the changing of the frame data to calling methods in the Frame renderer.
-        bind(self._data, "frame_zoom", self.zoom)
-        bind(self._data, "frame_shift", self.shift)
-        bind(self._data, "frame_pos", self.pos)
+        # The transform comes from the FrameBlock, but the fbo has to be resized with the frame.
         bind(self._data, "frame_size", self.size)
 
         # The texture and fbo that the sprite and hitboxes will draw to
@@ -39,14 +97,7 @@ class Frame:
         )
 
         # passing uniform variables to the program.
-        self._program['pos'] = self._data.pos
-        self._program['size'] = self._data.size
-
-        self._program['checkerUV'] = (self._data.size[0] / 32 * self._data.zoom,
-                                      self._data.size[1] / 32 * self._data.zoom)
-
-        self._program['shift'] = self._data.shift
-
+        self._program['FrameBlock'] = FRAME_BLOCK_BINDING
         self._program['checkerBoard'] = 0
         self._program['hitboxFramebuffer'] = 1
 
@@ -55,21 +106,7 @@ class Frame:
             [gl.BufferDescription(self._ctx.buffer(data=array('f', (0.0, 0.0, 0.0, 1.0, 1.0, 0.0, 1.0, 1.0))),
                                   '2f', ['in_uv'])], mode=gl.TRIANGLE_STRIP)
 
-    def zoom(self):
-        self._program['checkerUV'] = (self._data.size[0] / 32 * self._data.zoom,
-                                      self._data.size[1] / 32 * self._data.zoom)
-
-    def shift(self):
-        self._program['shift'] = self._data.shift
-
-    def pos(self):
-        self._program['pos'] = self._data.pos
-
     def size(self):
-        self._program['size'] = self._data.size
-        self._program['checkerUV'] = (self._data.size[0] / 32 * self._data.zoom,
-                                      self._data.size[1] / 32 * self._data.zoom)
-
         self._texture.resize(self._data.size)
         self._fbo.resize()
 
@@ -82,6 +119,7 @@ class Frame:
         finally:
             prev_fbo.use()
 
+    @profiled()
     def draw(self):
         self._checkerboard_texture.use(0)
         self._texture.use(1)
@@ -98,9 +136,6 @@ class Sprite:
         self._current_texture: Texture = None
 
         self._frame_data = frame_data
-        bind(frame_data, "frame_size", self._size)
-        bind(frame_data, "frame_shift", self._shift)
-        bind(frame_data, "frame_zoom", self._zoom)
 
         # ModernGl components for rendering
         self._render_program = _ctx.load_program(vertex_shader=":source:/shaders/sprite_render_vert.glsl",
@@ -112,16 +147,7 @@ class Sprite:
         # Setting program Uniforms
         self._render_program['textureInfo'] = 0
         self._render_program['textureAtlas'] = 1
-        self._render_program['frameSize'] = frame_data.size
-
-    def _size(self):
-        self._render_program['frameSize'] = self._frame_data.size
-
-    def _shift(self):
-        self._render_program['shift'] = self._frame_data.shift
-
-    def _zoom(self):
-        self._render_program['zoom'] = self._frame_data.zoom
+        self._render_program['FrameBlock'] = FRAME_BLOCK_BINDING
 
     @property
     def texture(self):
@@ -136,53 +162,159 @@ class Sprite:
             self._render_program['tex_id'] = self._atlas.get_texture_id(value.name)
             self._render_program['spriteSize'] = value.size
 
+    @profiled()
     def draw(self):
         if self._current_texture:
-            self._render_program['shift'] = self._frame_data.shift
-            self._render_program['zoom'] = self._frame_data.zoom
             self._atlas.use_uv_texture(0)
             self._atlas.texture.use(1)
             self._render_geo.render(self._render_program)
 
 
 class Hitbox:
+    """
+    Renders every hitbox added to it in two draw calls, however many hitboxes there are.
+
+    The points are drawn straight from the GPU buffer of the hitboxes' HitboxCollection, which the collection keeps up
+    to date with every edit, so the renderer never copies a point. All the hitboxes have to share one collection. The
+    renderer only owns a buffer of vertex colours, lined up with the collection's array, and two index buffers: one
+    joining the points of each hitbox into a loop of lines for a single GL_LINES call, and one listing every point for
+    a single GL_POINTS call.
+
+    The colour and index buffers are only packed again when a hitbox is added or removed, changes how many points it
+    has, or moves within the collection. An edit which only moves points is uploaded by the collection alone.
+    """
 
     def __init__(self, frame_data: FrameData):
         self._frame_data = frame_data
-        bind(frame_data, "frame_size", self._size)
-        bind(frame_data, "frame_shift", self._shift)
-        bind(frame_data, "frame_zoom", self._zoom)
 
         self._ctx = get_window().ctx
         self._render_program = self._ctx.load_program(vertex_shader=":source:/shaders/hitbox_render_vert.glsl",
                                                       fragment_shader=":source:/shaders/hitbox_render_frag.glsl")
 
-        self._render_program['frameSize'] = frame_data.size
-        self._render_program['shift'] = frame_data.shift
-        self._render_program['zoom'] = frame_data.zoom
+        self._render_program['FrameBlock'] = FRAME_BLOCK_BINDING
 
-        self._hitboxes: Set[HitboxData] = set()
+        # The hitboxes in the order they are drawn, each with the listener registered on it.
+        self._hitboxes: Dict[HitboxData, Callable[[int, int, int], None]] = {}
+        self._collection: Optional[HitboxCollection] = None
+        self._layout = -1  # The collection's layout when the buffers were last packed.
+        self._repack = True
 
-    def _size(self):
-        self._render_program['frameSize'] = self._frame_data.size
+        self._line_count = 0
+        self._point_count = 0
 
-    def _shift(self):
-        self._render_program['shift'] = self._frame_data.shift
+        # The buffers only grow. They start with room for a single hitbox of the old fixed size.
+        self._colour_capacity = 256
+        self._line_capacity = 512
+        self._point_capacity = 256
+        self._colours = self._ctx.buffer(reserve=self._colour_capacity * 12, usage='dynamic')
+        self._line_indices = self._ctx.buffer(reserve=self._line_capacity * 4, usage='dynamic')
+        self._point_indices = self._ctx.buffer(reserve=self._point_capacity * 4, usage='dynamic')
 
-    def _zoom(self):
-        self._render_program['zoom'] = self._frame_data.zoom
+        # Made on the first draw, once the collection, and so the buffer of points, is known.
+        self._line_geometry = None
+        self._point_geometry = None
+
+    @property
+    def dirty(self):
+        """
+        Whether any hitbox has changed since the last draw.
+        """
+        _collection = self._collection
+        return self._repack or (_collection is not None and
+                                (_collection.dirty or _collection.layout != self._layout))
 
     def add_hitbox(self, hitbox: HitboxData):
-        self._hitboxes.add(hitbox)
+        if hitbox in self._hitboxes:
+            return
+        if self._collection is None:
+            self._collection = hitbox.collection
+        elif hitbox.collection is not self._collection:
+            print("ERROR: Only hitboxes in the same HitboxCollection can be rendered together")
+            return
+
+        def _listener(index, removed, inserted):
+            if removed != inserted:
+                self._repack = True
+
+        self._hitboxes[hitbox] = _listener
+        hitbox.add_listener(_listener)
+        self._repack = True
 
     def remove_hitbox(self, hitbox: HitboxData):
-        self._hitboxes.remove(hitbox)
-
+        hitbox.remove_listener(self._hitboxes.pop(hitbox))
+        self._repack = True
+
+    def _pack(self):
+        """
+        Rewrite the colour and index buffers from the offsets and sizes of the hitboxes.
+        """
+        end = max((hitbox.offset + hitbox.size for hitbox in self._hitboxes), default=0)
+        colours = np_zeros((end, 3), dtype=float32)
+        lines, points = [], []
+        for hitbox in self._hitboxes:
+            count, offset = hitbox.size, hitbox.offset
+            if not count:
+                continue
+
+            colours[offset:offset + count] = hitbox.color
+            _loop = np_arange(offset, offset + count, dtype=uint32)
+            points.append(_loop)
+            if count > 1:
+                # Each point joins to the next, and the last back to the first, like a line loop.
+                lines.append(np_stack((_loop, np_roll(_loop, -1)), axis=1).reshape(-1))
+
+        self._point_count = sum(len(_points) for _points in points)
+        self._line_count = sum(len(_lines) for _lines in lines)
+        if not self._point_count:
+            return
+
+        # Orphaning keeps the same GL buffer, so the geometries using it stay valid.
+        if end > self._colour_capacity:
+            self._colour_capacity = _grown_capacity(self._colour_capacity, end)
+            self._colours.orphan(self._colour_capacity * 12)
+        if self._point_count > self._point_capacity:
+            self._point_capacity = _grown_capacity(self._point_capacity, self._point_count)
+            self._point_indices.orphan(self._point_capacity * 4)
+        if self._line_count > self._line_capacity:
+            self._line_capacity = _grown_capacity(self._line_capacity, self._line_count)
+            self._line_indices.orphan(self._line_capacity * 4)
+
+        self._colours.write(colours.tobytes())
+        self._point_indices.write(np_concatenate(points).tobytes())
+        if lines:
+            self._line_indices.write(np_concatenate(lines).tobytes())
+
+    def _update(self):
+        # Fetching the buffer uploads the edits, and may compact the collection, so it comes before the layout check.
+        _points = self._collection.buffer
+        if self._line_geometry is None:
+            _description = (gl.BufferDescription(_points, '2f', ['pos']),
+                            gl.BufferDescription(self._colours, '3f', ['vertColour']))
+            self._line_geometry = self._ctx.geometry(_description, index_buffer=self._line_indices,
+                                                     index_element_size=4)
+            self._point_geometry = self._ctx.geometry(_description, index_buffer=self._point_indices,
+                                                      index_element_size=4)
+
+        if self._repack or self._collection.layout != self._layout:
+            self._pack()
+            self._repack = False
+            self._layout = self._collection.layout
+
+    @profiled()
     def draw(self):
+        if self._collection is None:
+            return
+        self._update()
+        if not self._point_count:
+            return
+
         self._ctx.point_size = 4
-        for hitbox in self._hitboxes:
-            if hitbox.size > 0:
-                self._render_program['colour'] = hitbox.color
-                # self._render_program['spriteSize'] = hitbox.sprite_size
-                hitbox.geometry.render(self._render_program, mode=gl.LINE_LOOP)
-                hitbox.geometry.render(self._render_program, mode=gl.POINTS)
+        if self._line_count:
+            self._line_geometry.render(self._render_program, mode=gl.LINES, vertices=self._line_count)
+        self._point_geometry.render(self._render_program, mode=gl.POINTS, vertices=self._point_count)
+
+
+def _grown_capacity(capacity: int, needed: int) -> int:
+    while capacity < needed:
+        capacity *= 2
+    return capacity
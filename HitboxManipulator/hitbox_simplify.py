@@ -0,0 +1,186 @@
+"""
+Simplifying hitbox outlines down to the vertices which matter.
+
+Vertices are removed with Visvalingam-Whyatt: the vertex whose triangle with its two neighbours has the least area is
+removed first, and its neighbours' areas are updated. The areas are kept in a heap, so simplifying n vertices takes
+O(n log n). Removal stops at whichever limit is given:
+    # target: the number of vertices to keep.
+    # max_area: the largest triangle area a removed vertex may have, in square pixels.
+    # max_distance: how far the simplified outline may move from any original vertex, in pixels. A vertex is only
+      removed if the outline stays within the distance, so this is a guarantee rather than a stopping point.
+Outlines are never simplified below a triangle.
+
+Every simplification gives a SimplifyReport of the vertices removed and the error introduced. simplify_hitbox edits a
+single hitbox, through a HitboxHistory so it can be undone, and simplify_project does a whole project across a
+process pool.
+"""
+
+from heapq import heapify, heappush, heappop
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+from numpy import ndarray, float32, float64, asarray, roll, ones as np_ones, nonzero, searchsorted, sqrt, clip
+
+from hitbox_data import HitboxData
+from hitbox_history import HitboxHistory
+from process_pool import map_hitboxes
+
+
+class SimplifyReport(NamedTuple):
+    original: int
+    remaining: int
+    max_distance: float  # The furthest any original vertex is from the simplified outline.
+    area_change: float  # The difference in enclosed area, in square pixels.
+
+    @property
+    def removed(self) -> int:
+        return self.original - self.remaining
+
+    def describe(self) -> str:
+        return (f"{self.original} -> {self.remaining} points ({self.removed} removed), "
+                f"max distance {self.max_distance:.3g}, area change {self.area_change:.3g}")
+
+
+def simplify(points, target: Optional[int] = None, max_area: Optional[float] = None,
+             max_distance: Optional[float] = None) -> Tuple[ndarray, SimplifyReport]:
+    """
+    Simplify a closed outline. Returns the kept points, in their original order, and a report.
+    """
+    if target is None and max_area is None and max_distance is None:
+        raise ValueError("Simplifying needs a target vertex count, a max area or a max distance")
+
+    points = asarray(points, dtype=float64).reshape(-1, 2)
+    count = len(points)
+    target = max(3, target or 3)
+    if count <= target:
+        return points.astype(float32), _report(points, np_ones(count, dtype=bool))
+
+    xs, ys = points[:, 0].tolist(), points[:, 1].tolist()
+    previous = [index - 1 for index in range(count)]
+    previous[0] = count - 1
+    following = [index + 1 for index in range(count)]
+    following[-1] = 0
+
+    # An upper bound on how far the original vertices between each kept vertex and the next are from the edge
+    # joining them. Removing a vertex moves the merged edge by at most the vertex's distance from it, so the bound
+    # of the merged edge is the worst of the two it replaces plus that distance.
+    bounds = [0.0] * count
+    removed = [False] * count
+    versions = [0] * count
+
+    def _area(vertex: int) -> float:
+        before, after = previous[vertex], following[vertex]
+        return abs((xs[before] - xs[vertex]) * (ys[after] - ys[vertex]) -
+                   (xs[after] - xs[vertex]) * (ys[before] - ys[vertex])) / 2
+
+    heap = [(_area(vertex), 0, vertex) for vertex in range(count)]
+    heapify(heap)
+
+    remaining = count
+    while heap and remaining > target:
+        area, version, vertex = heappop(heap)
+        if removed[vertex] or version != versions[vertex]:
+            continue
+        if max_area is not None and area > max_area:
+            break
+
+        before, after = previous[vertex], following[vertex]
+        bound = max(bounds[before], bounds[vertex]) + _segment_distance(xs, ys, vertex, before, after)
+        if max_distance is not None and bound > max_distance:
+            # Left out of the heap until a neighbour is removed and its edge changes.
+            continue
+
+        removed[vertex] = True
+        remaining -= 1
+        following[before], previous[after] = after, before
+        bounds[before] = bound
+
+        # A neighbour's area never drops below the area just removed, so vertices are removed in order of area.
+        for neighbour in (before, after):
+            versions[neighbour] += 1
+            heappush(heap, (max(_area(neighbour), area), versions[neighbour], neighbour))
+
+    keep = ~asarray(removed, dtype=bool)
+    return points[keep].astype(float32), _report(points, keep)
+
+
+def simplify_hitbox(hitbox: HitboxData, history: Optional[HitboxHistory] = None, target: Optional[int] = None,
+                    max_area: Optional[float] = None, max_distance: Optional[float] = None) -> SimplifyReport:
+    """
+    Simplify a hitbox in place. Given a history, the simplification is recorded as a single undoable step.
+    """
+    points, report = simplify(hitbox.points, target, max_area, max_distance)
+    if report.removed:
+        if history is not None:
+            history.set_points(hitbox, points)
+        else:
+            hitbox.set_points(points)
+    return report
+
+
+def simplify_project(hitboxes: Mapping[str, HitboxData], target: Optional[int] = None,
+                     max_area: Optional[float] = None, max_distance: Optional[float] = None,
+                     workers: Optional[int] = None, chunksize: int = 16,
+                     progress: Optional[Callable[[], Any]] = None) -> Dict[str, SimplifyReport]:
+    """
+    Simplify every hitbox of a project in place across a process pool. Hitboxes shared between sprites are only
+    simplified once, and every sprite is given the very same report of the hitbox it uses. The workers, chunksize and
+    progress are those of map_hitboxes.
+    """
+    results = map_hitboxes(simplify, hitboxes, target, max_area, max_distance, workers=workers, chunksize=chunksize,
+                           progress=progress)
+
+    simplified = set()
+    for name, (points, report) in results.items():
+        hitbox = hitboxes[name]
+        if report.removed and id(hitbox) not in simplified:
+            hitbox.set_points(points)
+            simplified.add(id(hitbox))
+    return {name: report for name, (_, report) in results.items()}
+
+
+def summarise(reports: Mapping[str, SimplifyReport]) -> str:
+    """
+    One line totalling the reports of a project. Sprites sharing a hitbox share its report, as from simplify_project,
+    and its points are only counted once.
+    """
+    unique = list({id(report): report for report in reports.values()}.values())
+    original = sum(report.original for report in unique)
+    remaining = sum(report.remaining for report in unique)
+    worst = max((report.max_distance for report in unique), default=0.0)
+    return (f"{len(reports)} sprites, {len(unique)} unique hitboxes, {original} -> {remaining} points, "
+            f"worst distance {worst:.3g}")
+
+
+def _segment_distance(xs: List[float], ys: List[float], point: int, start: int, end: int) -> float:
+    dx, dy = xs[end] - xs[start], ys[end] - ys[start]
+    px, py = xs[point] - xs[start], ys[point] - ys[start]
+    length = dx * dx + dy * dy
+    t = 0.0 if length == 0.0 else min(1.0, max(0.0, (px * dx + py * dy) / length))
+    return ((px - t * dx) ** 2 + (py - t * dy) ** 2) ** 0.5
+
+
+def _report(points: ndarray, keep: ndarray) -> SimplifyReport:
+    kept = nonzero(keep)[0]
+    count = len(points)
+    if not count:
+        return SimplifyReport(0, 0, 0.0, 0.0)
+
+    # The distance of every original vertex from the kept edge which replaced it. Vertex i lies on the edge from the
+    # last kept vertex at or before it to the next kept vertex after that, wrapping at the end.
+    owner = searchsorted(kept, range(count), side="right") - 1
+    starts = kept[owner]  # -1 wraps around to the last kept vertex, which is right for vertices before the first
+    ends = kept[(owner + 1) % len(kept)]
+    start, end = points[starts], points[ends]
+    direction = end - start
+    offset = points - start
+    length = (direction ** 2).sum(axis=1)
+    t = clip((offset * direction).sum(axis=1) / (length + (length == 0.0)), 0.0, 1.0)
+    distance = sqrt(((offset - t[:, None] * direction) ** 2).sum(axis=1))
+
+    return SimplifyReport(count, len(kept), float(distance.max()),
+                          abs(_area(points) - _area(points[keep])))
+
+
+def _area(points: ndarray) -> float:
+    x, y = points[:, 0], points[:, 1]
+    return float((x * roll(y, -1) - roll(x, -1) * y).sum() / 2)
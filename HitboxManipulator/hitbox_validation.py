@@ -0,0 +1,405 @@
+"""
+Checking hitbox outlines are valid polygons.
+
+An outline is checked for:
+    # crossings: two edges which touch or cross. Neighbouring edges may only share their common point, unless they
+      fold back over each other.
+    # duplicate points: two vertices in the same place.
+    # degenerate edges: edges with no length.
+    # winding: whether the outline is counter-clockwise (1), clockwise (-1) or has no area (0).
+
+Crossings are found with a Bentley-Ottmann sweep in O((n + k) log n) for n edges and k crossings. The
+IncrementalValidator keeps the crossings of a hitbox up to date as it is edited by only testing the edges an edit
+changed, and the whole of a project can be checked across a process pool with validate_project.
+"""
+
+from bisect import bisect_left, bisect_right
+from heapq import heappush, heappop
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Optional, Set, Tuple
+
+from numpy import ndarray, float64, asarray, roll, lexsort, nonzero, abs as np_abs, minimum, maximum
+
+from hitbox_data import HitboxData
+from process_pool import map_hitboxes
+
+Point = Tuple[float, float]
+
+
+class Crossing(NamedTuple):
+    first: int  # The edge from point `first` to point `first + 1`, wrapping at the end.
+    second: int
+    point: Point  # A point the two edges share.
+
+
+class ValidationReport(NamedTuple):
+    crossings: List[Crossing]
+    duplicate_points: List[Tuple[int, int]]
+    degenerate_edges: List[int]
+    winding: int
+    point_count: int
+
+    @property
+    def valid(self) -> bool:
+        return (self.point_count >= 3 and self.winding != 0 and not self.crossings and not self.duplicate_points
+                and not self.degenerate_edges)
+
+    def describe(self) -> List[str]:
+        problems = []
+        if self.point_count < 3:
+            problems.append(f"only {self.point_count} points")
+        elif self.winding == 0:
+            problems.append("no area")
+        problems.extend(f"edges {crossing.first} and {crossing.second} cross at "
+                        f"({crossing.point[0]:g}, {crossing.point[1]:g})" for crossing in self.crossings)
+        problems.extend(f"points {first} and {second} are in the same place"
+                        for first, second in self.duplicate_points)
+        problems.extend(f"edge {edge} has no length" for edge in self.degenerate_edges)
+        return problems
+
+
+def validate(points) -> ValidationReport:
+    points = asarray(points, dtype=float64).reshape(-1, 2)
+    return _report(points, find_crossings(points))
+
+
+def validate_hitbox(hitbox: HitboxData) -> ValidationReport:
+    return validate(hitbox.points)
+
+
+def validate_project(hitboxes: Mapping[str, HitboxData], workers: Optional[int] = None, chunksize: int = 16,
+                     progress: Optional[Callable[[], Any]] = None) -> Dict[str, ValidationReport]:
+    """
+    Validate every hitbox of a project across a process pool. Sprites sharing a hitbox share its report.
+    """
+    return map_hitboxes(validate, hitboxes, workers=workers, chunksize=chunksize, progress=progress)
+
+
+def winding(points) -> int:
+    points = asarray(points, dtype=float64).reshape(-1, 2)
+    if len(points) < 3:
+        return 0
+    x, y = points[:, 0], points[:, 1]
+    area = (x * roll(y, -1) - roll(x, -1) * y).sum()
+    return 1 if area > 0 else (-1 if area < 0 else 0)
+
+
+def find_crossings(points) -> List[Crossing]:
+    """
+    Every pair of edges which touch or cross, found with a Bentley-Ottmann sweep.
+    """
+    points = asarray(points, dtype=float64).reshape(-1, 2)
+    count = len(points)
+    if count < 3:
+        return []
+
+    vertices: List[Point] = [(x, y) for x, y in points.tolist()]
+    scale = float(np_abs(points).max()) or 1.0
+    epsilon = scale * 1e-9
+
+    # Every edge is stored left to right (lowest y first when vertical). Edges with no length are skipped.
+    left: List[Point] = []
+    right: List[Point] = []
+    starts: Dict[Point, List[int]] = {}
+    queue: List[Point] = []
+    queued: Set[Point] = set()
+
+    def _schedule(point: Point):
+        if point not in queued:
+            queued.add(point)
+            heappush(queue, point)
+
+    for edge in range(count):
+        a, b = vertices[edge], vertices[(edge + 1) % count]
+        a, b = (a, b) if a <= b else (b, a)
+        left.append(a)
+        right.append(b)
+        if a == b:
+            continue
+        starts.setdefault(a, []).append(edge)
+        _schedule(a)
+        _schedule(b)
+
+    status: List[int] = []
+    found: Dict[Tuple[int, int], Point] = {}
+
+    while queue:
+        point = heappop(queue)
+        px, py = point
+
+        def _y(edge: int) -> float:
+            (x1, y1), (x2, y2) = left[edge], right[edge]
+            if x1 == x2:
+                return min(max(py, y1), y2)
+            if px == x1:
+                return y1
+            if px == x2:
+                return y2
+            return y1 + (y2 - y1) * (px - x1) / (x2 - x1)
+
+        # The edges in the sweep which pass through the point are next to each other.
+        low = bisect_left(status, py - epsilon, key=_y)
+        high = bisect_right(status, py + epsilon, key=_y)
+        through = status[low:high]
+        beginning = starts.get(point, [])
+
+        involved = through + beginning
+        if len(involved) > 1:
+            for index, first in enumerate(involved):
+                for second in involved[index + 1:]:
+                    pair = (first, second) if first < second else (second, first)
+                    if pair not in found and not _only_corner(pair, vertices, count):
+                        found[pair] = point
+
+        # Re-insert every edge continuing past the point in the order they leave it.
+        continuing = [edge for edge in through if right[edge] != point and _distance(right[edge], point) > epsilon]
+        continuing.extend(beginning)
+        continuing.sort(key=lambda edge: _slope(left[edge], right[edge]))
+        status[low:high] = continuing
+
+        if continuing:
+            if low > 0:
+                _check(status[low - 1], continuing[0], point, left, right, _schedule)
+            end = low + len(continuing)
+            if end < len(status):
+                _check(continuing[-1], status[end], point, left, right, _schedule)
+        elif 0 < low < len(status):
+            _check(status[low - 1], status[low], point, left, right, _schedule)
+
+    return [Crossing(first, second, point) for (first, second), point in sorted(found.items())]
+
+
+class IncrementalValidator:
+    """
+    Keeps the validation of a single hitbox up to date as it is edited. Only the edges an edit changed are tested
+    against the rest of the outline, so each edit costs O(n * changed) with numpy rather than a full check.
+
+    :param hitbox: The hitbox to watch. The validator listens to it until `release` is called.
+    """
+
+    def __init__(self, hitbox: HitboxData):
+        self._hitbox = hitbox
+        self._crossings: Dict[Tuple[int, int], Point] = {}
+        self._report: Optional[ValidationReport] = None
+
+        self.rebuild()
+        hitbox.add_listener(self._on_edit)
+
+    @property
+    def hitbox(self):
+        return self._hitbox
+
+    @property
+    def report(self) -> ValidationReport:
+        if self._report is None:
+            crossings = [Crossing(first, second, point) for (first, second), point in sorted(self._crossings.items())]
+            self._report = _report(asarray(self._hitbox.points, dtype=float64), crossings)
+        return self._report
+
+    @property
+    def crossing_count(self):
+        return len(self._crossings)
+
+    def release(self):
+        self._hitbox.remove_listener(self._on_edit)
+
+    def rebuild(self):
+        self._crossings = {(crossing.first, crossing.second): crossing.point
+                           for crossing in find_crossings(self._hitbox.points)}
+        self._report = None
+
+    def _on_edit(self, index: int, removed: int, inserted: int):
+        self._report = None
+        count = self._hitbox.size
+        old_count = count - inserted + removed
+
+        # Large edits are quicker to check from scratch.
+        if inserted + removed > max(32, count // 4) or count < 3 or old_count < 3:
+            self.rebuild()
+            return
+
+        # The edge into the first changed point and every edge leaving a changed point are affected.
+        old_changed = {edge % old_count for edge in range(index - 1, index + removed)}
+        new_changed = {edge % count for edge in range(index - 1, index + inserted)}
+        shift = inserted - removed
+
+        crossings = {}
+        for (first, second), point in self._crossings.items():
+            if first in old_changed or second in old_changed:
+                continue
+            first = first + shift if first >= index + removed else first
+            second = second + shift if second >= index + removed else second
+            crossings[(first, second) if first < second else (second, first)] = point
+
+        points = asarray(self._hitbox.points, dtype=float64)
+        for edge in new_changed:
+            for other, point in _edge_crossings(points, edge):
+                crossings[(edge, other) if edge < other else (other, edge)] = point
+        self._crossings = crossings
+
+
+def _report(points: ndarray, crossings: List[Crossing]) -> ValidationReport:
+    count = len(points)
+    if count == 0:
+        return ValidationReport(crossings, [], [], 0, 0)
+
+    following = roll(points, -1, axis=0)
+    degenerate = nonzero((points == following).all(axis=1))[0].tolist() if count > 1 else []
+
+    # Sorting brings points in the same place next to each other.
+    order = lexsort((points[:, 1], points[:, 0]))
+    ordered = points[order]
+    same = nonzero((ordered[1:] == ordered[:-1]).all(axis=1))[0]
+    duplicates = []
+    for position in same.tolist():
+        first, second = sorted((int(order[position]), int(order[position + 1])))
+        # Neighbours in the same place are already reported as a degenerate edge.
+        if second - first != 1 and not (first == 0 and second == count - 1):
+            duplicates.append((first, second))
+
+    return ValidationReport(crossings, sorted(duplicates), degenerate, winding(points), count)
+
+
+def _edge_crossings(points: ndarray, edge: int) -> List[Tuple[int, Point]]:
+    """
+    Test one edge against every other edge at once.
+    """
+    count = len(points)
+    a, b = points[edge], points[(edge + 1) % count]
+    if (a == b).all():
+        return []
+    starts, ends = points, roll(points, -1, axis=0)
+
+    d1 = _orient(a, b, starts)
+    d2 = _orient(a, b, ends)
+    d3 = _orient_many(starts, ends, a)
+    d4 = _orient_many(starts, ends, b)
+
+    proper = (d1 * d2 < 0) & (d3 * d4 < 0)
+    touching = (((d1 == 0) & _within(a, b, starts)) | ((d2 == 0) & _within(a, b, ends)) |
+                ((d3 == 0) & _within_many(starts, ends, a)) | ((d4 == 0) & _within_many(starts, ends, b)))
+    hits = proper | touching
+    hits[edge] = False
+    hits &= (starts != ends).any(axis=1)
+
+    results = []
+    for other in nonzero(hits)[0].tolist():
+        pair = (edge, other) if edge < other else (other, edge)
+        point = _intersection((a[0], a[1]), (b[0], b[1]), tuple(starts[other]), tuple(ends[other]))
+        if point is None:
+            continue
+        shared = _shared_point(pair, count)
+        if shared is not None:
+            # Neighbouring edges only cross if they fold back over each other.
+            if not _folds(points, pair, count):
+                continue
+            point = _overlap_point(points, pair, count)
+        results.append((other, (float(point[0]), float(point[1]))))
+    return results
+
+
+def _check(first: int, second: int, point: Point, left: List[Point], right: List[Point], schedule):
+    if _shared_point((min(first, second), max(first, second)), len(left)) is not None:
+        # Neighbouring edges meet at their shared point, which is already an event. If they fold back over each
+        # other every point of the overlap is an end point of one of them, so no new event is needed either.
+        return
+    crossing = _intersection(left[first], right[first], left[second], right[second], after=point)
+    if crossing is not None:
+        schedule(crossing)
+
+
+def _intersection(a: Point, b: Point, c: Point, d: Point, after: Optional[Point] = None) -> Optional[Point]:
+    """
+    A point where segment ab meets segment cd, the first one after `after` if given.
+    """
+    rx, ry = b[0] - a[0], b[1] - a[1]
+    sx, sy = d[0] - c[0], d[1] - c[1]
+    denominator = rx * sy - ry * sx
+    qx, qy = c[0] - a[0], c[1] - a[1]
+
+    if denominator == 0:
+        if qx * ry - qy * rx != 0:
+            return None
+        # Collinear, so they meet where they overlap.
+        first, second = sorted((a, b)), sorted((c, d))
+        start, end = max(first[0], second[0]), min(first[1], second[1])
+        if start > end:
+            return None
+        if after is None or start > after:
+            return start
+        return end if end > after else None
+
+    t = (qx * sy - qy * sx) / denominator
+    u = (qx * ry - qy * rx) / denominator
+    if not (0.0 <= t <= 1.0 and 0.0 <= u <= 1.0):
+        return None
+    # Use the exact end point where the crossing is at one.
+    if t == 0.0 or t == 1.0:
+        point = a if t == 0.0 else b
+    elif u == 0.0 or u == 1.0:
+        point = c if u == 0.0 else d
+    else:
+        point = (a[0] + t * rx, a[1] + t * ry)
+    if after is not None and point <= after:
+        return None
+    return point
+
+
+def _shared_point(pair: Tuple[int, int], count: int) -> Optional[int]:
+    first, second = pair
+    if second == first + 1:
+        return second
+    if first == 0 and second == count - 1:
+        return 0
+    return None
+
+
+def _only_corner(pair: Tuple[int, int], vertices: List[Point], count: int) -> bool:
+    # Neighbouring edges can only meet at their shared point, which is not a crossing, unless they fold back over
+    # each other.
+    return _shared_point(pair, count) is not None and not _folds(vertices, pair, count)
+
+
+def _folds(points, pair: Tuple[int, int], count: int) -> bool:
+    shared = _shared_point(pair, count)
+    before = points[(shared - 1) % count]
+    corner = points[shared]
+    after = points[(shared + 1) % count]
+    ux, uy = corner[0] - before[0], corner[1] - before[1]
+    vx, vy = after[0] - corner[0], after[1] - corner[1]
+    return ux * vy - uy * vx == 0 and ux * vx + uy * vy < 0
+
+
+def _overlap_point(points, pair: Tuple[int, int], count: int) -> Point:
+    # Two folded edges overlap from their shared corner to the end of the shorter one. The sweep reports the lowest
+    # of those two points, so report the same one here.
+    shared = _shared_point(pair, count)
+    before, corner, after = points[(shared - 1) % count], points[shared], points[(shared + 1) % count]
+    end = before if _distance(before, corner) <= _distance(corner, after) else after
+    return min((float(corner[0]), float(corner[1])), (float(end[0]), float(end[1])))
+
+
+def _slope(a: Point, b: Point) -> float:
+    return float("inf") if a[0] == b[0] else (b[1] - a[1]) / (b[0] - a[0])
+
+
+def _distance(a, b) -> float:
+    return ((a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2) ** 0.5
+
+
+def _orient(a, b, points: ndarray) -> ndarray:
+    return (b[0] - a[0]) * (points[:, 1] - a[1]) - (b[1] - a[1]) * (points[:, 0] - a[0])
+
+
+def _orient_many(starts: ndarray, ends: ndarray, point) -> ndarray:
+    return ((ends[:, 0] - starts[:, 0]) * (point[1] - starts[:, 1]) -
+            (ends[:, 1] - starts[:, 1]) * (point[0] - starts[:, 0]))
+
+
+def _within(a, b, points: ndarray) -> ndarray:
+    return ((minimum(a[0], b[0]) <= points[:, 0]) & (points[:, 0] <= maximum(a[0], b[0])) &
+            (minimum(a[1], b[1]) <= points[:, 1]) & (points[:, 1] <= maximum(a[1], b[1])))
+
+
+def _within_many(starts: ndarray, ends: ndarray, point) -> ndarray:
+    return ((minimum(starts[:, 0], ends[:, 0]) <= point[0]) & (point[0] <= maximum(starts[:, 0], ends[:, 0])) &
+            (minimum(starts[:, 1], ends[:, 1]) <= point[1]) & (point[1] <= maximum(starts[:, 1], ends[:, 1])))
@@ -0,0 +1,86 @@
+"""
+Measures how UIStackLayout copes with a long list, the way the sprite and hitbox lists of a big project use it.
+
+Three costs are timed:
+    # add: appending children one at a time with a layout pass after each, as a list being filled over many frames.
+    # resize: laying out again after the list changes size, as when the window is resized.
+    # idle: layout passes where nothing changed, which the UI manager does every frame.
+Pass --full to invalidate the layout before every pass, which times what laying out every child every time costs.
+
+Run as a script:
+    python layout_benchmark.py --children 5000
+"""
+
+import pyglet
+
+# Laying out widgets needs no window, so stop pyglet making its hidden window when arcade is imported.
+pyglet.options["shadow_window"] = False
+
+import argparse
+import sys
+from time import perf_counter
+from typing import Dict
+
+from arcade.gui import UIWidget
+
+from widgets import STACK_LAYOUT_SUPPORTED, UIStackLayout
+
+
+def benchmark(children: int = 5000, resizes: int = 20, idle: int = 100, full: bool = False) -> Dict[str, float]:
+    """
+    Returns the total time in seconds of each stage.
+
+    :param full: Invalidate the layout before every pass, so every child is placed again each time.
+    """
+    layout = UIStackLayout(width=300, height=600, vertical=True, space_between=2)
+
+    start = perf_counter()
+    for _ in range(children):
+        layout.add(UIWidget(width=280, height=20))
+        if full:
+            layout.invalidate()
+        layout.do_layout()
+    add = perf_counter() - start
+
+    start = perf_counter()
+    for index in range(resizes):
+        layout.rect = layout.rect.resize(300 + index % 2 * 100, 600 + index * 10)
+        if full:
+            layout.invalidate()
+        layout.do_layout()
+    resize = perf_counter() - start
+
+    start = perf_counter()
+    for _ in range(idle):
+        if full:
+            layout.invalidate()
+        layout.do_layout()
+    idle_time = perf_counter() - start
+
+    return {"add": add, "resize": resize, "idle": idle_time}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Time laying out a long UIStackLayout.")
+    parser.add_argument("--children", type=int, default=5000, help="Children to add one at a time.")
+    parser.add_argument("--resizes", type=int, default=20, help="Layout passes after resizing the list.")
+    parser.add_argument("--idle", type=int, default=100, help="Layout passes with nothing changed.")
+    parser.add_argument("--full", action="store_true", help="Lay out every child on every pass.")
+    args = parser.parse_args(argv)
+
+    if not STACK_LAYOUT_SUPPORTED:
+        print("ERROR: The installed arcade's UIWidget has no padding properties, so UIStackLayout can't lay out. "
+              "Install a newer arcade to run this benchmark.")
+        return 1
+
+    times = benchmark(args.children, args.resizes, args.idle, args.full)
+    print(f"{args.children} children{', full layout' if args.full else ''}")
+    print(f"add     {times['add'] * 1000:>10.2f} ms total {times['add'] / args.children * 1e6:>10.2f} us each")
+    print(f"resize  {times['resize'] * 1000:>10.2f} ms total "
+          f"{times['resize'] / max(1, args.resizes) * 1000:>10.3f} ms each")
+    print(f"idle    {times['idle'] * 1000:>10.2f} ms total {times['idle'] / max(1, args.idle) * 1e6:>10.2f} us each")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,60 @@
+"""
+Spreading the per-sprite work of the batch tools across a process pool.
+
+Generating, hashing, simplifying, validating and decomposing hitboxes are all pure functions of a single sprite, so
+they share one way of fanning out. The work is sent to the pool in chunks, and the results come back in the order the
+sprites were given. Project wide steps go through `map_hitboxes`, which only sends each distinct HitboxData once, so
+sprites sharing a hitbox, such as duplicate frames, never cost the work twice.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional
+
+from hitbox_data import HitboxData
+
+
+def pool_map(function: Callable, items: Iterable, *constants: Any, workers: Optional[int] = None,
+             chunksize: int = 16) -> Iterator:
+    """
+    Call function(item, *constants) for every item across a process pool, yielding the results in the order of the
+    items as soon as they are ready. The function, items and constants have to be picklable.
+
+    :param workers: The number of processes. Defaults to one per core. 0 does the work in this process instead, which
+                    skips starting the pool for small jobs and keeps tracebacks readable.
+    :param chunksize: The items sent to a process at once.
+    """
+    items = list(items)
+    if workers == 0:
+        for item in items:
+            yield function(item, *constants)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(function, items, *([constant] * len(items) for constant in constants),
+                                chunksize=chunksize)
+
+
+def map_hitboxes(function: Callable, hitboxes: Mapping[str, HitboxData], *constants: Any,
+                 workers: Optional[int] = None, chunksize: int = 16,
+                 progress: Optional[Callable[[], Any]] = None) -> Dict[str, Any]:
+    """
+    Call function(points, *constants) on a copy of the points of every distinct hitbox of a project, using pool_map.
+    Returns the results by sprite name. Sprites which share a HitboxData share the very same result.
+
+    :param progress: Called as each distinct hitbox's result comes back.
+    """
+    unique = unique_hitboxes(hitboxes)
+    results = {}
+    for hitbox, result in zip(unique, pool_map(function, (hitbox.points.copy() for hitbox in unique), *constants,
+                                               workers=workers, chunksize=chunksize)):
+        results[id(hitbox)] = result
+        if progress is not None:
+            progress()
+    return {name: results[id(hitbox)] for name, hitbox in hitboxes.items()}
+
+
+def unique_hitboxes(hitboxes: Mapping[str, HitboxData]) -> List[HitboxData]:
+    """
+    Every distinct HitboxData of a project, in the order they are first used.
+    """
+    return list({id(hitbox): hitbox for hitbox in hitboxes.values()}.values())
@@ -0,0 +1,250 @@
+"""
+Opt-in timing of the editor's hot paths, with an on screen frame graph and export to Chrome's trace format.
+
+Profiling is off unless the HITBOX_PROFILE environment variable is set or `enable` is called. Hot functions are
+wrapped with `profiled` and blocks of code with `section`. While profiling is off a wrapped function only costs one
+extra call and a check of a global, a fraction of a microsecond, and `section` returns a shared do-nothing context
+manager, so they can stay in shipped code. Profiling can be switched on and off while the editor runs.
+
+While on, every section is recorded into a ring buffer of the most recent events along with the frame boundaries
+marked by `frame`. Save it with `export_trace` and open it in chrome://tracing or https://ui.perfetto.dev.
+"""
+
+import json
+import os
+from collections import deque
+from contextlib import nullcontext
+from functools import wraps
+from threading import get_ident
+from time import perf_counter_ns
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+
+class Profiler:
+    """
+    :param capacity: The most section events kept. The oldest are forgotten first.
+    :param frames: The most frame times kept for the overlay.
+    """
+
+    def __init__(self, capacity: int = 1 << 16, frames: int = 240):
+        # (name, start, end, thread) with times from perf_counter_ns.
+        self._events: Deque[Tuple[str, int, int, int]] = deque(maxlen=capacity)
+        self._frames: Deque[Tuple[int, int]] = deque(maxlen=frames)
+        self._frame_start: Optional[int] = None
+
+        # The total time of each section in the frame so far, and in the last whole frame.
+        self._totals: Dict[str, int] = {}
+        self._last_totals: Dict[str, int] = {}
+
+    @property
+    def event_count(self):
+        return len(self._events)
+
+    def record(self, name: str, start: int, end: int):
+        self._events.append((name, start, end, get_ident()))
+        self._totals[name] = self._totals.get(name, 0) + end - start
+
+    def frame(self):
+        """
+        Mark the start of a new frame, ending the last.
+        """
+        now = perf_counter_ns()
+        if self._frame_start is not None:
+            self._frames.append((self._frame_start, now))
+            self._last_totals = self._totals
+            self._totals = {}
+        self._frame_start = now
+
+    def frame_times(self) -> List[float]:
+        """
+        The length of each recent frame in milliseconds, oldest first.
+        """
+        return [(end - start) / 1e6 for start, end in self._frames]
+
+    def last_frame(self) -> Dict[str, float]:
+        """
+        The total time of each section during the last whole frame in milliseconds, slowest first.
+        """
+        return {name: total / 1e6 for name, total in
+                sorted(self._last_totals.items(), key=lambda item: item[1], reverse=True)}
+
+    def trace_events(self) -> List[Dict]:
+        """
+        Every recorded event in Chrome's trace event format. Frames are on a track of their own.
+        """
+        pid = os.getpid()
+        events = [{"name": "frame", "cat": "frame", "ph": "X", "ts": start / 1e3, "dur": (end - start) / 1e3,
+                   "pid": pid, "tid": 0} for start, end in self._frames]
+        events.extend({"name": name, "cat": "section", "ph": "X", "ts": start / 1e3, "dur": (end - start) / 1e3,
+                       "pid": pid, "tid": thread} for name, start, end, thread in self._events)
+        return events
+
+    def export_trace(self, path):
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({"traceEvents": self.trace_events(), "displayTimeUnit": "ms"}, file)
+
+    def clear(self):
+        self._events.clear()
+        self._frames.clear()
+        self._frame_start = None
+        self._totals = {}
+        self._last_totals = {}
+
+
+_profiler: Optional[Profiler] = None
+_NULL_SECTION = nullcontext()
+
+
+def enable(capacity: int = 1 << 16) -> Profiler:
+    """
+    Start recording. Does nothing if already recording.
+    """
+    global _profiler
+    if _profiler is None:
+        _profiler = Profiler(capacity)
+    return _profiler
+
+
+def disable():
+    """
+    Stop recording and forget everything recorded.
+    """
+    global _profiler
+    _profiler = None
+
+
+def toggle() -> bool:
+    """
+    Switch recording on or off. Returns whether it is now on.
+    """
+    if _profiler is None:
+        enable()
+        return True
+    disable()
+    return False
+
+
+def profiler() -> Optional[Profiler]:
+    """
+    The profiler recording, or None while profiling is off.
+    """
+    return _profiler
+
+
+def frame():
+    if _profiler is not None:
+        _profiler.frame()
+
+
+def export_trace(path) -> bool:
+    """
+    Save everything recorded to a Chrome trace file. Returns False if profiling is off.
+    """
+    if _profiler is None:
+        return False
+    _profiler.export_trace(path)
+    return True
+
+
+class _Section:
+    __slots__ = ('_profiler', '_name', '_start')
+
+    def __init__(self, _profiler: Profiler, name: str):
+        self._profiler = _profiler
+        self._name = name
+        self._start = 0
+
+    def __enter__(self):
+        self._start = perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._profiler.record(self._name, self._start, perf_counter_ns())
+
+
+def section(name: str):
+    """
+    Time a block of code:
+        with section("load"):
+            ...
+    """
+    return _NULL_SECTION if _profiler is None else _Section(_profiler, name)
+
+
+def profiled(name: Optional[str] = None) -> Callable:
+    """
+    Time every call of a function or method. Defaults to the function's qualified name, such as "Hitbox.draw".
+    """
+    def _decorate(function: Callable) -> Callable:
+        _name = name or function.__qualname__
+
+        @wraps(function)
+        def _wrapper(*args, **kwargs):
+            recording = _profiler
+            if recording is None:
+                return function(*args, **kwargs)
+            start = perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                recording.record(_name, start, perf_counter_ns())
+
+        return _wrapper
+
+    return _decorate
+
+
+class ProfileOverlay:
+    """
+    Draws the length of recent frames as a graph, with a line at the frame budget, and the slowest sections of the
+    last frame beside it. Draws nothing while profiling is off.
+
+    :param budget: The frame time to aim for in milliseconds.
+    :param sections: The number of sections to list.
+    """
+
+    def __init__(self, x: float = 10, y: float = 10, width: float = 240, height: float = 60,
+                 budget: float = 1000 / 60, sections: int = 6, color=(255, 255, 255, 255)):
+        self._x, self._y = x, y
+        self._width, self._height = width, height
+        self._budget = budget
+        self._color = color
+
+        # arcade is only imported once an overlay is made, so the profiler can time code which never draws.
+        from arcade import Text
+
+        # Labels are made once and only their text is changed, as making text is slow.
+        self._title = Text("", x, y + height + 4, color, 10)
+        self._labels = [Text("", x + width + 8, y + height - 12 * (index + 1), color, 9) for index in range(sections)]
+
+    def draw(self):
+        recording = _profiler
+        if recording is None:
+            return
+
+        from arcade import draw_line, draw_line_strip, draw_lrtb_rectangle_filled
+
+        times = recording.frame_times()
+        x, y, width, height = self._x, self._y, self._width, self._height
+        draw_lrtb_rectangle_filled(x, x + width, y + height, y, (0, 0, 0, 160))
+
+        # The graph is scaled so twice the budget fills it, anything slower is clipped to the top.
+        scale = height / (2 * self._budget)
+        if len(times) > 1:
+            step = width / (len(times) - 1)
+            draw_line_strip([(x + index * step, y + min(height, time * scale)) for index, time in enumerate(times)],
+                            self._color)
+        draw_line(x, y + self._budget * scale, x + width, y + self._budget * scale, (255, 80, 80, 255))
+
+        if times:
+            self._title.text = f"{times[-1]:.2f} ms  (worst {max(times):.2f} ms)"
+        self._title.draw()
+
+        sections = list(recording.last_frame().items())
+        for index, label in enumerate(self._labels):
+            label.text = f"{sections[index][0]}: {sections[index][1]:.3f} ms" if index < len(sections) else ""
+            label.draw()
+
+
+if os.environ.get("HITBOX_PROFILE"):
+    enable()
@@ -1,19 +1,25 @@
 #version 330
 
+layout(std140) uniform FrameBlock {
+    vec2 shift;
+    vec2 frameSize;
+    vec2 pos;
+    float zoom;
+    mat3 hitboxToClip;
+} frame;
+
 uniform sampler2D checkerBoard;
 uniform sampler2D hitboxFramebuffer;
 
 uniform vec4 borderColour;
 
-uniform vec2 checkerUV;
-uniform vec2 shift;
-
 in vec2 frag_uv;
 
 out vec4 fragColour;
 
 void main(){
-    vec4 checkerBoardColour = texture(checkerBoard, shift/32.0 + checkerUV*frag_uv - 0.5);
+    vec2 checkerUV = frame.frameSize / 32.0 * frame.zoom;
+    vec4 checkerBoardColour = texture(checkerBoard, frame.shift/32.0 + checkerUV*frag_uv - 0.5);
     vec4 fboColour = texture(hitboxFramebuffer, frag_uv + 0.5);
     fragColour = vec4(fboColour.rgb * fboColour.a + checkerBoardColour.rgb * (1.0 - fboColour.a), 1.0);
-}
\ No newline at end of file
+}
@@ -5,14 +5,19 @@ uniform WindowBlock {
     mat4 view;
 } window;
 
-in vec2 in_uv;
+layout(std140) uniform FrameBlock {
+    vec2 shift;
+    vec2 frameSize;
+    vec2 pos;
+    float zoom;
+    mat3 hitboxToClip;
+} frame;
 
-uniform vec2 pos;
-uniform vec2 size;
+in vec2 in_uv;
 
 out vec2 frag_uv;
 
 void main(){
-    gl_Position = window.projection * window.view * vec4(pos + in_uv*size, 0, 1);
+    gl_Position = window.projection * window.view * vec4(frame.pos + in_uv*frame.frameSize, 0, 1);
     frag_uv = in_uv - 0.5;
-}
\ No newline at end of file
+}
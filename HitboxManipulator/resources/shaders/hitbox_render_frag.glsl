@@ -1,9 +1,9 @@
 #version 330
 
-uniform vec3 colour;
+in vec3 hitboxColour;
 
 out vec4 fragColour;
 
 void main(){
-    fragColour = vec4(colour, 1.0);
+    fragColour = vec4(hitboxColour, 1.0);
 }
\ No newline at end of file
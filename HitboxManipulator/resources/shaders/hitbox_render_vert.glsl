@@ -1,13 +1,19 @@
 #version 330
 
-uniform vec2 shift;
-uniform vec2 spriteSize;
-uniform vec2 frameSize;
-uniform float zoom;
+layout(std140) uniform FrameBlock {
+    vec2 shift;
+    vec2 frameSize;
+    vec2 pos;
+    float zoom;
+    mat3 hitboxToClip;
+} frame;
 
 in vec2 pos;
+in vec3 vertColour;
 
-void main(){
-    gl_Position = vec4((pos - shift) / (0.5 * zoom * frameSize) , 0.0, 1.0);
+out vec3 hitboxColour;
 
-}
\ No newline at end of file
+void main(){
+    gl_Position = vec4((frame.hitboxToClip * vec3(pos, 1.0)).xy, 0.0, 1.0);
+    hitboxColour = vertColour;
+}
@@ -1,16 +1,20 @@
 #version 330
 
-uniform vec2 shift;
+layout(std140) uniform FrameBlock {
+    vec2 shift;
+    vec2 frameSize;
+    vec2 pos;
+    float zoom;
+    mat3 hitboxToClip;
+} frame;
+
 uniform vec2 spriteSize;
-uniform vec2 frameSize;
-uniform float zoom;
 
 in vec2 vertUV;
 out vec2 fragUV;
 
 void main()
 {
-    gl_Position = vec4(((vertUV - vec2(0.5)) * spriteSize - shift) / (zoom * frameSize * 0.5), 0.0, 1.0) ;
+    gl_Position = vec4((frame.hitboxToClip * vec3((vertUV - vec2(0.5)) * spriteSize, 1.0)).xy, 0.0, 1.0);
     fragUV = vertUV;
 }
-
@@ -0,0 +1,77 @@
+import os
+import sys
+from math import cos, hypot, pi, sin
+
+import pyglet
+
+# None of the tests draw anything, so stop pyglet making its hidden window when arcade is imported.
+pyglet.options["shadow_window"] = False
+
+# The editor's modules import each other by bare name, as when it is run from its own directory.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from arcade.gui import UIWidget
+
+from hitbox_data import HitboxCollection, HitboxData, SpriteInfo
+
+
+@pytest.fixture
+def collection():
+    return HitboxCollection(capacity=16, slots=2)
+
+
+@pytest.fixture
+def make_hitbox(collection):
+    """
+    Make hitboxes in a collection of their own, so tests never share state through the default collection.
+    """
+    def _make(points=None, size=(64, 64), color=(1.0, 1.0, 1.0)):
+        return HitboxData(SpriteInfo(size, points), color, collection=collection)
+    return _make
+
+
+@pytest.fixture
+def padding(monkeypatch):
+    """
+    The stack reads the padding and border_width properties of newer arcade releases. Older ones only have the
+    private attributes behind them, so stand them in when they are missing.
+    """
+    for name in ("padding_left", "padding_right", "padding_top", "padding_bottom", "border_width"):
+        if not hasattr(UIWidget, name):
+            monkeypatch.setattr(UIWidget, name, property(lambda widget, _name="_" + name: getattr(widget, _name),
+                                                         lambda widget, value, _name="_" + name: setattr(
+                                                             widget, _name, value)), raising=False)
+
+
+SQUARE = [(-8.0, -8.0), (8.0, -8.0), (8.0, 8.0), (-8.0, 8.0)]
+
+
+def star(generator, count, low=2.0, high=20.0):
+    """
+    A random simple polygon, counter-clockwise, with its vertices at random distances around the origin.
+    """
+    angles = sorted(generator.uniform(0.0, 2 * pi) for _ in range(count))
+    return [(radius * cos(angle), radius * sin(angle))
+            for angle, radius in zip(angles, (generator.uniform(low, high) for _ in range(count)))]
+
+
+def area(points) -> float:
+    return sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(points, list(points[1:]) + [points[0]])) / 2
+
+
+def inside(polygon, point, tolerance=1e-4) -> bool:
+    """
+    Whether the point is inside the polygon, counting points within the tolerance of an edge as inside.
+    """
+    x, y = point
+    result = False
+    for (x1, y1), (x2, y2) in zip(polygon, list(polygon[1:]) + [polygon[0]]):
+        dx, dy = x2 - x1, y2 - y1
+        t = max(0.0, min(1.0, ((x - x1) * dx + (y - y1) * dy) / (dx * dx + dy * dy or 1.0)))
+        if hypot(x1 + t * dx - x, y1 + t * dy - y) <= tolerance:
+            return True
+        if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * dx / dy:
+            result = not result
+    return result
@@ -0,0 +1,69 @@
+import pytest
+
+from hitbox_archive import HitboxArchive, name_hash, write_archive
+
+from conftest import SQUARE
+
+
+@pytest.fixture
+def archive_path(tmp_path, make_hitbox):
+    square = make_hitbox(SQUARE, size=(16, 24))
+    triangle = make_hitbox([(0.0, 0.0), (4.0, 0.0), (0.0, 4.0)], size=(8, 8))
+    path = tmp_path / "hitboxes.hbxa"
+    write_archive(path, {"square.png": square, "triangle.png": triangle, "copy.png": make_hitbox(SQUARE)})
+    return path
+
+
+def test_round_trip(archive_path):
+    with HitboxArchive(archive_path) as archive:
+        assert len(archive) == 3
+        assert sorted(archive) == ["copy.png", "square.png", "triangle.png"]
+        assert "square.png" in archive and "missing.png" not in archive
+        assert archive["square.png"].tolist() == [list(point) for point in SQUARE]
+        assert archive["triangle.png"].shape == (3, 2)
+        assert archive.sprite_size("square.png") == (16, 24)
+        assert archive.get("missing.png") is None
+        assert archive.get_by_hash(name_hash("triangle.png")).tolist() == archive["triangle.png"].tolist()
+        with pytest.raises(KeyError):
+            archive["missing.png"]
+
+
+def test_identical_points_are_stored_once(archive_path):
+    with HitboxArchive(archive_path) as archive:
+        assert len(archive._vertices) == 4 + 3
+
+
+def test_hitbox_data_is_a_copy(archive_path):
+    with HitboxArchive(archive_path) as archive:
+        hitbox = archive.hitbox_data("square.png")
+    hitbox.move_point(0, (0.0, 0.0))
+    assert hitbox.sprite_size == (16, 24)
+    assert hitbox.points.tolist()[1:] == [list(point) for point in SQUARE[1:]]
+
+
+def test_close(archive_path):
+    archive = HitboxArchive(archive_path)
+    archive.close()
+    archive.close()
+    assert len(archive) == 0
+    with pytest.raises(ValueError):
+        archive["square.png"]
+
+
+def test_views_outlive_the_archive(archive_path):
+    with HitboxArchive(archive_path) as archive:
+        points = archive["square.png"]
+        triangle = archive.get_by_hash(name_hash("triangle.png"))
+
+    # Closing with views still held must not fail, and the views stay readable until they are freed.
+    assert len(archive) == 0
+    assert archive._map is None
+    assert points.tolist() == [list(point) for point in SQUARE]
+    assert triangle.shape == (3, 2)
+
+
+def test_not_an_archive(tmp_path):
+    path = tmp_path / "not.hbxa"
+    path.write_bytes(bytes(64))
+    with pytest.raises(ValueError):
+        HitboxArchive(path)
@@ -0,0 +1,40 @@
+from PIL import Image, ImageDraw
+
+from hitbox_archive import HitboxArchive
+from hitbox_batch import main
+from hitbox_io import write_project
+
+from conftest import SQUARE
+
+BOWTIE = [(0.0, 0.0), (8.0, 8.0), (8.0, 0.0), (0.0, 8.0)]
+
+
+def test_invalid_project_fails(tmp_path, make_hitbox, capsys):
+    path = tmp_path / "project.json"
+    write_project(path, {"square.png": make_hitbox(SQUARE), "bowtie.png": make_hitbox(BOWTIE)})
+
+    assert main([str(path), "--no-export", "--workers", "0", "--quiet"]) == 1
+    out = capsys.readouterr().out
+    assert "INVALID: bowtie.png: no area; edges 0 and 2 cross at (4, 4)" in out
+    assert "2 sprites, 2 unique hitboxes, 8 points, 1 invalid" in out
+
+
+def test_valid_project_exports(tmp_path, make_hitbox):
+    path = tmp_path / "project.json"
+    write_project(path, {"square.png": make_hitbox(SQUARE)})
+
+    archive = tmp_path / "project.hbxa"
+    assert main([str(path), "--archive", str(archive), "--levels", "--workers", "0", "--quiet"]) == 0
+    with HitboxArchive(archive) as hitboxes:
+        assert len(hitboxes["square.png"]) == 4
+        assert len(hitboxes["square.png@bbox"]) == 4
+
+
+def test_generates_from_images(tmp_path, capsys):
+    for name, box in (("a.png", (4, 4, 27, 27)), ("b.png", (4, 4, 27, 27)), ("c.png", (8, 2, 20, 29))):
+        image = Image.new("RGBA", (32, 32), (0, 0, 0, 0))
+        ImageDraw.Draw(image).rectangle(box, fill=(255, 255, 255, 255))
+        image.save(tmp_path / name)
+
+    assert main([str(tmp_path), "--no-export", "--workers", "0", "--quiet"]) == 0
+    assert "3 sprites, 2 unique hitboxes, 8 points, 0 invalid" in capsys.readouterr().out
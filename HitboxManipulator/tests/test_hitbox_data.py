@@ -0,0 +1,161 @@
+from time import perf_counter
+
+from numpy import float32, array as np_array, array_equal
+
+from hitbox_data import HitboxCollection, HitboxData, SpriteInfo
+
+from conftest import SQUARE
+
+
+def _edits(hitbox):
+    edits = []
+    hitbox.add_listener(lambda index, removed, inserted: edits.append((index, removed, inserted)))
+    return edits
+
+
+def test_points_round_trip(make_hitbox):
+    hitbox = make_hitbox(SQUARE)
+    assert hitbox.size == 4
+    assert hitbox.points.dtype == float32
+    assert array_equal(hitbox.points, np_array(SQUARE, dtype=float32))
+    assert not hitbox.points.flags.writeable
+
+
+def test_empty_hitbox(make_hitbox):
+    hitbox = make_hitbox()
+    assert hitbox.size == 0
+    assert hitbox.points.shape == (0, 2)
+
+
+def test_insert_remove_move(make_hitbox):
+    hitbox = make_hitbox(SQUARE)
+    edits = _edits(hitbox)
+
+    hitbox.insert_points(1, [(0.0, -10.0), (4.0, -10.0)])
+    assert hitbox.points.tolist() == [list(SQUARE[0]), [0.0, -10.0], [4.0, -10.0], *map(list, SQUARE[1:])]
+
+    hitbox.remove_points(1, 2)
+    assert hitbox.points.tolist() == [list(point) for point in SQUARE]
+
+    hitbox.move_point(2, (9.0, 9.0))
+    assert hitbox.points[2].tolist() == [9.0, 9.0]
+
+    assert edits == [(1, 0, 2), (1, 2, 0), (2, 1, 1)]
+
+
+def test_out_of_range_edits_change_nothing(make_hitbox):
+    hitbox = make_hitbox(SQUARE)
+    edits = _edits(hitbox)
+
+    hitbox.insert_points(5, [(0.0, 0.0)])
+    hitbox.remove_points(3, 2)
+    hitbox.move_points(4, [(0.0, 0.0)])
+    hitbox.transform_points(((2, 0, 0), (0, 2, 0)), 2, 5)
+
+    assert hitbox.points.tolist() == [list(point) for point in SQUARE]
+    assert edits == []
+
+
+def test_insert_point(make_hitbox):
+    hitbox = make_hitbox(SQUARE)
+    hitbox.change_insert_point(1)
+    hitbox.add_point((0.0, -9.0))
+    hitbox.add_point((1.0, -9.0))
+    assert hitbox.points[1:3].tolist() == [[1.0, -9.0], [0.0, -9.0]]
+
+    hitbox.reset_insert_point()
+    hitbox.add_point((0.0, 0.0))
+    assert hitbox.points[-1].tolist() == [0.0, 0.0]
+
+
+def test_transform_points(make_hitbox):
+    hitbox = make_hitbox(SQUARE)
+    edits = _edits(hitbox)
+    hitbox.transform_points(((2.0, 0.0, 1.0), (0.0, 2.0, -1.0), (0.0, 0.0, 1.0)), 1, 3)
+    assert hitbox.points.tolist() == [[-8.0, -8.0], [17.0, -17.0], [17.0, 15.0], [-8.0, 8.0]]
+    assert edits == [(1, 2, 2)]
+
+
+def test_growing_keeps_points_and_neighbours(collection, make_hitbox):
+    first = make_hitbox(SQUARE)
+    second = make_hitbox(SQUARE[::-1])
+
+    # The first hitbox outgrows its region and has to move past the second.
+    added = [(float(index), float(index)) for index in range(100)]
+    for point in added:
+        first.add_point(point)
+
+    assert first.points.tolist() == [list(point) for point in SQUARE + added]
+    assert second.points.tolist() == [list(point) for point in SQUARE[::-1]]
+    assert first.capacity >= first.size
+
+    # No two regions overlap.
+    regions = sorted((hitbox.offset, hitbox.offset + hitbox.capacity) for hitbox in (first, second))
+    assert regions[0][1] <= regions[1][0]
+    assert collection.hitbox_count == 2
+
+
+def test_release_and_compact(collection, make_hitbox):
+    kept = make_hitbox(SQUARE)
+    for _ in range(8):
+        dropped = make_hitbox([(float(index), 0.0) for index in range(64)])
+        dropped.release()
+    assert collection.hitbox_count == 1
+
+    collection.compact()
+    assert kept.offset == 0
+    assert kept.points.tolist() == [list(point) for point in SQUARE]
+
+    kept.shrink_to_fit()
+    collection.shrink_to_fit()
+    assert kept.capacity == 4
+    assert collection.capacity == 4
+    assert kept.points.tolist() == [list(point) for point in SQUARE]
+
+
+def test_released_slots_are_reused(collection, make_hitbox):
+    make_hitbox(SQUARE).release()
+    reused = make_hitbox(SQUARE)
+    assert collection.hitbox_count == 1
+    assert reused.points.tolist() == [list(point) for point in SQUARE]
+
+
+def test_no_dirty_ranges_without_a_gpu_buffer(collection, make_hitbox):
+    for _ in range(16):
+        make_hitbox(SQUARE).move_point(0, (0.0, 0.0))
+    assert not collection.dirty
+    collection.sync()
+    assert collection.dirty_ranges == ()
+
+
+def test_dirty_ranges_merge(collection):
+    # Stands in for the GPU buffer, which needs a GL context. The ranges are never synced here.
+    collection._points_GPU = object()
+
+    collection.mark_dirty(10, 12)
+    collection.mark_dirty(0, 2)
+    collection.mark_dirty(20, 22)
+    assert collection.dirty_ranges == ((0, 16), (80, 96), (160, 176))
+
+    # Touching and overlapping ranges are merged, however many they span.
+    collection.mark_dirty(2, 4)
+    collection.mark_dirty(11, 21)
+    assert collection.dirty_ranges == ((0, 32), (80, 176))
+    collection.mark_dirty(4, 30)
+    assert collection.dirty_ranges == ((0, 240),)
+
+
+def test_building_hitboxes_scales_linearly():
+    def _build(count):
+        collection = HitboxCollection()
+        start = perf_counter()
+        hitboxes = [HitboxData(SpriteInfo((16, 16), SQUARE), collection=collection) for _ in range(count)]
+        elapsed = perf_counter() - start
+        assert collection.hitbox_count == len(hitboxes)
+        return elapsed
+
+    _build(500)
+    small = min(_build(500) for _ in range(3))
+    large = min(_build(4000) for _ in range(3))
+    # Eight times the hitboxes should take about eight times as long. Quadratic building takes sixty-four times.
+    assert large < small * 20
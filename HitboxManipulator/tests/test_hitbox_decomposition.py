@@ -0,0 +1,43 @@
+from random import Random
+
+from numpy import roll
+
+from hitbox_decomposition import decompose, is_convex
+
+from conftest import SQUARE, area, inside, star
+
+
+def _convex(piece):
+    edges = roll(piece, -1, axis=0) - piece
+    following = roll(edges, -1, axis=0)
+    return bool((edges[:, 0] * following[:, 1] - edges[:, 1] * following[:, 0] >= -1e-9).all())
+
+
+def test_convex_outline_is_one_piece():
+    assert is_convex(SQUARE)
+    pieces = decompose(SQUARE)
+    assert len(pieces) == 1
+    assert area(pieces[0].tolist()) == area(SQUARE)
+
+
+def test_l_shape():
+    outline = [(0.0, 0.0), (4.0, 0.0), (4.0, 2.0), (2.0, 2.0), (2.0, 4.0), (0.0, 4.0)]
+    assert not is_convex(outline)
+    pieces = decompose(outline)
+    assert len(pieces) == 2
+    assert all(_convex(piece) for piece in pieces)
+
+
+def test_pieces_are_convex_and_cover_the_outline():
+    generator = Random(5)
+    for _ in range(40):
+        outline = star(generator, generator.randint(4, 30))
+        pieces = [piece.tolist() for piece in decompose(outline)]
+        assert all(_convex(piece) for piece in decompose(outline))
+        assert abs(sum(area(piece) for piece in pieces) - area(outline)) < 1e-6
+
+        # A point inside the outline is in exactly one piece and a point outside is in none.
+        for _ in range(50):
+            point = (generator.uniform(-20.0, 20.0), generator.uniform(-20.0, 20.0))
+            count = sum(inside(piece, point, tolerance=0.0) for piece in pieces)
+            assert count == (1 if inside(outline, point, tolerance=0.0) else 0)
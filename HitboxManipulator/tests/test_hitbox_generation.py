@@ -0,0 +1,71 @@
+from PIL import Image
+from numpy import asarray, uint8, ones as np_ones, zeros as np_zeros
+
+from hitbox_generation import generate_hitbox, simplify_outline, trace_outline
+from hitbox_simplify import simplify_project, summarise
+from hitbox_validation import validate, validate_project
+from process_pool import map_hitboxes, pool_map
+
+from conftest import SQUARE
+
+
+def _image(mask) -> Image.Image:
+    pixels = np_zeros((len(mask), len(mask[0]), 4), dtype=uint8)
+    pixels[..., 3] = [[255 if solid else 0 for solid in row] for row in mask]
+    return Image.fromarray(pixels, "RGBA")
+
+
+def test_square():
+    points = generate_hitbox(_image([[0, 0, 0, 0], [0, 1, 1, 0], [0, 1, 1, 0], [0, 0, 0, 0]]), epsilon=0)
+    assert sorted(points.tolist()) == [[-1.0, -1.0], [-1.0, 1.0], [1.0, -1.0], [1.0, 1.0]]
+    assert validate(points).winding == 1
+
+
+def test_empty():
+    assert generate_hitbox(_image([[0, 0], [0, 0]])).shape == (0, 2)
+
+
+def test_diagonal_pixels_are_split():
+    # Two pixels which only share a corner must not be joined into a loop which pinches at that corner.
+    points = generate_hitbox(_image([[1, 0], [0, 1]]), epsilon=0)
+    report = validate(points)
+    assert report.valid, report.describe()
+    assert len({tuple(point) for point in points.tolist()}) == len(points) == 4
+
+
+def test_diagonal_staircase_is_simple():
+    mask = [[1, 1, 0, 0], [1, 1, 0, 0], [0, 0, 1, 1], [0, 0, 1, 1]]
+    outline = trace_outline(asarray(mask, dtype=bool))
+    assert len({tuple(point) for point in outline.tolist()}) == len(outline) == 4
+
+
+def test_simplify_outline_keeps_corners():
+    outline = trace_outline(np_ones((4, 6), dtype=bool))
+    assert len(simplify_outline(outline, 1.0)) == 4
+
+
+def test_pool_map_keeps_order():
+    square = [list(point) for point in SQUARE]
+    for workers in (0, 2):
+        reports = list(pool_map(validate, [square, square[::-1], square[:2]], workers=workers, chunksize=1))
+        assert [report.winding for report in reports] == [1, -1, 0]
+
+
+def test_map_hitboxes_shares_results(make_hitbox):
+    square = make_hitbox(SQUARE)
+    calls = []
+    results = map_hitboxes(validate, {"a.png": square, "b.png": make_hitbox(SQUARE[:2]), "c.png": square},
+                           workers=0, progress=lambda: calls.append(None))
+    assert len(calls) == 2
+    assert results["a.png"] is results["c.png"]
+    assert not results["b.png"].valid
+    assert validate_project({"a.png": square}, workers=0)["a.png"].valid
+
+
+def test_summarise_counts_shared_hitboxes_once(make_hitbox):
+    octagon = make_hitbox([(8.0, 0.0), (6.0, 6.0), (0.0, 8.0), (-6.0, 6.0), (-8.0, 0.0), (-6.0, -6.0), (0.0, -8.0),
+                           (6.0, -6.0)])
+    reports = simplify_project({"a.png": octagon, "b.png": octagon, "c.png": make_hitbox(SQUARE)}, target=4,
+                               workers=0)
+    assert octagon.size == 4
+    assert summarise(reports).startswith("3 sprites, 2 unique hitboxes, 12 -> 8 points")
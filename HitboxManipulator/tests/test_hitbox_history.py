@@ -0,0 +1,136 @@
+import pytest
+
+from hitbox_history import HitboxHistory, _Delta
+
+from conftest import SQUARE
+
+
+def _points(hitbox):
+    return hitbox.points.tolist()
+
+
+def test_undo_redo_each_edit(make_hitbox):
+    hitbox = make_hitbox(SQUARE)
+    history = HitboxHistory()
+    states = [_points(hitbox)]
+
+    history.add_point(hitbox, (0.0, 0.0))
+    states.append(_points(hitbox))
+    history.insert_points(hitbox, 1, [(0.0, -9.0), (1.0, -9.0)])
+    states.append(_points(hitbox))
+    history.remove_points(hitbox, 0, 2)
+    states.append(_points(hitbox))
+    history.move_points(hitbox, 1, [(5.0, 5.0)])
+    states.append(_points(hitbox))
+    history.transform_points(hitbox, ((2.0, 0.0, 0.0), (0.0, 2.0, 0.0)))
+    states.append(_points(hitbox))
+    history.set_points(hitbox, [(0.0, 0.0), (1.0, 0.0), (0.0, 1.0)])
+    states.append(_points(hitbox))
+
+    assert history.undo_steps == 6
+    for state in reversed(states[:-1]):
+        assert history.undo()
+        assert _points(hitbox) == state
+    assert not history.undo()
+
+    for state in states[1:]:
+        assert history.redo()
+        assert _points(hitbox) == state
+    assert not history.redo()
+
+
+def test_drag_merges_into_one_step(make_hitbox):
+    hitbox = make_hitbox(SQUARE)
+    history = HitboxHistory()
+
+    history.move_point(hitbox, 2, (9.0, 9.0))
+    for step in range(10, 20):
+        history.move_point(hitbox, 2, (float(step), float(step)), merge=True)
+    assert history.undo_steps == 1
+    assert _points(hitbox)[2] == [19.0, 19.0]
+
+    history.undo()
+    assert _points(hitbox) == [list(point) for point in SQUARE]
+    history.redo()
+    assert _points(hitbox)[2] == [19.0, 19.0]
+
+
+def test_merge_needs_the_same_points(make_hitbox):
+    hitbox = make_hitbox(SQUARE)
+    history = HitboxHistory()
+
+    history.move_point(hitbox, 2, (9.0, 9.0))
+    history.move_point(hitbox, 1, (9.0, -9.0), merge=True)
+    assert history.undo_steps == 2
+
+
+def test_drag_never_merges_into_a_transform(make_hitbox):
+    hitbox = make_hitbox(SQUARE)
+    history = HitboxHistory()
+
+    # A transform of a single point looks like a move of it, but is a different command.
+    history.transform_points(hitbox, ((1.0, 0.0, 1.0), (0.0, 1.0, 1.0)), 2, 3)
+    history.move_point(hitbox, 2, (20.0, 20.0), merge=True)
+    assert history.undo_steps == 2
+
+    history.undo()
+    assert _points(hitbox)[2] == [9.0, 9.0]
+
+
+def test_other_commands_close_the_merge(make_hitbox):
+    hitbox = make_hitbox(SQUARE)
+    history = HitboxHistory()
+
+    history.move_point(hitbox, 2, (9.0, 9.0))
+    history.add_point(hitbox, (0.0, 0.0))
+    history.move_point(hitbox, 2, (10.0, 10.0), merge=True)
+    assert history.undo_steps == 3
+
+    # Nor can a drag fold into a move which was undone and redone.
+    history.undo()
+    history.redo()
+    history.move_point(hitbox, 2, (11.0, 11.0), merge=True)
+    assert history.undo_steps == 4
+
+
+def test_delta_is_abstract():
+    with pytest.raises(TypeError):
+        _Delta(None)
+
+
+def test_group_is_one_step(make_hitbox):
+    hitbox = make_hitbox(SQUARE)
+    history = HitboxHistory()
+
+    with history.group():
+        history.add_point(hitbox, (0.0, 0.0))
+        with history.group():
+            history.remove_points(hitbox, 0)
+    assert history.undo_steps == 1
+
+    history.undo()
+    assert _points(hitbox) == [list(point) for point in SQUARE]
+
+
+def test_new_edit_drops_redo(make_hitbox):
+    hitbox = make_hitbox(SQUARE)
+    history = HitboxHistory()
+
+    history.add_point(hitbox, (0.0, 0.0))
+    history.undo()
+    assert history.can_redo
+    history.add_point(hitbox, (1.0, 1.0))
+    assert not history.can_redo
+    assert history.memory == sum(step.nbytes for step in history._undo)
+
+
+def test_memory_cap_evicts_oldest(make_hitbox):
+    hitbox = make_hitbox(SQUARE)
+    history = HitboxHistory(max_steps=3)
+    for index in range(5):
+        history.add_point(hitbox, (float(index), 0.0))
+    assert history.undo_steps == 3
+
+    history.memory_cap = 0
+    assert history.undo_steps == 0
+    assert history.memory == 0
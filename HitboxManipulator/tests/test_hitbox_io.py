@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from hitbox_io import read_entries, read_project, write_project
+
+from conftest import SQUARE
+
+
+def test_round_trip_with_refs(tmp_path, make_hitbox):
+    square = make_hitbox(SQUARE, size=(16, 16), color=(1.0, 0.0, 0.0))
+    triangle = make_hitbox([(0.0, 0.0), (4.0, 0.0), (0.0, 4.0)], size=(8, 8))
+    path = tmp_path / "project.json"
+
+    written = write_project(path, [("square.png", square), ("triangle.png", triangle), ("copy.png", square)],
+                            {"triangle.png": {"pieces": [[[0.0, 0.0], [4.0, 0.0], [0.0, 4.0]]]}})
+    assert written == 3
+
+    # The file is still plain JSON, with the shared hitbox written once.
+    data = json.loads(path.read_text())
+    assert data["version"] == 1
+    assert data["hitboxes"]["copy.png"] == {"ref": "square.png"}
+    assert data["hitboxes"]["triangle.png"]["pieces"] == [[[0.0, 0.0], [4.0, 0.0], [0.0, 4.0]]]
+
+    loaded = dict(read_project(path))
+    assert list(loaded) == ["square.png", "triangle.png", "copy.png"]
+    assert loaded["copy.png"] is loaded["square.png"]
+    assert loaded["square.png"].points.tolist() == [list(point) for point in SQUARE]
+    assert loaded["square.png"].sprite_size == (16, 16)
+    assert loaded["square.png"].color == (1.0, 0.0, 0.0)
+    assert loaded["triangle.png"].size == 3
+
+
+def test_empty_project(tmp_path):
+    path = tmp_path / "empty.json"
+    assert write_project(path, {}) == 0
+    assert json.loads(path.read_text()) == {"version": 1, "hitboxes": {}}
+    assert list(read_project(path)) == []
+
+
+def test_streams_in_small_chunks(tmp_path, make_hitbox):
+    path = tmp_path / "project.json"
+    write_project(path, {f"sprite_{index}.png": make_hitbox(SQUARE) for index in range(20)})
+    with open(path) as file:
+        entries = list(read_entries(file, chunk_size=7))
+    assert [name for name, _ in entries] == [f"sprite_{index}.png" for index in range(20)]
+    assert all(entry["points"] == [list(point) for point in SQUARE] for _, entry in entries)
+
+
+def test_unknown_ref(tmp_path):
+    path = tmp_path / "bad.json"
+    path.write_text('{"version": 1, "hitboxes": {"copy.png": {"ref": "missing.png"}}}')
+    with pytest.raises(ValueError):
+        list(read_project(path))
+
+
+def test_newer_version(tmp_path):
+    path = tmp_path / "new.json"
+    path.write_text('{"version": 99, "hitboxes": {}}')
+    with pytest.raises(ValueError):
+        list(read_project(path))
@@ -0,0 +1,103 @@
+from math import cos, hypot, pi, sin
+from random import Random
+
+from numpy import asarray, roll
+
+from hitbox_archive import HitboxArchive, write_archive
+from hitbox_data import HitboxData
+from hitbox_lod import fill_outline, generate_levels, generate_project_levels, level_entries
+from hitbox_validation import validate
+
+ELLIPSE = [(20.0 * cos(2 * pi * i / 16), 10.0 * sin(2 * pi * i / 16)) for i in range(16)]
+
+
+def _contains(polygon, points, tolerance=1e-4):
+    # Whether every point is inside or on a counter-clockwise convex polygon.
+    polygon = asarray(polygon, dtype=float)
+    edges = roll(polygon, -1, axis=0) - polygon
+    for x, y in points:
+        cross = edges[:, 0] * (y - polygon[:, 1]) - edges[:, 1] * (x - polygon[:, 0])
+        if (cross < -tolerance).any():
+            return False
+    return True
+
+
+def _inside(polygon, point, tolerance=1e-4):
+    # Even-odd ray cast, counting points within the tolerance of an edge as inside.
+    x, y = point
+    inside = False
+    for (x1, y1), (x2, y2) in zip(polygon, roll(polygon, -1, axis=0)):
+        dx, dy = x2 - x1, y2 - y1
+        t = max(0.0, min(1.0, ((x - x1) * dx + (y - y1) * dy) / (dx * dx + dy * dy or 1.0)))
+        if hypot(x1 + t * dx - x, y1 + t * dy - y) <= tolerance:
+            return True
+        if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * dx / dy:
+            inside = not inside
+    return inside
+
+
+def _star(generator, count):
+    return [(radius * cos(2 * pi * i / count), radius * sin(2 * pi * i / count))
+            for i, radius in enumerate(generator.uniform(2.0, 20.0) for _ in range(count))]
+
+
+def _edge_points(polygon, steps=4):
+    # The vertices of a polygon and points along each edge, enough to catch an edge leaving a non-convex polygon.
+    polygon = asarray(polygon, dtype=float)
+    for start, end in zip(polygon, roll(polygon, -1, axis=0)):
+        for step in range(steps):
+            yield tuple(start + (end - start) * step / steps)
+
+
+def _assert_nested(levels, coarse_vertices):
+    assert len(levels.coarse) <= max(3, coarse_vertices)
+    assert _contains(levels.bbox, levels.hull)
+    assert _contains(levels.hull, levels.coarse)
+    assert all(_inside(levels.coarse, point) for point in _edge_points(levels.full))
+
+
+def test_convex_outline_is_reduced_within_the_max_distance():
+    levels = generate_levels(ELLIPSE, coarse_vertices=10, max_distance=2.0)
+    assert len(levels.coarse) == 10
+    _assert_nested(levels, 10)
+    # Pushed out by no more than the max distance.
+    assert all(min(hypot(x - ex, y - ey) for ex, ey in _edge_points(ELLIPSE, 64)) <= 2.0 for x, y in levels.coarse)
+
+
+def test_vertex_budget_wins_over_the_max_distance():
+    levels = generate_levels(ELLIPSE, coarse_vertices=8, max_distance=2.0)
+    assert len(levels.coarse) == 8
+    _assert_nested(levels, 8)
+
+
+def test_levels_are_nested():
+    generator = Random(7)
+    for _ in range(50):
+        coarse_vertices = generator.randint(3, 10)
+        _assert_nested(generate_levels(_star(generator, generator.randint(8, 60)), coarse_vertices,
+                                       max_added_area=generator.choice((None, 20.0)),
+                                       max_distance=generator.choice((None, 0.5, 2.0))), coarse_vertices)
+
+
+def test_filled_outline_stays_simple_and_contains_the_original():
+    generator = Random(7)
+    for _ in range(50):
+        outline = _star(generator, generator.randint(8, 60))
+        filled = fill_outline(outline, 6)
+        assert len(filled) <= 6
+        assert validate(filled).valid
+        assert all(_inside(filled, point) for point in _edge_points(outline))
+
+
+def test_level_entries_do_not_make_hitboxes(tmp_path, make_hitbox):
+    hitboxes = {"a.png": make_hitbox(ELLIPSE), "b.png": make_hitbox(ELLIPSE)}
+    hitboxes["c.png"] = hitboxes["a.png"]
+    entries = list(level_entries(hitboxes, generate_project_levels(hitboxes)))
+    assert len(entries) == 3 * 4
+    assert all(isinstance(entry, HitboxData) for name, entry in entries if "@" not in name)
+    assert not any(isinstance(entry, HitboxData) for name, entry in entries if "@" in name)
+
+    write_archive(tmp_path / "levels.hbxa", entries)
+    with HitboxArchive(tmp_path / "levels.hbxa") as archive:
+        assert len(archive["a.png@bbox"]) == 4
+        assert archive.sprite_size("c.png@coarse") == (64, 64)
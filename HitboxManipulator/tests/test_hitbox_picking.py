@@ -0,0 +1,94 @@
+from random import Random
+
+from hitbox_picking import HitboxPicker, _Order
+
+from conftest import SQUARE
+
+
+def test_pick_point(make_hitbox):
+    picker = HitboxPicker(make_hitbox(SQUARE))
+
+    pick = picker.pick_point(7.0, 7.5, 2.0)
+    assert pick.index == 2
+    assert abs(pick.distance - 1.118) < 1e-3
+    assert picker.pick_point(0.0, 0.0, 2.0) is None
+
+
+def test_pick_edge(make_hitbox):
+    picker = HitboxPicker(make_hitbox(SQUARE))
+
+    pick = picker.pick_edge(1.0, -9.0, 2.0)
+    assert pick.index == 0
+    assert pick.distance == 1.0
+    assert pick.point == (1.0, -8.0)
+
+    # The closing edge from the last point back to the first.
+    assert picker.pick_edge(-9.0, 0.0, 2.0).index == 3
+    assert picker.pick_edge(0.0, 0.0, 2.0) is None
+
+
+def test_follows_edits(make_hitbox):
+    hitbox = make_hitbox(SQUARE)
+    picker = HitboxPicker(hitbox)
+
+    # Splitting the bottom edge renumbers every point after it.
+    hitbox.insert_points(1, [(0.0, -12.0)])
+    assert picker.pick_point(0.0, -12.0, 1.0).index == 1
+    assert picker.pick_point(8.0, 8.0, 1.0).index == 3
+    assert picker.pick_edge(4.0, -10.0, 1.0).index == 1
+    assert picker.pick_edge(0.0, -8.0, 1.0) is None
+
+    hitbox.remove_points(0)
+    assert picker.pick_point(-8.0, -8.0, 1.0) is None
+    assert picker.pick_point(8.0, 8.0, 1.0).index == 2
+    assert picker.pick_edge(-4.0, -2.0, 1.0).index == 3
+
+    hitbox.move_point(0, (0.0, -20.0))
+    assert picker.pick_point(0.0, -20.0, 1.0).index == 0
+    assert picker.pick_point(0.0, -12.0, 1.0) is None
+
+
+def test_release(make_hitbox):
+    hitbox = make_hitbox(SQUARE)
+    picker = HitboxPicker(hitbox)
+    picker.release()
+    hitbox.move_point(0, (0.0, 0.0))
+    assert picker.pick_point(-8.0, -8.0, 1.0).index == 0
+
+
+def test_order_matches_a_list():
+    rng = Random(6)
+    order, expected, next_id = _Order(block_size=4), [], 0
+    for _ in range(2000):
+        index = rng.randint(0, len(expected))
+        removed = rng.randint(0, min(6, len(expected) - index))
+        ids = list(range(next_id, next_id + rng.randint(0, 6)))
+        next_id += len(ids)
+
+        assert order.slice(index, index + removed) == expected[index:index + removed]
+        order.splice(index, removed, ids)
+        expected[index:index + removed] = ids
+
+        assert len(order) == len(expected)
+        if expected:
+            position = rng.randrange(len(expected))
+            assert order[position] == expected[position]
+            assert order.index(expected[position]) == position
+    assert order.slice(0, len(expected)) == expected
+
+
+def test_follows_random_edits(make_hitbox):
+    rng = Random(7)
+    hitbox = make_hitbox([(float(x), 0.0) for x in range(0, 400, 4)])
+    picker = HitboxPicker(hitbox)
+    for _ in range(300):
+        index = rng.randint(0, hitbox.size)
+        if rng.random() < 0.5 or hitbox.size < 4:
+            hitbox.insert_points(index, [(rng.uniform(0, 400), rng.uniform(0, 400))])
+        elif index < hitbox.size:
+            hitbox.remove_points(index)
+
+    for index in rng.sample(range(hitbox.size), 20):
+        x, y = hitbox.points[index].tolist()
+        pick = picker.pick_point(x, y, 0.0)
+        assert hitbox.points[pick.index].tolist() == [x, y]
@@ -0,0 +1,63 @@
+from math import hypot
+from random import Random
+
+import pytest
+
+from hitbox_simplify import simplify
+
+from conftest import SQUARE, star
+
+
+def _segment_distance(point, start, end):
+    (x, y), (x1, y1), (x2, y2) = point, start, end
+    dx, dy = x2 - x1, y2 - y1
+    t = max(0.0, min(1.0, ((x - x1) * dx + (y - y1) * dy) / (dx * dx + dy * dy or 1.0)))
+    return hypot(x1 + t * dx - x, y1 + t * dy - y)
+
+
+def _samples(outline, steps=8):
+    for (x1, y1), (x2, y2) in zip(outline, outline[1:] + outline[:1]):
+        for step in range(steps):
+            yield x1 + (x2 - x1) * step / steps, y1 + (y2 - y1) * step / steps
+
+
+def _distance(point, outline):
+    return min(_segment_distance(point, start, end) for start, end in zip(outline, outline[1:] + outline[:1]))
+
+
+def _hausdorff(first, second):
+    # Sampled along both outlines, which is close enough for a test of a bound.
+    return max(max(_distance(point, second) for point in _samples(first)),
+               max(_distance(point, first) for point in _samples(second)))
+
+
+def test_needs_a_limit():
+    with pytest.raises(ValueError):
+        simplify(SQUARE)
+
+
+def test_target_vertex_count():
+    generator = Random(3)
+    for target in (3, 5, 12):
+        outline = star(generator, 40)
+        points, report = simplify(outline, target=target)
+        assert len(points) == report.remaining == target
+        assert report.original == 40
+
+
+def test_max_distance_bounds_the_outline():
+    generator = Random(9)
+    removed = 0
+    for max_distance in (0.5, 1.0, 3.0):
+        for _ in range(10):
+            outline = star(generator, generator.randint(10, 60), low=10.0, high=12.0)
+            points, report = simplify(outline, max_distance=max_distance)
+            points = [tuple(point) for point in points.tolist()]
+            removed += report.removed
+            assert report.max_distance <= max_distance + 1e-6
+            assert _hausdorff(outline, points) <= max_distance + 1e-4
+
+            # With a target too, the distance still wins over the vertex count.
+            limited, _ = simplify(outline, target=3, max_distance=max_distance)
+            assert len(points) == len(limited)
+    assert removed
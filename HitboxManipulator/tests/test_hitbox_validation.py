@@ -0,0 +1,40 @@
+from random import Random
+
+from numpy import asarray, float64
+
+from hitbox_validation import _edge_crossings, find_crossings, validate
+
+from conftest import SQUARE
+
+
+def _pairwise(points):
+    # Every crossing found by testing each edge against all the others, as the incremental validator does.
+    points = asarray(points, dtype=float64)
+    pairs = set()
+    for edge in range(len(points)):
+        for other, _ in _edge_crossings(points, edge):
+            pairs.add((min(edge, other), max(edge, other)))
+    return pairs
+
+
+def test_square_is_valid():
+    report = validate(SQUARE)
+    assert report.valid
+    assert report.winding == 1
+    assert validate(SQUARE[::-1]).winding == -1
+
+
+def test_bowtie_crosses():
+    report = validate([(0.0, 0.0), (4.0, 4.0), (4.0, 0.0), (0.0, 4.0)])
+    assert not report.valid
+    assert [(crossing.first, crossing.second, crossing.point) for crossing in report.crossings] == [(0, 2, (2.0, 2.0))]
+
+
+def test_sweep_matches_pairwise():
+    generator = Random(11)
+    for _ in range(300):
+        count = generator.randint(3, 14)
+        # A small integer grid makes shared points, touching and overlapping edges common.
+        points = [(float(generator.randint(0, 6)), float(generator.randint(0, 6))) for _ in range(count)]
+        swept = {(crossing.first, crossing.second) for crossing in find_crossings(points)}
+        assert swept == _pairwise(points), points
@@ -0,0 +1,31 @@
+from PIL import Image, ImageDraw
+
+from arcade import Texture
+
+from texture_cache import TextureCache
+
+
+def _sprite(path, color, box=(8, 4, 24, 28)):
+    image = Image.new("RGBA", (32, 32), (0, 0, 0, 0))
+    ImageDraw.Draw(image).rectangle(box, fill=color)
+    image.save(path)
+    return str(path)
+
+
+def test_duplicate_textures_share_one_hit_box(tmp_path, monkeypatch):
+    # The atlas is only used when inserting, so create never needs a window.
+    cache = TextureCache(atlas=object())
+    cache.add("red.png", _sprite(tmp_path / "red.png", (255, 0, 0, 255)))
+    cache.add("blue.png", _sprite(tmp_path / "blue.png", (0, 0, 255, 255)))
+    cache.add("wide.png", _sprite(tmp_path / "wide.png", (255, 0, 0, 255), box=(2, 4, 30, 28)))
+
+    traced = []
+    calculate = Texture._calculate_hit_box_points
+    monkeypatch.setattr(Texture, "_calculate_hit_box_points",
+                        lambda texture: traced.append(texture.name) or calculate(texture))
+
+    red, blue, wide = cache.create("red.png"), cache.create("blue.png"), cache.create("wide.png")
+
+    assert traced == ["red.png", "wide.png"]
+    assert blue.hit_box_points == red.hit_box_points
+    assert wide.hit_box_points != red.hit_box_points
@@ -0,0 +1,69 @@
+from concurrent.futures import wait
+from time import perf_counter
+
+import pytest
+
+from texture_loader import TextureLoader
+
+
+class _Cache:
+    """
+    Stands in for a TextureCache, which needs a window for its atlas. Inserting "full.png" fails like a full atlas.
+    """
+
+    def __init__(self):
+        self.paths = {}
+        self.inserted = []
+
+    def __contains__(self, name):
+        return name in self.paths
+
+    def add(self, name, path=None):
+        self.paths[name] = path
+
+    def is_loaded(self, name):
+        return name in self.inserted
+
+    def create(self, name):
+        if name == "broken.png":
+            raise OSError("cannot identify image file")
+        return f"texture of {name}"
+
+    def insert(self, texture):
+        if texture == "texture of full.png":
+            raise MemoryError("No more space for texture in the atlas")
+        self.inserted.append(texture[len("texture of "):])
+        return texture
+
+
+def _update_all(loader):
+    start = perf_counter()
+    while loader.pending and perf_counter() - start < 5.0:
+        loader.update()
+
+
+@pytest.fixture
+def loader():
+    _loader = TextureLoader(_Cache(), workers=2)
+    yield _loader
+    _loader.shutdown()
+
+
+def test_loads(loader):
+    futures = loader.load_many([("a.png", None), ("b.png", None)])
+    _update_all(loader)
+    assert [future.result(0) for future in futures] == ["texture of a.png", "texture of b.png"]
+
+
+def test_failed_upload_resolves_the_future(loader, capsys):
+    futures = loader.load_many([("a.png", None), ("full.png", None), ("b.png", None), ("broken.png", None)])
+    _update_all(loader)
+
+    done, not_done = wait(futures, timeout=0)
+    assert not not_done
+    assert futures[0].result(0) == "texture of a.png"
+    assert isinstance(futures[1].exception(0), MemoryError)
+    assert futures[2].result(0) == "texture of b.png"
+    assert isinstance(futures[3].exception(0), OSError)
+    assert loader.pending == 0
+    assert "ERROR: Could not upload the texture full.png" in capsys.readouterr().out
@@ -0,0 +1,25 @@
+from pathlib import Path
+
+import style
+from tool_gui import HitboxInfoLine
+
+from conftest import SQUARE
+
+
+def test_selector_only_reshows_rows_when_a_hitbox_in_view_changes(padding, make_hitbox):
+    style.read_style(Path(style.__file__).parent / "resources" / "style.json")
+    hitboxes = [make_hitbox(SQUARE) for _ in range(3)]
+    line = HitboxInfoLine()
+    selector = line._hitbox_info_selector
+    line.show_hitboxes(hitboxes, on_pick=lambda index: None)
+
+    line.on_update(1 / 60)
+    # As if the list had been laid out, which needs a GL context for the rows' text.
+    selector._dirty = selector._reshow = False
+    for _ in range(3):
+        line.on_update(1 / 60)
+        assert not selector._dirty
+
+    hitboxes[0].add_point((0.0, 12.0))
+    line.on_update(1 / 60)
+    assert selector._dirty
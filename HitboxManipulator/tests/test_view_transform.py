@@ -0,0 +1,48 @@
+from random import Random
+
+from arcade.gui import UIWidget
+from numpy import allclose, array as np_array
+
+from hitbox_data import FrameData
+from view_transform import ViewTransform
+
+
+def _view(zoom=0.5, shift=(12.0, -7.0)):
+    frame = FrameData(UIWidget(x=40, y=30, width=402, height=302), zoom, shift)
+    return frame, ViewTransform(frame)
+
+
+def _screen_points(count=100):
+    generator = Random(3)
+    return [(generator.uniform(-50.0, 500.0), generator.uniform(-50.0, 400.0)) for _ in range(count)]
+
+
+def test_centre_of_frame_shows_the_shift():
+    frame, view = _view()
+    x, y = frame.pos[0] + frame.size[0] / 2, frame.pos[1] + frame.size[1] / 2
+    assert allclose(view.to_hitbox(x, y), (12.0, -7.0))
+
+
+def test_round_trip():
+    _, view = _view()
+    for x, y in _screen_points():
+        assert allclose(view.to_screen(*view.to_hitbox(x, y)), (x, y))
+        assert allclose(view.to_hitbox(*view.to_screen(x, y)), (x, y))
+
+
+def test_arrays_match_single_points():
+    _, view = _view()
+    points = _screen_points()
+    assert allclose(view.points_to_hitbox(points), np_array([view.to_hitbox(x, y) for x, y in points]), atol=1e-3)
+    assert allclose(view.points_to_screen(points), np_array([view.to_screen(x, y) for x, y in points]), atol=1e-3)
+
+
+def test_follows_the_frame():
+    frame, view = _view()
+    before = view.to_hitbox(100.0, 100.0)
+    frame.frame_zoom = 2.0
+    frame.frame_shift = (0.0, 0.0)
+    assert view.scale == 2.0
+    assert not allclose(view.to_hitbox(100.0, 100.0), before)
+    x, y = frame.pos[0] + frame.size[0] / 2, frame.pos[1] + frame.size[1] / 2
+    assert allclose(view.to_hitbox(x, y), (0.0, 0.0))
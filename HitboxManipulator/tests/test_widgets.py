@@ -0,0 +1,106 @@
+import pytest
+
+from arcade.gui import UIWidget, bind
+from arcade.gui.widgets import Rect
+
+from widgets import UIStackLayout, _unbind
+
+
+def _listeners(widget):
+    return UIWidget.rect.obs[widget].listeners
+
+
+def _widget(width, height, size_hint=None, size_hint_min=None):
+    return UIWidget(width=width, height=height, size_hint=size_hint, size_hint_min=size_hint_min)
+
+
+def _full_size_hint_min(stack):
+    # The stack's min size worked out from scratch, as the stack did before it cached it.
+    sizes = []
+    for child in stack.children:
+        min_width, min_height = child.size_hint_min or (0, 0)
+        sizes.append((max(child.width, min_width), max(child.height, min_height)))
+    if not sizes:
+        return 0, 0
+    spacing = (len(sizes) - 1) * stack._space_between
+    if stack.vertical:
+        return max(width for width, _ in sizes), sum(height for _, height in sizes) + spacing
+    return sum(width for width, _ in sizes) + spacing, max(height for _, height in sizes)
+
+
+def _assert_matches_full_layout(stack):
+    expected = _full_size_hint_min(stack)
+    stack.do_layout()
+    assert stack.size_hint_min == expected
+
+    # Laying everything out again from scratch must not move any child.
+    cached = [child.rect for child in stack.children]
+    stack.invalidate()
+    stack.do_layout()
+    assert [child.rect for child in stack.children] == cached
+
+
+def test_unbind():
+    widget, calls = UIWidget(), []
+    listener = lambda: calls.append(widget.rect)  # noqa: E731
+    bind(widget, "rect", listener)
+    _unbind(widget, "rect", listener)
+    _unbind(widget, "rect", listener)
+
+    widget.rect = Rect(0, 0, 5, 5)
+    assert not calls
+
+
+def test_stack_stops_listening_to_removed_children(padding):
+    stack = UIStackLayout()
+    kept, removed = UIWidget(width=10, height=10), UIWidget(width=10, height=10)
+    stack.add(kept)
+    stack.add(removed)
+    assert stack._child_changed in _listeners(removed)
+
+    stack.remove(removed)
+    assert stack._child_changed not in _listeners(removed)
+    assert stack._child_changed in _listeners(kept)
+
+    stack.do_layout()
+    removed.rect = Rect(0, 0, 50, 50)
+    assert not stack._layout_dirty
+
+    stack.clear()
+    assert stack._child_changed not in _listeners(kept)
+
+
+@pytest.mark.parametrize("vertical", (True, False))
+def test_cached_layout_matches_full_layout(padding, vertical):
+    stack = UIStackLayout(0, 0, 300, 400, vertical=vertical, space_between=3)
+    _assert_matches_full_layout(stack)
+
+    # Appending, one at a time and several between layouts, only places the new children.
+    for size in ((10, 20), (30, 15), (25, 25)):
+        stack.add(_widget(*size))
+        _assert_matches_full_layout(stack)
+    stack.add(_widget(5, 5), anchor="bottom")
+    stack.add(_widget(40, 12))
+    _assert_matches_full_layout(stack)
+
+    # A child which grows along the stack changes how every other child is placed.
+    stack.add(_widget(10, 10, size_hint=(0.5, 0.5)))
+    _assert_matches_full_layout(stack)
+
+    stack.remove(stack.children[1])
+    _assert_matches_full_layout(stack)
+
+    # Resizing a child is noticed through its rect, changing its min size through invalidate.
+    child = stack.children[0]
+    child.rect = child.rect.resize(60, 70)
+    _assert_matches_full_layout(stack)
+    child.size_hint_min = (80, 90)
+    stack.invalidate()
+    _assert_matches_full_layout(stack)
+
+    stack.rect = Rect(10, 20, 320, 420)
+    _assert_matches_full_layout(stack)
+
+    stack.clear()
+    _assert_matches_full_layout(stack)
+    assert stack.size_hint_min == (0, 0)
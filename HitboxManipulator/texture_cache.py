@@ -0,0 +1,261 @@
+"""
+Keeps the textures of a project within a fixed memory budget.
+
+Sprites are registered by name and path, but nothing is loaded until a texture or thumbnail is asked for. Full
+resolution textures and thumbnails are kept in separate least recently used caches, each with its own budget in bytes
+of image data. When a cache goes over its budget the least recently used textures are dropped from memory and removed
+from the texture atlas, so browsing a huge sprite set only ever holds a fixed amount of both.
+
+Tracing a texture's hit box is the slowest part of loading it. Textures with the same alpha, such as the repeated
+frames of an idle loop, get the same hit box, so it is traced for the first of them and shared with the rest.
+"""
+
+from collections import OrderedDict
+from typing import Dict, Iterator, Optional, Set, Tuple
+
+from PIL import Image
+
+from arcade import get_window, Texture, TextureAtlas
+from arcade.resources import resolve_resource_path
+
+from hitbox_duplicates import exact_signature
+
+
+class TextureCache:
+    """
+    :param atlas: The atlas textures are added to and removed from. Defaults to the window's default atlas.
+    :param budget: The bytes of full resolution image data to keep in memory.
+    :param thumbnail_budget: The bytes of thumbnail image data to keep in memory.
+    :param thumbnail_size: The longest side of a thumbnail in pixels.
+    :param hit_box_algorithm: The arcade hit box algorithm used for full resolution textures.
+    """
+
+    def __init__(self, atlas: TextureAtlas = None, budget: int = 256 << 20, thumbnail_budget: int = 32 << 20,
+                 thumbnail_size: int = 64, hit_box_algorithm: Optional[str] = "Simple"):
+        self._atlas: TextureAtlas = atlas or get_window().ctx.default_atlas
+        self._hit_box_algorithm = hit_box_algorithm
+
+        self._paths: Dict[str, str] = {}
+
+        # Least recently used first.
+        self._textures: OrderedDict[str, Texture] = OrderedDict()
+        self._thumbnails: OrderedDict[str, Texture] = OrderedDict()
+
+        self._budget = budget
+        self._thumbnail_budget = thumbnail_budget
+        self._thumbnail_size = thumbnail_size
+
+        self._memory = 0
+        self._thumbnail_memory = 0
+
+        # Textures which are in use and must never be evicted, such as the one being edited.
+        self._pinned: Set[str] = set()
+
+        # Atlas space is only given back when the atlas is rebuilt. Count what has been freed to know when to.
+        self._freed_area = 0
+
+        # The hit box points traced for each exact alpha signature. Filled from the loader's threads, but a dict get
+        # or set is atomic, and two threads tracing the same signature at once only cost a wasted trace.
+        self._hit_boxes: Dict[bytes, Tuple] = {}
+
+    def __len__(self):
+        return len(self._paths)
+
+    def __contains__(self, name: str):
+        return name in self._paths
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._paths)
+
+    @property
+    def names(self):
+        return tuple(self._paths)
+
+    @property
+    def memory(self):
+        return self._memory
+
+    @property
+    def thumbnail_memory(self):
+        return self._thumbnail_memory
+
+    @property
+    def budget(self):
+        return self._budget
+
+    @budget.setter
+    def budget(self, value: int):
+        self._budget = value
+        self._evict()
+
+    @property
+    def thumbnail_budget(self):
+        return self._thumbnail_budget
+
+    @thumbnail_budget.setter
+    def thumbnail_budget(self, value: int):
+        self._thumbnail_budget = value
+        self._evict()
+
+    def add(self, name: str, path: str = None):
+        """
+        Register a sprite without loading it.
+
+        :param path: The image file of the sprite. Defaults to the name.
+        """
+        self._paths[name] = path or name
+
+    def remove(self, name: str):
+        self.evict(name)
+        self._pinned.discard(name)
+        del self._paths[name]
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._textures
+
+    def texture(self, name: str) -> Texture:
+        """
+        The full resolution texture of a sprite, loading it if needed.
+        """
+        texture = self._textures.get(name)
+        if texture is not None:
+            self._textures.move_to_end(name)
+            return texture
+        return self.insert(self.create(name))
+
+    def create(self, name: str) -> Texture:
+        """
+        Decode a sprite's image into a texture without adding it to the cache or atlas. Touches no GL or cache
+        state, so it is safe to call from another thread. The hit box is only traced if no texture with the same alpha
+        has been traced before.
+        """
+        image = self._open(name)
+        if self._hit_box_algorithm is None:
+            return Texture(name, image, hit_box_algorithm=None)
+
+        signature = exact_signature(image)
+        points = self._hit_boxes.get(signature)
+        texture = Texture(name, image, hit_box_algorithm=self._hit_box_algorithm, hit_box_points=points)
+        if points is None:
+            self._hit_boxes[signature] = texture.hit_box_points
+        return texture
+
+    def insert(self, texture: Texture) -> Texture:
+        """
+        Add a texture made by `create` to the cache and atlas. Must be called on the main thread. If the sprite was
+        loaded in the meantime the texture already cached is kept and returned.
+        """
+        cached = self._textures.get(texture.name)
+        if cached is not None:
+            self._textures.move_to_end(texture.name)
+            return cached
+
+        self._textures[texture.name] = texture
+        self._memory += _image_bytes(texture.image)
+        self._atlas.add(texture)
+
+        self._evict()
+        return texture
+
+    def has_thumbnail(self, name: str) -> bool:
+        return name in self._thumbnails
+
+    def thumbnail(self, name: str) -> Texture:
+        """
+        A low resolution copy of a sprite, made from the full texture if it is loaded and from the file otherwise.
+        """
+        thumbnail = self._thumbnails.get(name)
+        if thumbnail is not None:
+            self._thumbnails.move_to_end(name)
+            return thumbnail
+
+        texture = self._textures.get(name)
+        return self.insert_thumbnail(name, self.create_thumbnail(name, texture.image if texture is not None else None))
+
+    def create_thumbnail(self, name: str, image: Image.Image = None) -> Texture:
+        """
+        Shrink a sprite's image into a thumbnail without adding it to the cache or atlas. Like `create`, it is safe to
+        call from another thread.
+
+        :param image: The sprite's full image if it is already in memory. Otherwise, the image is read from its file.
+        """
+        image = image.copy() if image is not None else self._open(name)
+        # Nearest keeps pixel art sharp.
+        image.thumbnail((self._thumbnail_size, self._thumbnail_size), Image.NEAREST)
+        return Texture(f"{name}:thumbnail", image, hit_box_algorithm=None)
+
+    def insert_thumbnail(self, name: str, thumbnail: Texture) -> Texture:
+        """
+        Add a thumbnail made by `create_thumbnail` to the cache and atlas. Must be called on the main thread.
+        """
+        cached = self._thumbnails.get(name)
+        if cached is not None:
+            self._thumbnails.move_to_end(name)
+            return cached
+
+        self._thumbnails[name] = thumbnail
+        self._thumbnail_memory += _image_bytes(thumbnail.image)
+        self._atlas.add(thumbnail)
+
+        self._evict()
+        return thumbnail
+
+    def pin(self, name: str):
+        """
+        Stop a sprite's full resolution texture being evicted until it is unpinned.
+        """
+        self._pinned.add(name)
+
+    def unpin(self, name: str):
+        self._pinned.discard(name)
+        self._evict()
+
+    def evict(self, name: str):
+        """
+        Drop both the texture and thumbnail of a sprite from memory and the atlas. Both are reloaded when next used.
+        """
+        if name in self._textures:
+            self._memory -= self._drop(self._textures.pop(name))
+        if name in self._thumbnails:
+            self._thumbnail_memory -= self._drop(self._thumbnails.pop(name))
+        self._rebuild_atlas()
+
+    def clear(self):
+        for name in tuple(self._textures) + tuple(self._thumbnails):
+            if name not in self._pinned:
+                self.evict(name)
+
+    def _open(self, name: str) -> Image.Image:
+        with Image.open(resolve_resource_path(self._paths[name])) as image:
+            return image.convert("RGBA")
+
+    def _evict(self):
+        # Evict the least recently used first. Pinned textures are skipped, so the cache can stay over budget if
+        # everything left is pinned.
+        for name in tuple(self._textures):
+            if self._memory <= self._budget:
+                break
+            if name not in self._pinned:
+                self._memory -= self._drop(self._textures.pop(name))
+
+        while self._thumbnail_memory > self._thumbnail_budget and self._thumbnails:
+            _, thumbnail = self._thumbnails.popitem(last=False)
+            self._thumbnail_memory -= self._drop(thumbnail)
+
+        self._rebuild_atlas()
+
+    def _drop(self, texture: Texture) -> int:
+        if self._atlas.has_texture(texture):
+            self._atlas.remove(texture)
+            self._freed_area += texture.width * texture.height
+        return _image_bytes(texture.image)
+
+    def _rebuild_atlas(self):
+        # Removing a texture only frees its slot. Repack the atlas once half of it is space nothing uses.
+        if self._freed_area * 2 > self._atlas.width * self._atlas.height:
+            self._atlas.rebuild()
+            self._freed_area = 0
+
+
+def _image_bytes(image: Image.Image) -> int:
+    return image.width * image.height * 4
@@ -0,0 +1,127 @@
+"""
+Loading the textures of a project in the background.
+
+Decoding a PNG and working out its hit box is done on a thread pool, where PIL releases the GIL for the decode, so a
+large project loads on every core. Only adding the texture to the atlas needs the GL context, so that is left for
+`update` to do on the main thread a few textures at a time, keeping every frame short while the project loads.
+"""
+
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from time import perf_counter
+from typing import Callable, Deque, Iterable, List, Optional, Tuple
+
+from texture_cache import TextureCache
+
+
+class TextureLoader:
+    """
+    :param cache: The cache loaded textures are added to.
+    :param workers: The number of decoding threads. Defaults to the executor's default for the machine.
+    :param uploads_per_frame: The most textures `update` adds to the atlas in one call.
+    :param frame_budget: The most time in seconds `update` spends in one call, after the first texture.
+    """
+
+    def __init__(self, cache: TextureCache, workers: Optional[int] = None, uploads_per_frame: int = 8,
+                 frame_budget: float = 0.004):
+        self._cache = cache
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="texture-loader")
+        self._uploads_per_frame = uploads_per_frame
+        self._frame_budget = frame_budget
+
+        # Finished decodes waiting for the main thread, with the future to resolve once they are uploaded, the
+        # function which uploads them and the sprite's name. Worker threads only ever append to this, and deque appends
+        # and pops are thread safe.
+        self._decoded: Deque[Tuple[Future, Future, Callable, str]] = deque()
+        self._pending = 0
+
+    @property
+    def pending(self):
+        """
+        The number of textures still being decoded or waiting to be uploaded.
+        """
+        return self._pending
+
+    def load(self, name: str, path: str = None) -> Future:
+        """
+        Start loading a sprite. The future is resolved with the sprite's Texture once it is in the cache and atlas,
+        which always happens during a call to `update`.
+        """
+        if name not in self._cache:
+            self._cache.add(name, path)
+
+        result = Future()
+        if self._cache.is_loaded(name):
+            result.set_result(self._cache.texture(name))
+            return result
+
+        return self._submit(result, self._cache.create, self._cache.insert, name)
+
+    def load_thumbnail(self, name: str) -> Future:
+        """
+        Start loading a sprite's thumbnail. The future is resolved with the thumbnail Texture during a call to
+        `update`. Cancel the future if the thumbnail is no longer needed, such as when its row is scrolled out of view,
+        and it is skipped if it has not been decoded yet.
+        """
+        result = Future()
+        if self._cache.has_thumbnail(name):
+            result.set_result(self._cache.thumbnail(name))
+            return result
+
+        return self._submit(result, self._cache.create_thumbnail, lambda thumbnail: self._cache.insert_thumbnail(
+            name, thumbnail), name)
+
+    def load_many(self, sprites: Iterable[Tuple[str, Optional[str]]]) -> List[Future]:
+        """
+        Start loading many (name, path) sprites at once.
+        """
+        return [self.load(name, path) for name, path in sprites]
+
+    def _submit(self, result: Future, create: Callable, insert: Callable, name: str) -> Future:
+        self._pending += 1
+        decode = self._executor.submit(_decode, result, create, name)
+        decode.add_done_callback(lambda _decode: self._decoded.append((_decode, result, insert, name)))
+        return result
+
+    def update(self) -> int:
+        """
+        Add decoded textures to the cache and atlas. Call once a frame on the main thread. Returns the number of
+        textures uploaded. A texture which fails to upload, such as when the atlas is full, resolves its future with
+        the error rather than stopping the update.
+        """
+        start = perf_counter()
+        uploaded = 0
+        while self._decoded and uploaded < self._uploads_per_frame:
+            if uploaded and perf_counter() - start > self._frame_budget:
+                break
+            decode, result, insert, name = self._decoded.popleft()
+            self._pending -= 1
+            if result.cancelled():
+                continue
+            if decode.cancelled():
+                result.cancel()
+            elif decode.exception() is not None:
+                result.set_exception(decode.exception())
+            else:
+                uploaded += 1
+                try:
+                    texture = insert(decode.result())
+                except Exception as error:
+                    print(f"ERROR: Could not upload the texture {name}: {error}")
+                    result.set_exception(error)
+                else:
+                    result.set_result(texture)
+        return uploaded
+
+    def shutdown(self, wait: bool = True):
+        """
+        Stop the decoding threads. Textures which are not decoded yet are never loaded.
+        """
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def _decode(result: Future, create: Callable, name: str):
+    # Requests cancelled while waiting in the queue are never decoded.
+    if result.cancelled():
+        return None
+    return create(name)
@@ -1,7 +1,14 @@
+from concurrent.futures import Future
+from functools import partial
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
 import arcade.gui as gui
 
 import widgets as gui_c
 
+from hitbox_data import HitboxData
+from texture_cache import TextureCache
+from texture_loader import TextureLoader
 
 import style
 
@@ -18,13 +25,13 @@ Tree:
         # Primary Tab (Box Layout)
             # Hit Box Info Line (Box Layout)
                 # Current Hit Box Info (Space)
-                # Hit Box Selector (Space)
+                # Hit Box Selector (Virtual List)
             # Hit Box Line (Box Layout)
                 # Hit Box Frame (Space)
                 # Hit Box Editor Tool Line (Box Layout)
                     # Hit Box Editor Tools (List of Flat Buttons)
             # Sprite Picker Line (Box Layout)
-                # Sprites (Box Layout)
+                # Sprites (Virtual List)
         # Bottom Tab (Space)
 """
 
@@ -46,14 +53,56 @@ class HitboxInfoLine(gui_c.UIStackLayout):
                                              color=style.COLOURS['-background-secondary'])
         self._hitbox_info_data.border_width = 1
         self._hitbox_info_data.border_color = style.COLOURS['-background-border']
-        self._hitbox_info_selector = gui.UISpace(size_hint=(0.8, 0.4),
-                                                 color=style.COLOURS['-background-secondary'])
+        self._hitbox_info_selector = gui_c.UIVirtualList(size_hint=(0.8, 0.4), row_height=20,
+                                                         make_row=self._make_row, show_row=self._show_row)
+        self._hitbox_info_selector.with_background(color=style.COLOURS['-background-secondary'])
         self._hitbox_info_selector.border_width = 1
         self._hitbox_info_selector.border_color = style.COLOURS['-background-border']
 
+        self._hitboxes: Sequence[HitboxData] = ()
+        self._shown_sizes: Tuple[int, ...] = ()
+        self._hitbox_info_selector.push_handlers(on_select=self._select)
+        self._on_pick: Optional[Callable[[int], None]] = None
+
         self.add(self._hitbox_info_data, anchor="top")
         self.add(self._hitbox_info_selector, anchor="top")
 
+    def show_hitboxes(self, hitboxes: Sequence[HitboxData], on_pick: Callable[[int], None], active: int = 0):
+        """
+        List the hitboxes in the selector. on_pick is called with the index of a hitbox when it is clicked.
+
+        :param active: The index of the hitbox being edited, which starts selected.
+        """
+        self._hitboxes = hitboxes
+        self._on_pick = on_pick
+        self._hitbox_info_selector.count = len(hitboxes)
+        self._hitbox_info_selector.selected = active if active < len(hitboxes) else None
+
+    def on_update(self, dt):
+        selector = self._hitbox_info_selector
+        if len(self._hitboxes) != selector.count:
+            selector.count = len(self._hitboxes)
+
+        # Hitboxes change size as they are edited. Only show the rows again when a hitbox in view did, so an idle
+        # editor never rebuilds the rows or redraws the list.
+        first = selector.first
+        sizes = tuple(hitbox.size for hitbox in self._hitboxes[first:first + selector.rows_in_view])
+        if sizes != self._shown_sizes:
+            self._shown_sizes = sizes
+            selector.refresh()
+
+    def _make_row(self):
+        return gui_c.UIThumbnailRow(text_color=style.COLOURS['-primary-text'],
+                                    select_color=style.COLOURS['-highlighted-background'], thumbnail=False)
+
+    def _show_row(self, row: gui_c.UIThumbnailRow, index: int):
+        row.text = f"Hitbox {index}: {self._hitboxes[index].size} points"
+        row.selected = index == self._hitbox_info_selector.selected
+
+    def _select(self, index: int):
+        if self._on_pick is not None:
+            self._on_pick(index)
+
 
 class HitboxTools(gui_c.UIStackLayout):
 
@@ -90,12 +139,79 @@ class SpritePickerLine(gui_c.UIStackLayout):
     def __init__(self):
         super().__init__(size_hint=(0.2, 1.0))
         # Sprite Picker Line (The vertical line which holds the list of current working sprites)
-        self._sprite_picker = gui.UISpace(size_hint=(0.8, 1.0), color=style.COLOURS['-background-secondary'])
+        self._sprite_picker = gui_c.UIVirtualList(size_hint=(0.8, 1.0), row_height=32, space_between=2,
+                                                  make_row=self._make_row, show_row=self._show_row)
+        self._sprite_picker.with_background(color=style.COLOURS['-background-secondary'])
         self._sprite_picker.border_width = 1
         self._sprite_picker.border_color = style.COLOURS['-background-border']
 
+        self._sprites: Optional[TextureCache] = None
+        self._loader: Optional[TextureLoader] = None
+        self._names = ()
+        self._sprite_picker.push_handlers(on_select=self._select)
+        self._on_pick: Optional[Callable[[str], None]] = None
+
+        # The thumbnail each row is waiting on. Cancelled when the row is given another sprite before it loads.
+        self._requests: Dict[gui_c.UIThumbnailRow, Tuple[str, Future]] = {}
+
         self.add(self._sprite_picker, anchor="top")
 
+    def show_sprites(self, sprites: TextureCache, loader: TextureLoader, on_pick: Callable[[str], None]):
+        """
+        List every sprite in the cache, loading thumbnails in the background only for the rows in view.
+        on_pick is called with the name of a sprite when it is clicked.
+        """
+        self._sprites = sprites
+        self._loader = loader
+        self._on_pick = on_pick
+        self._names = sprites.names
+        self._sprite_picker.count = len(self._names)
+
+    def on_update(self, dt):
+        # Sprites are added to the cache as a project loads.
+        if self._sprites is not None and len(self._sprites) != len(self._names):
+            self._names = self._sprites.names
+            self._sprite_picker.count = len(self._names)
+
+    def _make_row(self):
+        return gui_c.UIThumbnailRow(height=32, text_color=style.COLOURS['-primary-text'],
+                                    select_color=style.COLOURS['-highlighted-background'])
+
+    def _show_row(self, row: gui_c.UIThumbnailRow, index: int):
+        name = self._names[index]
+        row.text = name.rsplit("/", 1)[-1]
+        row.selected = index == self._sprite_picker.selected
+
+        pending = self._requests.get(row)
+        if pending is not None:
+            if pending[0] == name:
+                # Shown again while its thumbnail is still loading, such as when the selection changes.
+                return
+            pending[1].cancel()
+            del self._requests[row]
+
+        request = self._loader.load_thumbnail(name)
+        if request.done():
+            row.texture = request.result()
+            return
+        row.texture = None
+        self._requests[row] = name, request
+        request.add_done_callback(partial(self._thumbnail_loaded, row, name))
+
+    def _thumbnail_loaded(self, row: gui_c.UIThumbnailRow, name: str, request: Future):
+        # Always called on the main thread, as the loader resolves requests in its update.
+        if request.cancelled() or self._requests.get(row) != (name, request):
+            return
+        del self._requests[row]
+        if request.exception() is not None:
+            print(f"ERROR: Could not load the thumbnail of {name}: {request.exception()}")
+            return
+        row.texture = request.result()
+
+    def _select(self, index: int):
+        if self._on_pick is not None:
+            self._on_pick(self._names[index])
+
 
 class PrimaryTab(gui.UIBoxLayout):
 
@@ -0,0 +1,148 @@
+"""
+The one place the frame's view is turned into maths.
+
+There are three spaces:
+    # screen: window pixels, as the mouse events give them.
+    # hitbox: sprite pixels with the origin at the centre of the sprite, as hitbox points are stored.
+    # clip: OpenGL clip space of the frame's fbo, -1 to 1 across the frame, which the sprite and hitbox shaders output.
+The centre of the frame shows the hitbox point at the frame's shift, and one screen pixel covers `zoom` hitbox pixels:
+    hitbox = zoom * (screen - pos - size / 2) + shift
+
+The matrices between the spaces are only worked out again after the frame's zoom, shift, pos or size change, however
+many points are converted in between. Single points are converted with plain floats, as numpy costs more than the
+maths for one point, and arrays of points in one vectorised call.
+"""
+
+from typing import Tuple
+
+from arcade.gui import bind
+from numpy import ndarray, float32, float64, asarray, array as np_array
+
+from hitbox_data import FrameData
+
+
+class ViewTransform:
+    """
+    :param frame_data: The frame to follow. The transform stays up to date with it.
+    """
+
+    def __init__(self, frame_data: FrameData):
+        self._frame_data = frame_data
+
+        # The screen to hitbox transform is a scale then a translation, so it is kept as floats for single points
+        # and as matrices for arrays and shaders.
+        self._scale = 1.0
+        self._offset = (0.0, 0.0)
+        self._forward: ndarray = None
+        self._inverse: ndarray = None
+        self._clip: ndarray = None
+        self._dirty = True
+
+        bind(frame_data, "frame_zoom", self._changed)
+        bind(frame_data, "frame_shift", self._changed)
+        bind(frame_data, "frame_pos", self._changed)
+        bind(frame_data, "frame_size", self._changed)
+
+    def _changed(self):
+        self._dirty = True
+
+    def _refresh(self):
+        _data = self._frame_data
+        (x, y), (width, height), zoom, (shift_x, shift_y) = _data.pos, _data.size, _data.zoom, _data.shift
+
+        self._scale = zoom
+        self._offset = (shift_x - zoom * (x + width / 2), shift_y - zoom * (y + height / 2))
+
+        self._forward = np_array(((zoom, 0.0, self._offset[0]),
+                                  (0.0, zoom, self._offset[1]),
+                                  (0.0, 0.0, 1.0)), dtype=float64)
+        self._inverse = np_array(((1 / zoom, 0.0, -self._offset[0] / zoom),
+                                  (0.0, 1 / zoom, -self._offset[1] / zoom),
+                                  (0.0, 0.0, 1.0)), dtype=float64)
+        self._clip = np_array(((2 / (zoom * width), 0.0, -2 * shift_x / (zoom * width)),
+                               (0.0, 2 / (zoom * height), -2 * shift_y / (zoom * height)),
+                               (0.0, 0.0, 1.0)), dtype=float64)
+        self._dirty = False
+
+    @property
+    def frame_data(self):
+        return self._frame_data
+
+    @property
+    def scale(self) -> float:
+        """
+        The hitbox pixels covered by one screen pixel.
+        """
+        if self._dirty:
+            self._refresh()
+        return self._scale
+
+    @property
+    def forward(self) -> ndarray:
+        """
+        The 3x3 matrix from screen to hitbox coordinates.
+        """
+        if self._dirty:
+            self._refresh()
+        return self._forward
+
+    @property
+    def inverse(self) -> ndarray:
+        """
+        The 3x3 matrix from hitbox to screen coordinates.
+        """
+        if self._dirty:
+            self._refresh()
+        return self._inverse
+
+    @property
+    def clip(self) -> ndarray:
+        """
+        The 3x3 matrix from hitbox coordinates to the clip space of the frame's fbo.
+        """
+        if self._dirty:
+            self._refresh()
+        return self._clip
+
+    def contains(self, x: float, y: float) -> bool:
+        """
+        Whether a screen position is inside the frame.
+        """
+        _data = self._frame_data
+        rel_x, rel_y = x - _data.x, y - _data.y
+        return 0 <= rel_x <= _data.size[0] and 0 <= rel_y <= _data.size[1]
+
+    def to_hitbox(self, x: float, y: float) -> Tuple[float, float]:
+        if self._dirty:
+            self._refresh()
+        return self._scale * x + self._offset[0], self._scale * y + self._offset[1]
+
+    def to_screen(self, x: float, y: float) -> Tuple[float, float]:
+        if self._dirty:
+            self._refresh()
+        return (x - self._offset[0]) / self._scale, (y - self._offset[1]) / self._scale
+
+    def vector_to_hitbox(self, dx: float, dy: float) -> Tuple[float, float]:
+        """
+        Convert a movement on screen, such as a mouse drag, which isn't affected by where the view is.
+        """
+        if self._dirty:
+            self._refresh()
+        return self._scale * dx, self._scale * dy
+
+    def points_to_hitbox(self, points) -> ndarray:
+        """
+        Convert an (n, 2) array of screen positions to hitbox coordinates at once.
+        """
+        return _apply(self.forward, points)
+
+    def points_to_screen(self, points) -> ndarray:
+        """
+        Convert an (n, 2) array of hitbox points to screen positions at once.
+        """
+        return _apply(self.inverse, points)
+
+
+def _apply(matrix: ndarray, points) -> ndarray:
+    points = asarray(points, dtype=float64).reshape(-1, 2)
+    return (points @ matrix[:2, :2].T + matrix[:2, 2]).astype(float32)
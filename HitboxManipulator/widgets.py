@@ -1,7 +1,18 @@
-from typing import Iterable, Tuple
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
+from pyglet.event import EVENT_HANDLED, EVENT_UNHANDLED
+
+from arcade import Text, Texture, draw_xywh_rectangle_filled
 import arcade.gui as gui
-from arcade.gui.widgets import UILayout, UIWidget, W
+from arcade.gui.events import UIEvent, UIMousePressEvent, UIMouseScrollEvent
+from arcade.gui.surface import Surface
+from arcade.gui.widgets import Rect, UILayout, UIWidget, W
+
+from profiling import profiled
+
+# UIStackLayout reads the padding and border properties newer arcade releases give every widget. Older releases only
+# have the private attributes, and laying out a stack on them fails.
+STACK_LAYOUT_SUPPORTED = hasattr(UIWidget, "padding_left")
 
 
 class UIStackLayout(UILayout):
@@ -59,35 +70,108 @@ class UIStackLayout(UILayout):
             **kwargs
         )
 
-        gui.bind(self, "_children", self._update_size_hints)
+        # The min size of each child, summed along the stack and maxed across it. Kept up to date as children are
+        # appended so adding N children is O(N) rather than rescanning every child each time.
+        self._child_count = 0
+        self._last_child = None
+        self._stack_sum = 0
+        self._cross_max = 0
+        self._hints_dirty = False
+
+        # What the last layout was done for, and where it stopped, so a layout is skipped when nothing changed and
+        # only the new children are placed when children were appended.
+        self._layout_dirty = True
+        self._layout_key = None
+        self._laid_out = 0
+        self._layout_state = None
+        self._placing = False
+
+        gui.bind(self, "_children", self._children_changed)
 
         # initially update size hints
         self._update_size_hints()
 
+    def invalidate(self):
+        """
+        Lay out every child again before the next frame. Children call this on their parent when their size or size
+        hints change. Changes to a child's rect are noticed automatically.
+        """
+        self._hints_dirty = True
+        self._layout_dirty = True
+
+    def _child_changed(self):
+        # Placing children changes their rect as well, which is not a change to react to.
+        if not self._placing:
+            self.invalidate()
+
+    def _children_changed(self):
+        children = self._children
+        if (len(children) == self._child_count + 1 and children[-1].child is not self._last_child and
+                (self._child_count == 0 or children[-2].child is self._last_child)):
+            # Appending is by far the most common change, and only needs the new child adding to the totals.
+            child = children[-1].child
+            gui.bind(child, "rect", self._child_changed)
+            width, height = self._min_size(child)
+            if self.vertical:
+                self._stack_sum += height
+                self._cross_max = max(self._cross_max, width)
+            else:
+                self._stack_sum += width
+                self._cross_max = max(self._cross_max, height)
+            self._child_count += 1
+            self._last_child = child
+            self._apply_size_hints()
+        else:
+            for entry in children:
+                gui.bind(entry.child, "rect", self._child_changed)
+            self._layout_dirty = True
+            self._update_size_hints()
+
+    @staticmethod
+    def _min_size(child: UIWidget) -> Tuple[float, float]:
+        mw, mh = child.size_hint_min or (None, None)
+        return max(child.width, mw or 0), max(child.height, mh or 0)
+
+    @profiled()
     def _update_size_hints(self):
-        required_space_between = max(0, len(self.children) - 1) * self._space_between
+        min_child_sizes = [self._min_size(entry.child) for entry in self._children]
 
-        def min_size(child: UIWidget) -> Tuple[float, float]:
-            mw, mh = child.size_hint_min or (None, None)
-            return max(child.width, mw or 0), max(child.height, mh or 0)
+        self._child_count = len(min_child_sizes)
+        self._last_child = self._children[-1].child if self._children else None
+        if not min_child_sizes:
+            self._stack_sum = self._cross_max = 0
+        elif self.vertical:
+            self._stack_sum = sum(size[1] for size in min_child_sizes)
+            self._cross_max = max(size[0] for size in min_child_sizes)
+        else:
+            self._stack_sum = sum(size[0] for size in min_child_sizes)
+            self._cross_max = max(size[1] for size in min_child_sizes)
+
+        self._hints_dirty = False
+        self._apply_size_hints()
 
-        min_child_sizes = [min_size(child) for child in self.children]
+    def _apply_size_hints(self):
+        required_space_between = max(0, self._child_count - 1) * self._space_between
 
-        if len(self.children) == 0:
+        if self._child_count == 0:
             width = 0
             height = 0
         elif self.vertical:
-            width = max(size[0] for size in min_child_sizes)
-            height_of_children = sum(size[1] for size in min_child_sizes)
-            height = height_of_children + required_space_between
+            width = self._cross_max
+            height = self._stack_sum + required_space_between
         else:
-            width_of_children = sum(size[0] for size in min_child_sizes)
-            width = width_of_children + required_space_between
-            height = max(size[1] for size in min_child_sizes)
+            width = self._stack_sum + required_space_between
+            height = self._cross_max
 
         base_width = self.padding_left + self.padding_right + 2 * self.border_width
         base_height = self.padding_top + self.padding_bottom + 2 * self.border_width
-        self.size_hint_min = base_width + width, base_height + height
+        size_hint_min = base_width + width, base_height + height
+
+        if size_hint_min != self.size_hint_min:
+            self.size_hint_min = size_hint_min
+            # Bubble the change up, so a parent stack only lays out again when a child's hints really changed.
+            if isinstance(self.parent, UIStackLayout):
+                self.parent.invalidate()
 
     def fit_content(self):
         """
@@ -101,119 +185,471 @@ class UIStackLayout(UILayout):
     def add(self, child: W, *, anchor="top", **kwargs):
         return super(UIStackLayout, self).add(child, anchor=anchor, **kwargs)
 
+    def remove(self, child: UIWidget):
+        _unbind(child, "rect", self._child_changed)
+        super(UIStackLayout, self).remove(child)
+
+    def clear(self):
+        for child in self.children:
+            _unbind(child, "rect", self._child_changed)
+        super(UIStackLayout, self).clear()
+
+    @profiled()
     def do_layout(self):
-        start_y = self.content_rect.bottom
-        start_x = self.content_rect.left
+        if self._hints_dirty:
+            self._update_size_hints()
 
-        if not self.children:
+        if not self._children:
+            self._laid_out = 0
             return
 
-        if self.vertical:
-            available_width = self.width
-            available_height = self.height
+        # Anything besides the children which the placement depends on.
+        key = (self.rect, self.content_rect, self.vertical, self.align, self._space_between)
+        if self._layout_dirty or key != self._layout_key or self._laid_out > len(self._children):
+            start = 0
+        elif self._laid_out < len(self._children):
+            start = self._laid_out
+        else:
+            # Nothing changed since the last layout.
+            return
 
-            end_y = start_y + available_height
+        self._placing = True
+        try:
+            if not self._place(start):
+                # The new children change how the others grow, so everything has to be placed again.
+                self._place(0)
+        finally:
+            self._placing = False
 
+        self._layout_dirty = False
+        self._layout_key = key
+        self._laid_out = len(self._children)
+
+    def _place(self, start: int) -> bool:
+        """
+        Place the children from start onwards, carrying on from where the last layout stopped. Returns False if that
+        is not possible because a new child grows along the stack.
+        """
+        if start:
+            axis = 1 if self.vertical else 0
+            for child, _ in self._children[start:]:
+                if child.size_hint and child.size_hint[axis]:
+                    return False
+
+        if self.vertical:
+            self._place_vertical(start)
+        else:
+            self._place_horizontal(start)
+        return True
+
+    def _place_vertical(self, start: int):
+        if start:
+            start_y, end_y, available_height, total_size_hint_height = self._layout_state
+        else:
+            start_y = self.content_rect.bottom
+            end_y = start_y + self.height
+            available_height = self.height
             total_size_hint_height = sum(
-                child.size_hint[1] or 0 for child in self.children if child.size_hint
+                child.size_hint[1] or 0 for child, _ in self._children if child.size_hint
             )
 
-            for child, data in self._children:
-                new_rect = child.rect
-
-                # process size_hint_min
-                if child.size_hint_min:
-                    new_rect = new_rect.min_size(*child.size_hint_min)
-
-                # apply size_hint
-                if child.size_hint:
-                    shw, shh = child.size_hint
-                    if shw is not None:
-                        new_rect = new_rect.resize(width=available_width * shw)
-
-                    if shh:
-                        # Maximal growth to parent.height * shh
-                        available_growth_height = available_height * (
-                                shh / total_size_hint_height
-                        )
-                        max_growth_height = self.height * shh
-                        new_rect = new_rect.resize(
-                            height=min(available_growth_height, max_growth_height)
-                        )
-
-                        total_size_hint_height -= shh
-
-                # align
-                if self.align == "left":
-                    new_rect = new_rect.align_left(start_x)
-                elif self.align == "right":
-                    new_rect = new_rect.align_right(start_x + self.content_width)
-                else:
-                    center_x = start_x + self.content_width // 2
-                    new_rect = new_rect.align_center_x(center_x)
-
-                child_anchor = data.get("anchor", "top")
-                if child_anchor == "top":
-                    new_rect = new_rect.align_top(end_y)
-                    end_y -= (new_rect.height + self._space_between)
-
-                else:
-                    new_rect = new_rect.align_bottom(start_y)
-                    start_y += (new_rect.height + self._space_between)
-
-                child.rect = new_rect
-                available_height -= (new_rect.height + self._space_between)
+        start_x = self.content_rect.left
+        available_width = self.width
+
+        for child, data in self._children[start:]:
+            new_rect = child.rect
+
+            # process size_hint_min
+            if child.size_hint_min:
+                new_rect = new_rect.min_size(*child.size_hint_min)
+
+            # apply size_hint
+            if child.size_hint:
+                shw, shh = child.size_hint
+                if shw is not None:
+                    new_rect = new_rect.resize(width=available_width * shw)
+
+                if shh:
+                    # Maximal growth to parent.height * shh
+                    available_growth_height = available_height * (
+                            shh / total_size_hint_height
+                    )
+                    max_growth_height = self.height * shh
+                    new_rect = new_rect.resize(
+                        height=min(available_growth_height, max_growth_height)
+                    )
+
+                    total_size_hint_height -= shh
+
+            # align
+            if self.align == "left":
+                new_rect = new_rect.align_left(start_x)
+            elif self.align == "right":
+                new_rect = new_rect.align_right(start_x + self.content_width)
+            else:
+                center_x = start_x + self.content_width // 2
+                new_rect = new_rect.align_center_x(center_x)
+
+            child_anchor = data.get("anchor", "top")
+            if child_anchor == "top":
+                new_rect = new_rect.align_top(end_y)
+                end_y -= (new_rect.height + self._space_between)
+
+            else:
+                new_rect = new_rect.align_bottom(start_y)
+                start_y += (new_rect.height + self._space_between)
+
+            child.rect = new_rect
+            available_height -= (new_rect.height + self._space_between)
+
+        self._layout_state = start_y, end_y, available_height, total_size_hint_height
+
+    def _place_horizontal(self, start: int):
+        start_y = self.content_rect.bottom
+        if start:
+            start_x, end_x, available_width, total_size_hint_width = self._layout_state
         else:
-            available_height = self.height
+            start_x = self.content_rect.left
+            end_x = start_x + self.width
             available_width = self.width
-
-            end_x = start_x + available_width
-
             total_size_hint_width = sum(
-                child.size_hint[0] or 0 for child in self.children if child.size_hint
+                child.size_hint[0] or 0 for child, _ in self._children if child.size_hint
             )
 
-            for child, data in self._children:
-                new_rect = child.rect
-
-                # process size_hint_min
-                if child.size_hint_min:
-                    new_rect = new_rect.min_size(*child.size_hint_min)
-
-                # apply size_hint
-                if child.size_hint:
-                    shw, shh = child.size_hint
-                    if shh is not None:
-                        new_rect = new_rect.resize(height=available_height * shh)
-
-                    if shw:
-                        # Maximal growth to parent.width * shw
-                        available_growth_width = new_rect.width + available_width * (
-                                shw / total_size_hint_width
-                        )
-                        max_growth_height = self.width * shw
-                        new_rect = new_rect.resize(
-                            width=min(available_growth_width, max_growth_height)
-                        )
-
-                        total_size_hint_width -= shw
-
-                # align
-                if self.align == "top":
-                    new_rect = new_rect.align_top(start_y + self.content_height)
-                elif self.align == "bottom":
-                    new_rect = new_rect.align_bottom(start_y)
-                else:
-                    center_y = start_y - self.content_height // 2
-                    new_rect = new_rect.align_center_y(center_y)
-
-                anchor = data.get("anchor", "left")
-                if anchor == "left":
-                    new_rect = new_rect.align_left(start_x)
-                    start_x += (new_rect.width + self._space_between)
-                else:
-                    new_rect = new_rect.align_right(end_x)
-                    end_x -= (new_rect.width + self._space_between)
-
-                child.rect = new_rect
-                available_width -= (new_rect.width + self._space_between)
+        available_height = self.height
+
+        for child, data in self._children[start:]:
+            new_rect = child.rect
+
+            # process size_hint_min
+            if child.size_hint_min:
+                new_rect = new_rect.min_size(*child.size_hint_min)
+
+            # apply size_hint
+            if child.size_hint:
+                shw, shh = child.size_hint
+                if shh is not None:
+                    new_rect = new_rect.resize(height=available_height * shh)
+
+                if shw:
+                    # Maximal growth to parent.width * shw
+                    available_growth_width = new_rect.width + available_width * (
+                            shw / total_size_hint_width
+                    )
+                    max_growth_height = self.width * shw
+                    new_rect = new_rect.resize(
+                        width=min(available_growth_width, max_growth_height)
+                    )
+
+                    total_size_hint_width -= shw
+
+            # align
+            if self.align == "top":
+                new_rect = new_rect.align_top(start_y + self.content_height)
+            elif self.align == "bottom":
+                new_rect = new_rect.align_bottom(start_y)
+            else:
+                center_y = start_y - self.content_height // 2
+                new_rect = new_rect.align_center_y(center_y)
+
+            anchor = data.get("anchor", "left")
+            if anchor == "left":
+                new_rect = new_rect.align_left(start_x)
+                start_x += (new_rect.width + self._space_between)
+            else:
+                new_rect = new_rect.align_right(end_x)
+                end_x -= (new_rect.width + self._space_between)
+
+            child.rect = new_rect
+            available_width -= (new_rect.width + self._space_between)
+
+        self._layout_state = start_x, end_x, available_width, total_size_hint_width
+
+
+class UIVirtualList(UILayout):
+    """
+    A vertical list of any number of rows, which only has a widget for each row in view.
+    Every row is the same height, so which rows are in view is worked out from the scroll position alone. When the list
+    scrolls, the widgets of rows which went out of view are handed to the rows coming into view, so scrolling never
+    makes new widgets and a list of 20k rows costs the same as one of 20.
+
+    The list scrolls a whole row at a time, so every row in view is drawn whole within the list.
+
+    Dispatches `on_select(index)` when a row is clicked.
+
+    :param float x: x coordinate of bottom left
+    :param float y: y coordinate of bottom left
+    :param row_height: The height of every row in pixels
+    :param make_row: Makes an empty row widget. Only called while more rows fit in view than there are widgets.
+    :param show_row: Shows the item at an index in a row widget. Called whenever a widget is given a different row.
+    :param count: The number of rows
+    :param space_between: Space between the rows
+    :param size_hint: A hint for :class:`UILayout`, if this :class:`UIWidget` would like to grow
+    :param size_hint_min: min width and height in pixel
+    :param size_hint_max: max width and height in pixel
+    """
+
+    def __init__(
+        self,
+        x=0,
+        y=0,
+        width=100,
+        height=100,
+        row_height=20,
+        make_row: Callable[[], UIWidget] = None,
+        show_row: Callable[[UIWidget, int], None] = None,
+        count=0,
+        space_between=0,
+        size_hint=None,
+        size_hint_min=None,
+        size_hint_max=None,
+        style=None,
+        **kwargs
+    ):
+        self._row_height = row_height
+        self._space_between = space_between
+        self._make_row = make_row
+        self._show_row = show_row
+
+        self._count = count
+        self._first = 0
+        self._selected: Optional[int] = None
+
+        # The widget of each row in view by index, and the widgets not in use.
+        self._rows: Dict[int, UIWidget] = {}
+        self._spare: List[UIWidget] = []
+
+        # Whether the rows need placing again, and whether every row in view needs showing again as well.
+        self._dirty = True
+        self._reshow = False
+
+        super().__init__(
+            x=x,
+            y=y,
+            width=width,
+            height=height,
+            size_hint=size_hint,
+            size_hint_min=size_hint_min,
+            size_hint_max=size_hint_max,
+            style=style,
+            **kwargs
+        )
+        self.register_event_type("on_select")
+
+        gui.bind(self, "rect", self._rect_changed)
+
+    @property
+    def count(self):
+        return self._count
+
+    @count.setter
+    def count(self, value: int):
+        self._count = value
+        if self._selected is not None and self._selected >= value:
+            self._selected = None
+        self.first = self._first
+        self.refresh()
+
+    @property
+    def first(self):
+        """
+        The index of the top row in view.
+        """
+        return self._first
+
+    @first.setter
+    def first(self, value: int):
+        value = max(0, min(value, self._count - self.rows_in_view))
+        if value != self._first:
+            self._first = value
+            self._dirty = True
+
+    @property
+    def rows_in_view(self):
+        """
+        The number of whole rows which fit in the list.
+        """
+        pitch = self._row_height + self._space_between
+        return max(1, int((self.content_height + self._space_between) // pitch))
+
+    @property
+    def selected(self) -> Optional[int]:
+        return self._selected
+
+    @selected.setter
+    def selected(self, value: Optional[int]):
+        old = self._selected
+        self._selected = value
+        # Only the rows which gained or lost the selection need showing again.
+        for index in (old, value):
+            if index in self._rows:
+                self._show_row(self._rows[index], index)
+
+    def refresh(self):
+        """
+        Show every row in view again, for when the items behind the rows change.
+        """
+        self._dirty = True
+        self._reshow = True
+
+    def scroll_to(self, index: int):
+        """
+        Scroll the least distance which brings a row into view.
+        """
+        if index < self._first:
+            self.first = index
+        elif index >= self._first + self.rows_in_view:
+            self.first = index - self.rows_in_view + 1
+
+    def index_at(self, x: float, y: float) -> Optional[int]:
+        """
+        The index of the row at a screen position. None if there is no row there.
+        """
+        if not self.content_rect.collide_with_point(x, y):
+            return None
+        pitch = self._row_height + self._space_between
+        offset = self.content_rect.top - y
+        if offset % pitch > self._row_height:
+            return None
+        index = self._first + int(offset // pitch)
+        return index if index < min(self._count, self._first + self.rows_in_view) else None
+
+    def _rect_changed(self):
+        self._dirty = True
+
+    @profiled()
+    def do_layout(self):
+        if not self._dirty:
+            return
+
+        # Resizing the list can leave fewer rows below the top one than fit in view.
+        self._first = first = max(0, min(self._first, self._count - self.rows_in_view))
+        last = min(self._count, first + self.rows_in_view)
+
+        # Free the widgets of rows which went out of view first, so they can be given to the rows coming into view.
+        for index in [index for index in self._rows if not first <= index < last]:
+            row = self._rows.pop(index)
+            row.visible = False
+            self._spare.append(row)
+
+        left, top = self.content_rect.left, self.content_rect.top
+        pitch = self._row_height + self._space_between
+        for index in range(first, last):
+            row = self._rows.get(index)
+            if row is None:
+                row = self._spare.pop() if self._spare else self.add(self._make_row())
+                row.visible = True
+                self._rows[index] = row
+                self._show_row(row, index)
+            elif self._reshow:
+                self._show_row(row, index)
+
+            rect = Rect(left, top - (index - first) * pitch - self._row_height, self.content_width, self._row_height)
+            if row.rect != rect:
+                row.rect = rect
+
+        self._dirty = False
+        self._reshow = False
+
+    def on_event(self, event: UIEvent) -> Optional[bool]:
+        if super().on_event(event):
+            return EVENT_HANDLED
+
+        if not self.visible or not isinstance(event, (UIMouseScrollEvent, UIMousePressEvent)):
+            return EVENT_UNHANDLED
+
+        if isinstance(event, UIMouseScrollEvent) and self.rect.collide_with_point(event.x, event.y):
+            self.first = self._first - int(event.scroll_y)
+            return EVENT_HANDLED
+
+        if isinstance(event, UIMousePressEvent):
+            index = self.index_at(event.x, event.y)
+            if index is not None:
+                self.selected = index
+                self.dispatch_event("on_select", index)
+                return EVENT_HANDLED
+
+        return EVENT_UNHANDLED
+
+    def on_select(self, index: int):
+        pass
+
+
+class UIThumbnailRow(UIWidget):
+    """
+    A row of a list, showing a small texture beside a line of text. Made to be reused by a UIVirtualList, so the text
+    and texture are changed in place rather than making a new row for each item.
+
+    :param font_size: The size of the text
+    :param text_color: The colour of the text
+    :param select_color: The background colour of the row while it is selected
+    :param thumbnail: Leave room for the texture even while there is none, so the text does not move once it loads.
+    """
+
+    def __init__(self, x=0, y=0, width=100, height=20, font_size=10, text_color=(255, 255, 255, 255),
+                 select_color=None, thumbnail=True, **kwargs):
+        super().__init__(x=x, y=y, width=width, height=height, **kwargs)
+        self._thumbnail = thumbnail
+        self._texture: Optional[Texture] = None
+        self._selected = False
+        self._select_color = select_color
+        self._label = Text("", 0, 0, text_color, font_size, anchor_y="center")
+
+    @property
+    def text(self) -> str:
+        return self._label.text
+
+    @text.setter
+    def text(self, value: str):
+        if value != self._label.text:
+            self._label.text = value
+            self.trigger_render()
+
+    @property
+    def texture(self) -> Optional[Texture]:
+        return self._texture
+
+    @texture.setter
+    def texture(self, value: Optional[Texture]):
+        if value is not self._texture:
+            self._texture = value
+            self.trigger_render()
+
+    @property
+    def selected(self) -> bool:
+        return self._selected
+
+    @selected.setter
+    def selected(self, value: bool):
+        if value != self._selected:
+            self._selected = value
+            self.trigger_full_render()
+
+    def do_render(self, surface: Surface):
+        self.prepare_render(surface)
+        width, height = self.content_width, self.content_height
+
+        if self._selected and self._select_color:
+            draw_xywh_rectangle_filled(0, 0, width, height, self._select_color)
+
+        # The texture fills a square as tall as the row, keeping its aspect.
+        if self._texture is not None:
+            scale = height / max(self._texture.width, self._texture.height)
+            texture_width, texture_height = self._texture.width * scale, self._texture.height * scale
+            surface.draw_texture((height - texture_width) / 2, (height - texture_height) / 2,
+                                 texture_width, texture_height, self._texture)
+
+        self._label.x = height + 4 if self._thumbnail else 4
+        self._label.y = height / 2
+        self._label.draw()
+
+
+def _unbind(instance, prop: str, callback: Callable):
+    # The counterpart to gui.bind, which this version of arcade is missing. Without it a removed child keeps calling
+    # back into, and keeping alive, the layout it was removed from.
+    _property = getattr(type(instance), prop)
+    if not isinstance(_property, gui.Property):
+        return
+    obs = _property.obs.get(instance)
+    if obs is not None:
+        obs.listeners.discard(callback)